@@ -40,6 +40,10 @@ buildPythonApplication {
     uvicorn
   ];
 
+  optional-dependencies = with python.pkgs; {
+    orjson = [ orjson ];
+  };
+
   preBuild = ''
     # Compile localization messages (.po to .mo) for the application
     export PYTHONPATH="$PYTHONPATH:$(pwd)/src"
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "moodlehack.accounts"
+
+    def ready(self):
+        # OpenAPI extensions (schema.py) load with the schema class only
+        from . import signals  # noqa: F401
@@ -0,0 +1,210 @@
+"""
+Cheap API authentication for machine clients.
+
+Basic auth runs the password hasher (PBKDF2) on every request. Tokens
+are checked with a single indexed lookup instead, and verified
+credentials are kept in a small in-process cache, so repeated requests
+skip the database as well.
+
+Cache entries live for API_AUTH["CACHE_TTL"] seconds and are dropped as
+soon as a token is deleted or its user is saved (password change,
+deactivation) in this process. Other workers learn about it through a
+per-user version kept in the default cache when that cache is shared
+(see moodlehack.core.caches); with a per-process cache the short TTL
+bounds staleness instead.
+
+Every request gets its own copy of the cached user, so attributes set
+on request.user never leak into concurrent requests.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from moodlehack.core.caches import is_shared
+from moodlehack.core.metrics import record_cache
+
+
+def get_auth_version_key(user_pk) -> str:
+    return f"accounts:auth-version:{user_pk}"
+
+
+def get_auth_version(user_pk):
+    """Version of the user's credentials shared by all workers."""
+    if not is_shared():
+        return None
+    return cache.get(get_auth_version_key(user_pk))
+
+
+def bump_auth_version(user_pk):
+    """Invalidate the user's cached credentials in every worker."""
+    if is_shared():
+        cache.set(get_auth_version_key(user_pk), time.time_ns(), None)
+
+
+class CredentialCache:
+    """
+    Thread-safe LRU cache of verified (user, auth) pairs with a TTL.
+
+    Entries remember the user's auth version when they were stored and
+    are dropped on a hit once the shared version has changed.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        credentials = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, version, credentials = entry
+                if expires <= time.monotonic():
+                    del self._entries[key]
+                    credentials = None
+                else:
+                    self._entries.move_to_end(key)
+        if credentials is not None:
+            if get_auth_version(credentials[0].pk) != version:
+                self.discard(key)
+                credentials = None
+        record_cache("api_auth", hit=credentials is not None)
+        return credentials and self.copy(credentials)
+
+    @staticmethod
+    def copy(credentials):
+        """Return a private copy of a cached (user, auth) pair."""
+        user, auth = credentials
+        user = copy.copy(user)
+        if getattr(auth, "user_id", None) == user.pk:
+            # Token instances point back at the user
+            auth = copy.copy(auth)
+            auth.user = user
+        return user, auth
+
+    def set(self, key, credentials, ttl: float | None = None):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        version = get_auth_version(credentials[0].pk)
+        credentials = self.copy(credentials)
+        with self._lock:
+            self._entries[key] = (
+                time.monotonic() + ttl, version, credentials
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_user(self, user_pk):
+        """Forget every cached credential of the given user."""
+        with self._lock:
+            stale = [
+                key for key, (_, _, (user, _auth)) in self._entries.items()
+                if user.pk == user_pk
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+credential_cache = CredentialCache(
+    maxsize=settings.API_AUTH["CACHE_SIZE"],
+    ttl=settings.API_AUTH["CACHE_TTL"],
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    DRF token authentication ('Authorization: Token <key>')
+    backed by the in-process credential cache.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = f"token:{key}"
+        credentials = credential_cache.get(cache_key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            credential_cache.set(cache_key, credentials)
+        return credentials
+
+
+class SignedTokenAuthentication(TokenAuthentication):
+    """
+    Stateless expiring tokens ('Authorization: Signed <token>').
+
+    A token is the user id and a fingerprint of the password hash signed
+    with SECRET_KEY and a timestamp. It expires after
+    API_AUTH["SIGNED_TOKEN_MAX_AGE"] seconds and stops working as soon
+    as the password changes.
+    """
+
+    keyword = "Signed"
+    salt = "moodlehack.accounts.SignedTokenAuthentication"
+
+    @classmethod
+    def get_fingerprint(cls, user) -> str:
+        return salted_hmac(cls.salt, user.password).hexdigest()[:16]
+
+    @classmethod
+    def sign(cls, user) -> tuple[str, timedelta]:
+        """Return a new token for the user and its lifetime."""
+        signer = signing.TimestampSigner(salt=cls.salt)
+        token = signer.sign(f"{user.pk}.{cls.get_fingerprint(user)}")
+        return token, timedelta(
+            seconds=settings.API_AUTH["SIGNED_TOKEN_MAX_AGE"]
+        )
+
+    def authenticate_credentials(self, key):
+        cache_key = f"signed:{key}"
+        credentials = credential_cache.get(cache_key)
+        if credentials is not None:
+            return credentials
+
+        signer = signing.TimestampSigner(salt=self.salt)
+        max_age = settings.API_AUTH["SIGNED_TOKEN_MAX_AGE"]
+        try:
+            value = signer.unsign(key, max_age=max_age)
+            timestamp = signing.b62_decode(key.rsplit(signer.sep, 2)[1])
+            user_pk, fingerprint = value.split(".", 1)
+            user = get_user_model().objects.get(pk=user_pk)
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed(_("Token has expired."))
+        except (signing.BadSignature, ValueError):
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+        except get_user_model().DoesNotExist:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _("User inactive or deleted.")
+            )
+        if not constant_time_compare(fingerprint, self.get_fingerprint(user)):
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+
+        credentials = (user, key)
+        credential_cache.set(
+            cache_key, credentials, ttl=timestamp + max_age - time.time()
+        )
+        return credentials
@@ -0,0 +1,74 @@
+"""
+Authentication middleware with a cached user object.
+
+Django loads the user from the database on every request that touches
+request.user (e.g. each HTMX live search keystroke). Here the user
+object is kept in the default cache, shared by all sessions of that
+user, for SESSION_USER_CACHE_TTL seconds. The session auth hash and
+is_active are still verified on every request, and saving or deleting
+the user drops the cached copy (see signals.py).
+
+That invalidation only reaches other workers through a shared cache,
+so with a per-process cache (locmem, the default) the user is loaded
+from the database as usual.
+"""
+
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from moodlehack.core.caches import is_shared
+from moodlehack.core.metrics import record_cache
+
+
+def get_user_cache_key(user_pk) -> str:
+    return f"accounts:user:{user_pk}"
+
+
+def load_user(request):
+    """Return the session user, from the cache when possible."""
+    user_pk = request.session.get(SESSION_KEY)
+    if user_pk is None or not is_shared():
+        return auth.get_user(request)
+
+    cache_key = get_user_cache_key(user_pk)
+    user = cache.get(cache_key)
+    record_cache("session_user", hit=user is not None)
+    if user is not None and user.is_active:
+        session_hash = request.session.get(HASH_SESSION_KEY)
+        if session_hash and constant_time_compare(
+            session_hash, user.get_session_auth_hash()
+        ):
+            return user
+
+    # Full check: backend lookup, fallback keys, flush on mismatch
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(cache_key, user, settings.SESSION_USER_CACHE_TTL)
+    return user
+
+
+def get_user(request):
+    if not hasattr(request, "_cached_user"):
+        request._cached_user = load_user(request)
+    return request._cached_user
+
+
+async def auser(request):
+    if not hasattr(request, "_acached_user"):
+        request._acached_user = await sync_to_async(load_user)(request)
+    return request._acached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        request.auser = partial(auser, request)
@@ -0,0 +1,30 @@
+"""
+OpenAPI (drf-spectacular) extensions for accounts authentication.
+
+AutoSchema is the DRF default schema class, so the extensions register
+when a schema is generated instead of on every startup: importing
+drf-spectacular pulls in much of DRF, PyYAML and Markdown.
+"""
+
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from drf_spectacular.openapi import AutoSchema as SpectacularAutoSchema
+
+
+class AutoSchema(SpectacularAutoSchema):
+    """drf-spectacular schema with the extensions below registered."""
+
+
+class SignedTokenScheme(OpenApiAuthenticationExtension):
+    target_class = (
+        "moodlehack.accounts.authentication.SignedTokenAuthentication"
+    )
+    name = "signedTokenAuth"
+    priority = 1
+
+    def get_security_definition(self, auto_schema):
+        return {
+            "type": "apiKey",
+            "in": "header",
+            "name": "Authorization",
+            "description": 'Signed token prefixed by "Signed"',
+        }
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import bump_auth_version, credential_cache
+from .middleware import get_user_cache_key
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, **kwargs):
+    """Revoked tokens stop working immediately in every worker."""
+    credential_cache.discard(f"token:{instance.key}")
+    bump_auth_version(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def forget_user(sender, instance, update_fields=None, **kwargs):
+    """
+    Drop cached credentials and the cached session user of a changed
+    user (password change, deactivation, deletion). Plain logins only
+    touch 'last_login'.
+    """
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+    credential_cache.discard_user(instance.pk)
+    bump_auth_version(instance.pk)
+    cache.delete(get_user_cache_key(instance.pk))
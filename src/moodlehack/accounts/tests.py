@@ -1,3 +1,201 @@
-from django.test import TestCase
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import SESSION_KEY, get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+
+from .authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+    bump_auth_version,
+    credential_cache,
+)
+from .middleware import get_user_cache_key, load_user
+
+# Per-process cache, like the default configuration
+TEST_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "moodlehack-tests",
+    },
+}
+
+
+class SharedCacheMixin:
+    """Run a test case with a file-based cache, shared by processes."""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        caches = {
+            "default": {
+                "BACKEND": (
+                    "django.core.cache.backends.filebased.FileBasedCache"
+                ),
+                "LOCATION": directory.name,
+            },
+        }
+        settings_override = override_settings(CACHES=caches)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CredentialCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            "tester", password="secret"
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        credential_cache.clear()
+        self.auth = CachedTokenAuthentication()
+
+    def authenticate(self):
+        return self.auth.authenticate_credentials(self.token.key)
+
+    def test_cached(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+        self.assertEqual(user, self.user)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_copy_per_request(self):
+        first, first_token = self.authenticate()
+        first.cached_attribute = True
+        second, second_token = self.authenticate()
+        self.assertIsNot(first, second)
+        self.assertFalse(hasattr(second, "cached_attribute"))
+        self.assertIs(second_token.user, second)
+        self.assertIsNot(first_token, second_token)
+
+    def test_token_revoked(self):
+        self.authenticate()
+        Token.objects.filter(pk=self.token.pk).delete()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_user_deactivated(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_last_login_kept(self):
+        self.authenticate()
+        self.user.save(update_fields=["last_login"])
+        with self.assertNumQueries(0):
+            self.authenticate()
+
+    def test_signed_token_password_changed(self):
+        auth = SignedTokenAuthentication()
+        key, _ = auth.sign(self.user)
+        auth.authenticate_credentials(key)
+        self.user.set_password("changed")
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            auth.authenticate_credentials(key)
+
+
+class SharedCredentialCacheTests(SharedCacheMixin, TestCase):
+    """Revocations made by another worker through a shared cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("tester")
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        credential_cache.clear()
+        self.auth = CachedTokenAuthentication()
+
+    def authenticate(self):
+        return self.auth.authenticate_credentials(self.token.key)
+
+    def test_revoked_elsewhere(self):
+        self.authenticate()
+        # The other worker deletes the token: its signal handlers can
+        # only reach this process through the shared cache
+        with mock.patch("moodlehack.accounts.signals.credential_cache"):
+            Token.objects.filter(pk=self.token.pk).delete()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_version_bumped(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            self.authenticate()
+        bump_auth_version(self.user.pk)
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+
+class SessionUserCacheTestsMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("tester")
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get_request(self):
+        request = RequestFactory().get("/")
+        request.session = self.client.session
+        # Loads the session outside of the counted queries
+        request.session.get(SESSION_KEY)
+        return request
+
+    def load_user(self):
+        return load_user(self.get_request())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SessionUserCacheTests(SessionUserCacheTestsMixin, TestCase):
+    def test_not_cached_per_process(self):
+        self.load_user()
+        request = self.get_request()
+        with self.assertNumQueries(1):
+            self.assertEqual(load_user(request), self.user)
+
+
+class SharedSessionUserCacheTests(
+    SharedCacheMixin, SessionUserCacheTestsMixin, TestCase
+):
+    def test_cached(self):
+        self.load_user()
+        request = self.get_request()
+        with self.assertNumQueries(0):
+            self.assertEqual(load_user(request), self.user)
+
+    def test_deactivated(self):
+        self.load_user()
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(self.load_user().is_authenticated)
+
+    def test_inactive_cached_user(self):
+        self.user.is_active = False
+        cache.set(get_user_cache_key(self.user.pk), self.user)
+        request = self.get_request()
+        # Checked against the database again
+        with self.assertNumQueries(1):
+            user = load_user(request)
+        self.assertTrue(user.is_active)
+
+    def test_password_changed(self):
+        self.load_user()
+        self.user.set_password("changed")
+        self.user.save()
+        self.assertFalse(self.load_user().is_authenticated)
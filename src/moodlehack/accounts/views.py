@@ -1,5 +1,13 @@
 from django.contrib.auth import views
 from django.urls import reverse_lazy
+from django.utils import timezone
+from drf_spectacular.utils import extend_schema, inline_serializer
+from rest_framework import serializers
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .authentication import SignedTokenAuthentication
 
 
 class LoginView(views.LoginView):
@@ -10,3 +18,29 @@ class LoginView(views.LoginView):
 
 class LogoutView(views.LogoutView):
     next_page = reverse_lazy('accounts:login')
+
+
+class SignedTokenView(APIView):
+    """
+    Issue an expiring signed token for the authenticated user.
+    Lets Basic auth clients pay for password hashing once per token.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    @extend_schema(
+        request=None,
+        responses=inline_serializer(
+            name="SignedToken",
+            fields={
+                "token": serializers.CharField(),
+                "expires": serializers.DateTimeField(),
+            },
+        ),
+    )
+    def post(self, request):
+        token, lifetime = SignedTokenAuthentication.sign(request.user)
+        return Response({
+            "token": token,
+            "expires": timezone.now() + lifetime,
+        })
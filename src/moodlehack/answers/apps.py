@@ -6,3 +6,6 @@ class AnswersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "moodlehack.answers"
     verbose_name = _("Test Answers")
+
+    def ready(self):
+        from . import signals  # noqa: F401
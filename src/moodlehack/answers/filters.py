@@ -0,0 +1,37 @@
+from django.utils.translation import gettext_lazy as _
+from django_filters import rest_framework as filters
+
+from .models import Answer
+
+
+class AnswerFilter(filters.FilterSet):
+    """
+    Structured filters for the answers API.
+    Mirrors the web list filters and adds range lookups on timestamps
+    (e.g. ?update__gt=2026-01-01T00:00:00Z).
+    """
+
+    QUARTER_CHOICES = [(q, f"Q{q}") for q in range(1, 5)]
+
+    quarter = filters.TypedChoiceFilter(
+        choices=QUARTER_CHOICES,
+        coerce=int,
+        method="filter_quarter",
+        label=_("Quarter"),
+    )
+
+    class Meta:
+        model = Answer
+        fields = {
+            "category": ["exact"],
+            "status": ["exact", "in"],
+            "year": ["exact", "gte", "lte"],
+            "month": ["exact", "gte", "lte"],
+            "create": ["gt", "gte", "lt", "lte"],
+            "update": ["gt", "gte", "lt", "lte"],
+        }
+
+    def filter_quarter(self, queryset, name, value: int):
+        """Filter by month range of the quarter (e.g. Q1 = months 1-3)."""
+        start_month = (value - 1) * 3 + 1
+        return queryset.filter(month__range=(start_month, start_month + 2))
@@ -6,7 +6,25 @@ from django.urls import reverse_lazy
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
-from .models import Answer
+from .models import Answer, Category
+
+
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleFileField(forms.FileField):
+    """File field accepting several uploaded files at once."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("widget", MultipleFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single_file_clean = super().clean
+        if isinstance(data, (list, tuple)):
+            return [single_file_clean(d, initial) for d in data]
+        return [single_file_clean(data, initial)] if data else []
 
 
 class AnswerForm(forms.ModelForm):
@@ -163,3 +181,75 @@ class AnswerForm(forms.ModelForm):
             ),
             submit_buttons,
         )
+
+
+class AttemptImportForm(forms.Form):
+    files = MultipleFileField(
+        label=_("Attempt review pages"),
+        required=False,
+        help_text=_("Saved Moodle quiz attempt review pages (.html)"),
+    )
+    html = forms.CharField(
+        label=_("Pasted HTML"),
+        required=False,
+        widget=forms.Textarea,
+    )
+    category = forms.ModelChoiceField(
+        label=_("Default category"),
+        queryset=Category.objects.all(),
+        required=False,
+    )
+    status = forms.ChoiceField(
+        label=_("Status"),
+        choices=Answer.STATUS_CHOICES,
+        initial=Answer.STATUS_ACTUAL,
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        icon_import = mark_safe('<i class="bi bi-upload me-2"></i>')
+
+        self.helper = FormHelper()
+        self.helper.form_id = "attempt-import-form"
+        self.helper.form_method = "post"
+        self.helper.layout = Layout(
+            Field("files", css_class="mb-3 form-control", accept=".html,.htm"),
+            Field(
+                "html",
+                rows="8",
+                placeholder=_("Paste the source of an attempt review page..."),
+                css_class="mb-3 form-control font-monospace",
+            ),
+            Row(
+                Column(
+                    Field("category", css_class="form-select"),
+                    css_class="col-md-6",
+                ),
+                Column(
+                    Field("status", css_class="form-select"),
+                    css_class="col-md-6",
+                ),
+                css_class="g-3 mb-4",
+            ),
+            Row(
+                Column(
+                    StrictButton(
+                        icon_import + _("Import"),
+                        name="submit",
+                        type="submit",
+                        css_class="btn btn-primary w-100",
+                    ),
+                    css_class="col-12 col-lg-auto",
+                ),
+                css_class="justify-content-lg-end",
+            ),
+        )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get("files") and not cleaned_data.get("html"):
+            raise forms.ValidationError(
+                _("Upload or paste at least one attempt review page.")
+            )
+        return cleaned_data
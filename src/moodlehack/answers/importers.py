@@ -0,0 +1,480 @@
+import html
+import re
+from collections.abc import Iterable, Iterator
+from html.parser import HTMLParser
+from typing import IO, NamedTuple
+from xml.etree.ElementTree import iterparse
+
+from django.db import transaction
+from django.utils.html import strip_tags
+
+from .models import Answer, Category
+
+
+# Category for questions whose source does not provide one
+DEFAULT_CATEGORY = "Imported"
+
+
+class ImportedQuestion(NamedTuple):
+    """Question/answer pair extracted from an external source."""
+
+    question: str
+    answer: str
+    category: str | None = None
+
+
+def clean_text(text: str | None) -> str:
+    """Convert an HTML fragment to plain text with collapsed whitespace."""
+    if not text:
+        return ""
+    return " ".join(html.unescape(strip_tags(text)).split())
+
+
+def format_answers(answers: list[str]) -> str:
+    """Render one answer as is, several answers as a Markdown list."""
+    answers = [a for a in answers if a]
+    if len(answers) == 1:
+        return answers[0]
+    return "\n".join(f"- {a}" for a in answers)
+
+
+def category_from_path(path: str | None) -> str | None:
+    """
+    Take the last segment of a Moodle category path
+    (e.g. '$course$/top/Algebra' -> 'Algebra').
+    """
+    if not path:
+        return None
+    segments = [s.strip() for s in path.split("/") if s.strip()]
+    segments = [s for s in segments if s not in ("$course$", "top")]
+    if not segments:
+        return None
+    return segments[-1][: Category._meta.get_field("name").max_length]
+
+
+# Moodle XML
+MOODLE_XML_SKIPPED_TYPES = {"description", "cloze", "essay", "random"}
+
+
+def _xml_text(element, path: str = "text") -> str:
+    if element is None:
+        return ""
+    return clean_text(element.findtext(path))
+
+
+def _xml_question(element) -> ImportedQuestion | None:
+    """Map a single Moodle XML <question> element to ImportedQuestion."""
+    question = _xml_text(element.find("questiontext"))
+    if not question:
+        return None
+
+    if element.get("type") == "matching":
+        answers = [
+            f"{_xml_text(sub)} → {_xml_text(sub.find('answer'))}"
+            for sub in element.iterfind("subquestion")
+            if _xml_text(sub)
+        ]
+    else:
+        answers = [
+            _xml_text(answer)
+            for answer in element.iterfind("answer")
+            if float(answer.get("fraction") or 0) > 0
+        ]
+
+    answer = format_answers(answers)
+    if not answer:
+        return None
+    return ImportedQuestion(question, answer)
+
+
+def parse_moodle_xml(
+    source: str | IO[bytes],
+) -> Iterator[ImportedQuestion]:
+    """
+    Incrementally parse a Moodle XML question bank export.
+
+    Each <question> element is discarded once processed, so memory use
+    does not depend on the size of the file.
+    """
+    context = iterparse(source, events=("start", "end"))
+    _, root = next(context)
+    category = None
+
+    for event, element in context:
+        if event != "end" or element.tag != "question":
+            continue
+
+        kind = element.get("type")
+        if kind == "category":
+            category = category_from_path(
+                element.findtext("category/text")
+            )
+        elif kind not in MOODLE_XML_SKIPPED_TYPES:
+            item = _xml_question(element)
+            if item:
+                yield item._replace(category=category)
+
+        # Drop the processed question from the tree
+        root.clear()
+
+
+# GIFT
+GIFT_ESCAPES = re.compile(r"\\([~=#{}:n\\])")
+GIFT_TITLE = re.compile(r"^\s*::(.*?)::")
+GIFT_FORMAT = re.compile(r"^\s*\[(html|moodle|plain|markdown)\]")
+GIFT_WEIGHT = re.compile(r"^%(-?[\d.]+)%")
+
+
+def _gift_unescape(text: str) -> str:
+    return GIFT_ESCAPES.sub(
+        lambda m: "\n" if m.group(1) == "n" else m.group(1), text
+    ).strip()
+
+
+def _gift_find(text: str, chars: str, start: int = 0) -> int:
+    """Find the first unescaped occurrence of any of chars."""
+    escaped = False
+    for index in range(start, len(text)):
+        if escaped:
+            escaped = False
+        elif text[index] == "\\":
+            escaped = True
+        elif text[index] in chars:
+            return index
+    return -1
+
+
+def _gift_split(text: str, chars: str) -> list[str]:
+    """Split text before every unescaped occurrence of any of chars."""
+    parts = []
+    start = 0
+    while (index := _gift_find(text, chars, start + 1)) != -1:
+        parts.append(text[start:index])
+        start = index
+    parts.append(text[start:])
+    return [p for p in parts if p.strip()]
+
+
+def _gift_strip_feedback(text: str) -> str:
+    index = _gift_find(text, "#")
+    return text if index == -1 else text[:index]
+
+
+def _gift_answers(block: str) -> list[str]:
+    """Extract correct answers from the content of a GIFT {...} block."""
+    block = block.strip()
+
+    if block.upper() in ("T", "TRUE"):
+        return ["True"]
+    if block.upper() in ("F", "FALSE"):
+        return ["False"]
+
+    # Numerical: {#3.14:0.01} or {#=1822:0 =%50%1822:2}
+    numerical = block.startswith("#")
+    if numerical:
+        block = block[1:]
+        tokens = _gift_split(block, "=") if "=" in block else ["=" + block]
+    else:
+        tokens = _gift_split(block, "=~")
+
+    answers = []
+    for token in tokens:
+        marker, text = token[:1], token[1:].strip()
+        if marker not in ("=", "~"):
+            continue
+
+        # Partial credit ('~%50%...') counts as correct, penalties do not
+        weight = GIFT_WEIGHT.match(text)
+        if weight:
+            text = text[weight.end():]
+            if float(weight.group(1)) <= 0:
+                continue
+        elif marker == "~":
+            continue
+
+        text = _gift_strip_feedback(text)
+        if numerical and ":" in text:
+            value, tolerance = text.split(":", 1)
+            text = f"{value.strip()} ± {tolerance.strip()}"
+        elif (arrow := text.find("->")) != -1:
+            text = (
+                f"{_gift_unescape(text[:arrow])} → "
+                f"{_gift_unescape(text[arrow + 2:])}"
+            )
+        answers.append(_gift_unescape(text))
+
+    return answers
+
+
+def _gift_question(lines: list[str]) -> ImportedQuestion | None:
+    """Map a blank-line separated GIFT block to ImportedQuestion."""
+    text = "\n".join(lines)
+    text = GIFT_TITLE.sub("", text, count=1)
+    text = GIFT_FORMAT.sub("", text, count=1)
+
+    start = _gift_find(text, "{")
+    end = _gift_find(text, "}", start + 1) if start != -1 else -1
+    if start == -1 or end == -1:
+        # Description or malformed block
+        return None
+
+    question = text[:start] + " _____ " + text[end + 1:]
+    if not text[end + 1:].strip():
+        question = text[:start]
+    question = clean_text(_gift_unescape(question))
+
+    answer = format_answers(_gift_answers(text[start + 1:end]))
+    if not question or not answer:
+        return None
+    return ImportedQuestion(question, answer)
+
+
+def parse_gift(lines: Iterable[str]) -> Iterator[ImportedQuestion]:
+    """
+    Parse a GIFT question bank line by line.
+
+    Only the lines of the current question are kept in memory.
+    """
+    category = None
+    block: list[str] = []
+
+    for line in _chain(lines):
+        stripped = line.strip()
+
+        if stripped.startswith("//"):
+            continue
+
+        if stripped.startswith("$CATEGORY:"):
+            category = category_from_path(stripped[len("$CATEGORY:"):])
+            continue
+
+        if stripped:
+            block.append(line.rstrip("\r\n"))
+            continue
+
+        if block:
+            item = _gift_question(block)
+            block = []
+            if item:
+                yield item._replace(category=category)
+
+
+def _chain(lines: Iterable[str]) -> Iterator[str]:
+    """Yield lines followed by a terminating blank line."""
+    yield from lines
+    yield ""
+
+
+# Moodle attempt review (HTML)
+REVIEW_RIGHT_ANSWER = re.compile(
+    r"^(the correct answers? (is|are)|(правильн|верн)\w* ответ\w*)\s*:?\s*",
+    re.IGNORECASE,
+)
+REVIEW_QUOTED = re.compile(r"^[«'\"](.*)[»'\"]\.?$", re.DOTALL)
+REVIEW_ANSWER_NUMBER = re.compile(r"^[a-zа-я]\.\s+", re.IGNORECASE)
+
+
+class AttemptReviewParser(HTMLParser):
+    """
+    Incremental parser for saved Moodle quiz attempt review pages.
+
+    Tracks only <div> nesting and collects the text of 'qtext' and
+    'rightanswer' blocks of every 'que' container. When the correct
+    answer is hidden by the review options, options marked 'correct'
+    in the answer block are used instead. Completed questions are
+    queued in 'items'.
+    """
+
+    CAPTURED = ("qtext", "rightanswer", "correct")
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.items: list[ImportedQuestion] = []
+        self.stack: list[str | None] = []
+        self.question: dict[str, list[str]] | None = None
+        self.capture: str | None = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+
+        if tag == "input" and self.question is not None:
+            # Short answer fields keep the submitted text in 'value'
+            if "correct" in classes and attrs.get("value"):
+                self.question["correct"].append(attrs["value"])
+            return
+
+        if tag in ("br", "p", "li") and self.capture:
+            self.question[self.capture].append(" ")
+
+        if tag != "div":
+            return
+
+        marker = None
+        if "que" in classes:
+            marker = "que"
+            self.question = {key: [] for key in self.CAPTURED}
+        elif self.question is not None and not self.capture:
+            marker = next((c for c in self.CAPTURED if c in classes), None)
+            if marker == "correct":
+                self.question[marker].append("\n")
+            self.capture = marker
+
+        self.stack.append(marker)
+
+    def handle_endtag(self, tag):
+        if tag != "div" or not self.stack:
+            return
+
+        marker = self.stack.pop()
+        if marker == "que":
+            self.finish_question()
+        elif marker and marker == self.capture:
+            self.capture = None
+
+    def handle_data(self, data):
+        if self.capture:
+            self.question[self.capture].append(data)
+
+    def finish_question(self):
+        texts = {key: "".join(val) for key, val in self.question.items()}
+        self.question = None
+        self.capture = None
+
+        question = clean_text(texts["qtext"])
+        answer = clean_text(texts["rightanswer"])
+        if answer:
+            answer = REVIEW_RIGHT_ANSWER.sub("", answer, count=1)
+            if quoted := REVIEW_QUOTED.match(answer):
+                answer = quoted.group(1)
+        else:
+            answer = format_answers([
+                REVIEW_ANSWER_NUMBER.sub("", clean_text(line))
+                for line in texts["correct"].split("\n")
+            ])
+
+        if question and answer:
+            self.items.append(ImportedQuestion(question, answer))
+
+
+def parse_attempt_review(
+    chunks: Iterable[str],
+) -> Iterator[ImportedQuestion]:
+    """
+    Parse Moodle attempt review HTML fed in chunks
+    (an open text file, a list of strings...).
+    """
+    parser = AttemptReviewParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.items
+        parser.items.clear()
+    parser.close()
+    yield from parser.items
+
+
+# Writer
+class AnswerImporter:
+    """
+    Write ImportedQuestion records to the database in batches.
+
+    Every batch is deduplicated in memory, matched against existing
+    questions with a single query and written with one bulk statement.
+    Existing questions are skipped, or overwritten when 'update' is set.
+    'default_category' is used for questions without a category: a
+    Category instance as is, a name like any category of the source.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 1000,
+        update: bool = False,
+        dry_run: bool = False,
+        default_category: Category | str = DEFAULT_CATEGORY,
+        **defaults,
+    ):
+        self.batch_size = batch_size
+        self.update = update
+        self.dry_run = dry_run
+        self.defaults = defaults
+        self.categories: dict[str, Category] = {}
+        if isinstance(default_category, Category):
+            self.categories[default_category.name] = default_category
+            default_category = default_category.name
+        self.default_category = default_category
+        self.stats = {"created": 0, "updated": 0, "skipped": 0}
+
+    def get_category(self, name: str | None) -> Category:
+        name = name or self.default_category
+        if name not in self.categories:
+            # Names are not unique: reuse the oldest category of a name
+            category = (
+                Category.objects.filter(name=name).order_by("pk").first()
+            )
+            if category is None:
+                category = Category.objects.create(name=name)
+            self.categories[name] = category
+        return self.categories[name]
+
+    def run(self, items: Iterable[ImportedQuestion], progress=None) -> dict:
+        """
+        Consume items and write them in batches.
+
+        'progress' is called with the running stats after each batch.
+        """
+        batch: dict[str, ImportedQuestion] = {}
+
+        for item in items:
+            if item.question in batch:
+                self.stats["skipped"] += 1
+            batch[item.question] = item
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                batch = {}
+                if progress:
+                    progress(self.stats)
+
+        if batch:
+            self.write(batch)
+            if progress:
+                progress(self.stats)
+
+        return self.stats
+
+    def write(self, batch: dict[str, ImportedQuestion]) -> None:
+        existing = set(
+            Answer.objects.filter(question__in=batch.keys())
+            .values_list("question", flat=True)
+        )
+
+        if self.update:
+            objs = batch.values()
+            self.stats["updated"] += len(existing)
+        else:
+            objs = [i for q, i in batch.items() if q not in existing]
+            self.stats["skipped"] += len(existing)
+        self.stats["created"] += len(batch) - len(existing)
+
+        if self.dry_run or not objs:
+            return
+
+        answers = [
+            Answer(
+                question=item.question,
+                answer=item.answer,
+                category=self.get_category(item.category),
+                **self.defaults,
+            )
+            for item in objs
+        ]
+
+        with transaction.atomic():
+            if self.update:
+                Answer.objects.bulk_create(
+                    answers,
+                    update_conflicts=True,
+                    unique_fields=["question"],
+                    update_fields=["answer", "category", "update"],
+                )
+            else:
+                Answer.objects.bulk_create(answers, ignore_conflicts=True)
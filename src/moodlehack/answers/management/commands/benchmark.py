@@ -0,0 +1,373 @@
+import itertools
+import json
+import math
+import platform
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.test import Client
+from django.urls import reverse
+
+from moodlehack.answers.models import Answer
+from moodlehack.answers.templatetags.text_tags import markdown_format
+
+
+# AnswersListView filters combined by --filter-combinations
+FILTERS = ["q", "category", "status", "year", "month", "quarter"]
+
+# Synthetic corpus sizes for --dataset
+DATASETS = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def percentile(durations: list[float], percent: float) -> float:
+    """Nearest-rank percentile of sorted durations."""
+    index = max(round(percent / 100 * len(durations)) - 1, 0)
+    return durations[min(index, len(durations) - 1)]
+
+
+def get_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the answers list (page and HTMX search), filters, "
+        "detail page, question check, API list/search/create and "
+        "Markdown rendering against the current database, or a "
+        "synthetic one of a standard size (--dataset). Results are "
+        "written as JSON and can be compared with a previous run"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=30,
+            help="Timed runs per case",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=3,
+            help="Untimed runs per case before measuring",
+        )
+        parser.add_argument(
+            "--only",
+            action="append",
+            default=[],
+            help="Run cases whose name contains this text (repeatable)",
+        )
+        parser.add_argument(
+            "--dataset",
+            choices=DATASETS,
+            type=str.lower,
+            help=(
+                "Replace previously generated answers with a reproducible "
+                "corpus of this size first (generate_answers --clear "
+                "--seed 1)"
+            ),
+        )
+        parser.add_argument(
+            "--filter-combinations",
+            action="store_true",
+            help="Benchmark every combination of list filters",
+        )
+        parser.add_argument(
+            "--user",
+            help="Username to log in as (first superuser by default)",
+        )
+        parser.add_argument(
+            "--output",
+            type=Path,
+            help="Write JSON results to this file (stdout by default)",
+        )
+        parser.add_argument(
+            "--compare",
+            type=Path,
+            help="Baseline JSON results to compare p50 latency with",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=10.0,
+            help="p50 slowdown in percent reported as a regression",
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be positive")
+        if options["dataset"]:
+            # Progress goes to stderr, stdout may carry the JSON results
+            call_command(
+                "generate_answers",
+                answers=DATASETS[options["dataset"]],
+                seed=1,
+                clear=True,
+                stdout=self.stderr,
+            )
+        self.client = self.get_client(options["user"])
+        self.sample = self.get_sample()
+
+        cases = [
+            (name, func) for name, func in self.get_cases(options)
+            if not options["only"]
+            or any(text in name for text in options["only"])
+        ]
+        if not cases:
+            raise CommandError("No benchmark cases selected")
+
+        results = {}
+        for name, func in cases:
+            results[name] = self.measure(
+                func, options["iterations"], options["warmup"]
+            )
+            self.stderr.write(
+                f"{name:<40} p50 {results[name]['p50_ms']:9.2f} ms  "
+                f"p95 {results[name]['p95_ms']:9.2f} ms  "
+                f"{results[name]['queries']:3} queries"
+            )
+
+        report = {"meta": self.get_meta(options), "results": results}
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options["output"]:
+            options["output"].write_text(output + "\n")
+            self.stderr.write(f"Results written to {options['output']}")
+        else:
+            self.stdout.write(output)
+
+        if options["compare"]:
+            self.compare(results, options["compare"], options["threshold"])
+
+    def get_client(self, username: str | None) -> Client:
+        users = get_user_model().objects.filter(is_active=True)
+        user = (
+            users.filter(username=username).first() if username
+            else users.filter(is_superuser=True).first()
+        )
+        if user is None:
+            raise CommandError(
+                "No user to log in as, create a superuser or pass --user"
+            )
+        host = next(
+            (
+                host for host in settings.ALLOWED_HOSTS
+                if "*" not in host and not host.startswith(".")
+            ),
+            "localhost",
+        )
+        client = Client(HTTP_HOST=host)
+        client.force_login(user)
+        return client
+
+    def get_sample(self) -> dict:
+        """Filter values and texts taken from the current data."""
+        answer = Answer.objects.order_by("pk")[
+            Answer.objects.count() // 2:
+        ].first()
+        if answer is None:
+            raise CommandError(
+                "No answers to benchmark, run generate_answers first"
+            )
+        words = [word for word in answer.question.split() if len(word) > 3]
+        category = (
+            Answer.objects.values("category")
+            .annotate(total=Count("pk"))
+            .order_by("-total")
+            .first()["category"]
+        )
+        bodies = list(
+            Answer.objects.order_by("pk").values_list("answer", flat=True)[
+                :200
+            ]
+        )
+        return {
+            "answer": answer,
+            "bodies": bodies,
+            "filters": {
+                "q": words[0] if words else answer.question[:10],
+                "category": category,
+                "status": Answer.STATUS_ACTUAL,
+                "year": Answer.objects.aggregate(year=Max("year"))["year"],
+                "month": answer.month,
+                "quarter": answer.quarter,
+            },
+        }
+
+    def get(self, path: str, data=None, **headers):
+        response = self.client.get(path, data, **headers)
+        if response.status_code != 200:
+            raise CommandError(f"GET {path}: {response.status_code}")
+        return response
+
+    def get_cases(self, options):
+        index = reverse("answers:index")
+        filters = self.sample["filters"]
+        answer = self.sample["answer"]
+        htmx = {"HTTP_HX_REQUEST": "true"}
+
+        yield "page.index", lambda: self.get(index)
+        yield "htmx.index", lambda: self.get(index, **htmx)
+        yield "htmx.search", lambda: self.get(
+            index, {"q": filters["q"]}, **htmx
+        )
+
+        if options["filter_combinations"]:
+            combinations = [
+                combination
+                for size in range(1, len(FILTERS) + 1)
+                for combination in itertools.combinations(FILTERS, size)
+            ]
+        else:
+            combinations = [(name,) for name in FILTERS] + [tuple(FILTERS)]
+        for combination in combinations:
+            data = {name: filters[name] for name in combination}
+            yield (
+                f"htmx.filter.{'+'.join(combination)}",
+                lambda data=data: self.get(index, data, **htmx),
+            )
+
+        yield "page.detail", lambda: self.get(
+            reverse("answers:detail", kwargs={"pk": answer.pk})
+        )
+
+        check = reverse("answers:check_question")
+        yield "htmx.check_question.exists", lambda: self.client.post(
+            check, {"question": answer.question}
+        )
+        yield "htmx.check_question.unique", lambda: self.client.post(
+            check, {"question": f"{answer.question} (benchmark)"}
+        )
+
+        api = reverse("answers:answer-list")
+        yield "api.answers.list", lambda: self.get(api)
+        yield "api.answers.search", lambda: self.get(
+            api, {"search": filters["q"]}
+        )
+        counter = itertools.count()
+        yield "api.answers.create", lambda: self.create(
+            api, answer, next(counter)
+        )
+
+        bodies = itertools.cycle(self.sample["bodies"])
+        yield "markdown.render", lambda: markdown_format(next(bodies))
+
+    def create(self, path: str, answer, number: int):
+        """POST a new answer and roll it back."""
+        with transaction.atomic():
+            response = self.client.post(
+                path,
+                {
+                    "question": f"Benchmark question {number}?",
+                    "answer": answer.answer,
+                    "status": Answer.STATUS_DRAFT,
+                    "month": answer.month,
+                    "year": answer.year,
+                    "category": answer.category_id,
+                },
+                content_type="application/json",
+            )
+            transaction.set_rollback(True)
+        if response.status_code != 201:
+            raise CommandError(f"POST {path}: {response.status_code}")
+        return response
+
+    def measure(self, func, iterations: int, warmup: int) -> dict:
+        for _ in range(warmup):
+            func()
+        # Not CaptureQueriesContext: request_started resets queries_log
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            func()
+
+        durations = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            func()
+            durations.append(time.perf_counter() - start)
+        durations.sort()
+
+        def ms(value):
+            return round(value * 1000, 3)
+
+        return {
+            "iterations": iterations,
+            "queries": len(queries),
+            "mean_ms": ms(statistics.fmean(durations)),
+            "min_ms": ms(durations[0]),
+            "p50_ms": ms(percentile(durations, 50)),
+            "p90_ms": ms(percentile(durations, 90)),
+            "p95_ms": ms(percentile(durations, 95)),
+            "p99_ms": ms(percentile(durations, 99)),
+            "max_ms": ms(durations[-1]),
+            "throughput_rps": round(len(durations) / sum(durations), 1),
+        }
+
+    def get_meta(self, options) -> dict:
+        return {
+            "revision": get_revision(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "answers": Answer.objects.count(),
+            "dataset": options["dataset"],
+            "iterations": options["iterations"],
+            "warmup": options["warmup"],
+            "filters": self.sample["filters"],
+        }
+
+    def compare(self, results: dict, path: Path, threshold: float):
+        try:
+            baseline = json.loads(path.read_text())["results"]
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f"Cannot read baseline {path}: {exc}")
+
+        regressions = []
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            before = baseline[name]["p50_ms"]
+            if before:
+                change = (result["p50_ms"] - before) / before * 100
+            else:
+                # Free before (below the rounding): any cost is a change
+                change = math.inf if result["p50_ms"] else 0.0
+            line = (
+                f"{name:<40} {before:9.2f} -> {result['p50_ms']:9.2f} ms "
+                f"({change:+.1f}%)"
+            )
+            if change > threshold:
+                regressions.append(name)
+                self.stderr.write(self.style.ERROR(line))
+            else:
+                self.stderr.write(line)
+
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} case(s) slower than the baseline by "
+                f"more than {threshold}%: {', '.join(regressions)}"
+            )
+        self.stderr.write(self.style.SUCCESS("No regressions"))
@@ -0,0 +1,73 @@
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from moodlehack.answers.models import Answer
+from moodlehack.answers.serializers import (
+    AnswerListSerializer,
+    AnswerSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare AnswerSerializer with the read-optimized "
+        "AnswerListSerializer used by the answers list endpoint"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=1000,
+            help="Number of answers to serialize (0 for all)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of timed runs (the best one is reported)",
+        )
+
+    def handle(self, *args, **options):
+        limit = options["limit"]
+        repeat = max(options["repeat"], 1)
+        renderer = JSONRenderer()
+
+        instances = Answer.objects.all()
+        rows = Answer.objects.values(*AnswerListSerializer.value_fields)
+        if limit:
+            instances = instances[:limit]
+            rows = rows[:limit]
+
+        def model_path():
+            data = AnswerSerializer(list(instances), many=True).data
+            return renderer.render(data)
+
+        def values_path():
+            data = AnswerListSerializer(list(rows), many=True).data
+            return renderer.render(data)
+
+        if model_path() != values_path():
+            raise CommandError(
+                "AnswerListSerializer output differs from AnswerSerializer"
+            )
+
+        count = len(list(rows))
+        self.stdout.write(f"Answers: {count}, best of {repeat} runs")
+        self.stdout.write("Output: byte-identical")
+
+        results = {}
+        for name, func in (
+            ("AnswerSerializer", model_path),
+            ("AnswerListSerializer", values_path),
+        ):
+            results[name] = min(timeit.repeat(func, number=1, repeat=repeat))
+            self.stdout.write(
+                f"{name:<22} {results[name] * 1000:10.2f} ms "
+                "(query + serialize + render)"
+            )
+
+        speedup = results["AnswerSerializer"] / results["AnswerListSerializer"]
+        self.stdout.write(self.style.SUCCESS(f"Speedup: {speedup:.1f}x"))
@@ -0,0 +1,94 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from moodlehack.answers.models import Answer
+from moodlehack.answers.snapshots import SnapshotBuilder, get_snapshot_dir
+
+
+class Command(BaseCommand):
+    help = (
+        "Build a versioned, compressed offline snapshot of answers "
+        "for local search on clients"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--status",
+            action="append",
+            choices=[choice for choice, _ in Answer.STATUS_CHOICES],
+            help=(
+                "Include answers with this status (repeatable, "
+                "'actual' by default)"
+            ),
+        )
+        parser.add_argument(
+            "--output-dir",
+            type=Path,
+            default=None,
+            help=(
+                "Directory for snapshots (<data_dir>/snapshots by default, "
+                "the only one served by the API)"
+            ),
+        )
+        parser.add_argument(
+            "--keep",
+            type=int,
+            default=3,
+            help="Number of snapshot versions to keep",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild even if the data has not changed",
+        )
+        parser.add_argument(
+            "--every",
+            type=int,
+            default=0,
+            metavar="SECONDS",
+            help=(
+                "Keep running and check for changes every SECONDS "
+                "(for use as a service instead of cron)"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        directory = options["output_dir"] or get_snapshot_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+
+        # Snapshots used to be written under MEDIA_ROOT, served publicly
+        legacy = Path(settings.MEDIA_ROOT) / "snapshots"
+        if legacy.is_dir():
+            self.stderr.write(self.style.WARNING(
+                f"{legacy} is served to anyone as media, remove it: "
+                f"snapshots are now stored in {get_snapshot_dir()}"
+            ))
+        builder = SnapshotBuilder(
+            directory=directory,
+            statuses=options["status"],
+            keep=options["keep"],
+        )
+
+        self.build(builder, options["force"])
+        while options["every"] > 0:
+            time.sleep(options["every"])
+            self.build(builder, force=False)
+
+    def build(self, builder, force):
+        manifest, created = builder.build(force=force)
+        if not created:
+            self.stdout.write(
+                f"Snapshot {manifest['version']} is up to date "
+                f"({manifest['count']} answers)"
+            )
+            return
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Built snapshot {manifest['version']}: "
+                f"{manifest['count']} answers, {manifest['size']} bytes "
+                f"-> {manifest['url']}"
+            )
+        )
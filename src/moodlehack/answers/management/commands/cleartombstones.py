@@ -0,0 +1,41 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from moodlehack.answers.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove records of deleted answers older than the change feed "
+        "retention (django.rest_framework.sync_retention_days)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=None,
+            help="Retention in days instead of the configured one",
+        )
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        if days is None:
+            days = settings.API_SYNC["RETENTION_DAYS"]
+        if days < 0:
+            raise CommandError("--days must not be negative")
+        if not days:
+            self.stdout.write("Tombstones are kept forever (retention 0)")
+            return
+
+        before = timezone.now() - datetime.timedelta(days=days)
+        deleted = Tombstone.objects.prune(before)
+        if options["verbosity"]:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Removed {deleted} tombstones older than {days} days"
+                )
+            )
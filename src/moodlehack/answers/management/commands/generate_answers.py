@@ -0,0 +1,276 @@
+import random
+import secrets
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from moodlehack.answers.models import Answer, Category
+
+
+DEFAULT_TAG = "synthetic"
+
+SUBJECTS_RU = [
+    "Математика", "Физика", "Химия", "История", "Экономика", "Право",
+    "Философия", "Психология", "Информатика", "Социология", "Биология",
+    "Менеджмент", "Маркетинг", "Статистика", "Политология",
+]
+SUBJECTS_EN = [
+    "Mathematics", "Physics", "Chemistry", "History", "Economics",
+    "Law", "Philosophy", "Psychology", "Computer Science", "Sociology",
+    "Biology", "Management", "Marketing", "Statistics", "Linguistics",
+]
+
+WORDS_RU = (
+    "система функция значение процесс анализ модель метод данные "
+    "структура элемент уровень управление развитие организация задача "
+    "решение принцип результат условие понятие закон форма период "
+    "объект субъект фактор показатель средство правило пример свойство "
+    "множество матрица вектор уравнение интеграл предел производная "
+    "рынок спрос предложение капитал стоимость договор норма право "
+    "государство общество личность поведение сознание энергия масса "
+    "скорость сила реакция вещество клетка организм алгоритм программа"
+).split()
+WORDS_EN = (
+    "system function value process analysis model method data "
+    "structure element level management development organization task "
+    "solution principle result condition concept law form period object "
+    "subject factor indicator means rule example property set matrix "
+    "vector equation integral limit derivative market demand supply "
+    "capital cost contract norm state society behavior energy mass "
+    "speed force reaction substance cell organism algorithm program"
+).split()
+
+QUESTION_STARTS_RU = [
+    "Что такое", "Выберите верное определение:", "Укажите",
+    "Как называется", "Какой из вариантов описывает", "Определите",
+    "Что характеризует",
+]
+QUESTION_STARTS_EN = [
+    "What is", "Choose the correct definition of",
+    "Which of the following", "Identify", "What describes", "Define",
+    "Select the",
+]
+
+# Relative frequencies of answer statuses
+STATUS_WEIGHTS = {
+    Answer.STATUS_ACTUAL: 70,
+    Answer.STATUS_OUTDATED: 15,
+    Answer.STATUS_REVIEW: 7,
+    Answer.STATUS_DRAFT: 5,
+    Answer.STATUS_UNKNOWN: 3,
+}
+
+
+class TextGenerator:
+    """
+    Random Russian/English text with log-normal length distributions:
+    mostly short questions and answers with a long tail.
+    """
+
+    def __init__(self, rng: random.Random, russian: float = 0.7):
+        self.rng = rng
+        self.russian = russian
+
+    def words(self, russian: bool, mu: float, sigma: float, cap: int):
+        count = min(max(int(self.rng.lognormvariate(mu, sigma)), 1), cap)
+        return self.rng.choices(WORDS_RU if russian else WORDS_EN, k=count)
+
+    def sentence(self, russian: bool, mu: float = 2.2, cap: int = 40) -> str:
+        text = " ".join(self.words(russian, mu, 0.5, cap))
+        return text[0].upper() + text[1:] + "."
+
+    def question(self, russian: bool) -> str:
+        starts = QUESTION_STARTS_RU if russian else QUESTION_STARTS_EN
+        body = " ".join(self.words(russian, 2.0, 0.6, 60))
+        return f"{self.rng.choice(starts)} {body}?"
+
+    def answer(self, russian: bool) -> str:
+        """Plain text or Markdown (lists, emphasis, code, tables)."""
+        kind = self.rng.random()
+        if kind < 0.5:
+            return self.sentence(russian, mu=1.8)
+        if kind < 0.7:
+            items = self.rng.randint(2, 6)
+            return "\n".join(
+                f"- {self.sentence(russian, mu=1.5)}" for _ in range(items)
+            )
+        if kind < 0.85:
+            term = " ".join(self.words(russian, 0.7, 0.3, 3))
+            remark = " ".join(self.words(russian, 0.7, 0.3, 3))
+            return (
+                f"**{term}** — {self.sentence(russian)}\n\n*{remark}*"
+            )
+        if kind < 0.95:
+            paragraphs = self.rng.randint(2, 5)
+            return "\n\n".join(
+                " ".join(
+                    self.sentence(russian, mu=2.5)
+                    for _ in range(self.rng.randint(2, 6))
+                )
+                for _ in range(paragraphs)
+            )
+        rows = "\n".join(
+            f"| {self.rng.choice(WORDS_RU if russian else WORDS_EN)} "
+            f"| {self.rng.randint(1, 999)} |"
+            for _ in range(self.rng.randint(2, 8))
+        )
+        code = f"`{self.rng.choice(WORDS_EN)}()`"
+        return f"{code}\n\n| key | value |\n| --- | --- |\n{rows}"
+
+    def note(self, russian: bool) -> str:
+        """About a third of answers have a note."""
+        if self.rng.random() < 0.3:
+            return self.sentence(russian, mu=2.0)
+        return ""
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic corpus of categories and answers with "
+        "realistic text lengths, Markdown and status/period spreads for "
+        "load testing"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--answers",
+            type=int,
+            default=1000,
+            help="Number of answers to create",
+        )
+        parser.add_argument(
+            "--categories",
+            type=int,
+            default=20,
+            help="Number of categories to spread answers over",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows per INSERT transaction",
+        )
+        parser.add_argument(
+            "--russian",
+            type=float,
+            default=0.7,
+            help="Share of Russian texts (the rest are English)",
+        )
+        parser.add_argument(
+            "--tag",
+            default=DEFAULT_TAG,
+            help="Tag of generated answers (used by --clear)",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            help=(
+                "Random seed for a reproducible corpus (rerun it with "
+                "--clear, questions must be unique)"
+            ),
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete previously generated answers with the tag first",
+        )
+
+    def handle(self, *args, **options):
+        if options["answers"] < 0:
+            raise CommandError("--answers must not be negative")
+        if options["categories"] < 1:
+            raise CommandError("Need at least one category")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+        if not 0 <= options["russian"] <= 1:
+            raise CommandError("--russian must be between 0 and 1")
+
+        rng = random.Random(options["seed"])
+        tag = options["tag"]
+
+        if options["clear"]:
+            deleted, _ = Answer.objects.filter(tag=tag).delete()
+            self.stdout.write(f"Deleted {deleted} objects tagged '{tag}'")
+
+        categories = self.get_categories(options["categories"])
+        generator = TextGenerator(rng, russian=options["russian"])
+
+        # Recent years are more common
+        this_year = min(timezone.now().year, Answer.MAX_YEAR)
+        self.years = list(range(Answer.MIN_YEAR, this_year + 1))
+        self.year_weights = list(range(1, len(self.years) + 1))
+        self.statuses = list(STATUS_WEIGHTS)
+        self.status_weights = list(STATUS_WEIGHTS.values())
+
+        total = options["answers"]
+        batch_size = options["batch_size"]
+        # Questions are unique: suffix them with a run id and number
+        if options["seed"] is None:
+            run_id = secrets.token_hex(3)
+        else:
+            run_id = f"s{options['seed']}"
+        start = time.perf_counter()
+        created = 0
+        while created < total:
+            size = min(batch_size, total - created)
+            batch = [
+                self.build_answer(
+                    generator, rng, categories, tag,
+                    f"{run_id}-{created + index + 1}",
+                )
+                for index in range(size)
+            ]
+            try:
+                with transaction.atomic():
+                    Answer.objects.bulk_create(batch, batch_size=batch_size)
+            except IntegrityError:
+                raise CommandError(
+                    "Generated questions already exist, use --clear to "
+                    "regenerate a seeded corpus"
+                )
+            created += size
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{created}/{total} answers "
+                f"({created / elapsed:,.0f} rows/s)"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created} answers in {len(categories)} categories "
+            f"in {time.perf_counter() - start:.1f} s"
+        ))
+
+    def get_categories(self, count: int) -> list[Category]:
+        names = []
+        pool = SUBJECTS_RU + SUBJECTS_EN
+        for index in range(count):
+            name = pool[index % len(pool)]
+            if index >= len(pool):
+                name = f"{name} {index // len(pool) + 1}"
+            names.append(name)
+
+        existing = {
+            category.name: category
+            for category in Category.objects.filter(name__in=names)
+        }
+        Category.objects.bulk_create(
+            Category(name=name) for name in names if name not in existing
+        )
+        return list(Category.objects.filter(name__in=names))
+
+    def build_answer(self, generator, rng, categories, tag, number):
+        russian = rng.random() < generator.russian
+        return Answer(
+            question=f"{generator.question(russian)} ({number})",
+            answer=generator.answer(russian),
+            note=generator.note(russian),
+            tag=tag,
+            month=rng.randint(1, 12),
+            year=rng.choices(self.years, weights=self.year_weights)[0],
+            status=rng.choices(
+                self.statuses, weights=self.status_weights
+            )[0],
+            category=rng.choice(categories),
+        )
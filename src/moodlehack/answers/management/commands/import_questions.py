@@ -0,0 +1,147 @@
+from functools import partial
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from moodlehack.answers.importers import (
+    DEFAULT_CATEGORY,
+    AnswerImporter,
+    parse_attempt_review,
+    parse_gift,
+    parse_moodle_xml,
+)
+from moodlehack.answers.models import Answer
+
+
+# Input formats detected by file extension
+FORMATS = {
+    ".xml": "xml",
+    ".gift": "gift",
+    ".txt": "gift",
+    ".html": "html",
+    ".htm": "html",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Import question banks exported from Moodle (Moodle XML or GIFT "
+        "format) and saved quiz attempt review pages (HTML) as answers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "files",
+            nargs="+",
+            type=Path,
+            help=(
+                "Files to import. Directories are searched recursively "
+                "for supported files"
+            ),
+        )
+        parser.add_argument(
+            "--format",
+            choices=["auto", "xml", "gift", "html"],
+            default="auto",
+            help="Input format (detected from file extension by default)",
+        )
+        parser.add_argument(
+            "--category",
+            default=DEFAULT_CATEGORY,
+            help="Category for questions without a category in the file",
+        )
+        parser.add_argument(
+            "--status",
+            choices=[choice for choice, _ in Answer.STATUS_CHOICES],
+            default=Answer.STATUS_ACTUAL,
+            help="Status assigned to imported answers",
+        )
+        parser.add_argument(
+            "--tag",
+            default=None,
+            help="Tag assigned to imported answers",
+        )
+        parser.add_argument(
+            "--update",
+            action="store_true",
+            help="Overwrite answers of questions that already exist",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of questions written per batch",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Show what would be done without executing",
+        )
+
+    def handle(self, *args, **options):
+        importer = AnswerImporter(
+            batch_size=max(options["batch_size"], 1),
+            update=options["update"],
+            dry_run=options["dry_run"],
+            default_category=options["category"],
+            status=options["status"],
+            tag=options["tag"],
+        )
+
+        # All files feed one stream, so batches span small files
+        importer.run(
+            self.iter_questions(options["files"], options["format"]),
+            self.progress,
+        )
+
+        stats = importer.stats
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created: {stats['created']}, "
+                f"updated: {stats['updated']}, "
+                f"skipped: {stats['skipped']}"
+            )
+        )
+        if options["dry_run"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    "This was a dry run. No changes were saved."
+                )
+            )
+
+    def progress(self, stats):
+        self.stdout.write(
+            f"  created: {stats['created']}, updated: {stats['updated']}, "
+            f"skipped: {stats['skipped']}"
+        )
+
+    def iter_questions(self, paths, file_format):
+        for path in self.iter_files(paths):
+            path_format = file_format
+            if path_format == "auto":
+                path_format = FORMATS.get(path.suffix.lower(), "gift")
+
+            self.stdout.write(f"Importing {path} ({path_format})...")
+
+            if path_format == "xml":
+                yield from parse_moodle_xml(str(path))
+                continue
+
+            with path.open(encoding="utf-8-sig", errors="replace") as file:
+                if path_format == "html":
+                    chunks = iter(partial(file.read, 64 * 1024), "")
+                    yield from parse_attempt_review(chunks)
+                else:
+                    yield from parse_gift(file)
+
+    def iter_files(self, paths):
+        for path in paths:
+            if path.is_dir():
+                yield from sorted(
+                    p for p in path.rglob("*")
+                    if p.is_file() and p.suffix.lower() in FORMATS
+                )
+            elif path.is_file():
+                yield path
+            else:
+                raise CommandError(f"File not found: {path}")
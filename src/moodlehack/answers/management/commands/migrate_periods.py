@@ -1,6 +1,19 @@
 from django.core.management.base import BaseCommand
-
-from moodlehack.answers.models import Answer
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    Max,
+    Min,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import ExtractMonth, ExtractYear, Now
+
+from moodlehack.answers.models import Answer, Period
 
 
 class Command(BaseCommand):
@@ -36,6 +49,20 @@ class Command(BaseCommand):
             action="store_true",
             help="Skip migration of status data (only migrate periods)",
         )
+        parser.add_argument(
+            "--batch",
+            action="store_true",
+            help=(
+                "Use set-based UPDATE statements instead of saving "
+                "records one by one"
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of primary keys covered by one batch UPDATE",
+        )
 
     def handle(self, *args, **options):
         force = options["force"]
@@ -43,16 +70,37 @@ class Command(BaseCommand):
         limit = options["limit"]
         skip_periods = options["skip_periods"]
         skip_status = options["skip_status"]
+        batch = options["batch"]
+        batch_size = max(options["batch_size"], 1)
 
         # Get answers for migration
         answers = Answer.objects.all().select_related("period")
 
+        if batch:
+            # Batches walk primary key windows, so limit by pk as well
+            answers = answers.order_by("pk")
+
         if limit:
             answers = answers[:limit]
 
-        total_count = answers.count()
-        migrated_count = 0
-        skipped_count = 0
+        # Collect all statistics in a single aggregate query
+        stats = answers.aggregate(
+            total=Count("pk"),
+            with_period=Count("pk", filter=Q(period__isnull=False)),
+            with_actual=Count("pk", filter=Q(actual__isnull=False)),
+            with_month=Count("pk", filter=Q(month__isnull=False)),
+            with_year=Count("pk", filter=Q(year__isnull=False)),
+            conflicts=Count(
+                "pk",
+                filter=Q(
+                    period__isnull=False,
+                    month__isnull=False,
+                    year__isnull=False,
+                ),
+            ),
+        )
+
+        total_count = stats["total"]
         errors = []
 
         self.stdout.write("\n" + "=" * 60)
@@ -61,17 +109,12 @@ class Command(BaseCommand):
 
         # Show statistics
         self.stdout.write(f"\nTotal answers: {total_count}")
-        period_count = answers.filter(period__isnull=False).count()
-        self.stdout.write(f"With Period relation: {period_count}")
-        month_count = answers.exclude(month__isnull=True).count()
-        self.stdout.write(f"Month field populated: {month_count}")
-        year_count = answers.exclude(year__isnull=True).count()
-        self.stdout.write(f"Year field populated: {year_count}")
+        self.stdout.write(f"With Period relation: {stats['with_period']}")
+        self.stdout.write(f"Month field populated: {stats['with_month']}")
+        self.stdout.write(f"Year field populated: {stats['with_year']}")
 
         # Check for data conflicts
-        conflicts = answers.filter(
-            period__isnull=False, month__isnull=False, year__isnull=False
-        ).count()
+        conflicts = stats["conflicts"]
 
         if conflicts > 0 and not force:
             self.stdout.write(
@@ -100,7 +143,92 @@ class Command(BaseCommand):
         else:
             self.stdout.write("\nEXECUTING MIGRATION...")
 
-        # Process each record
+        if batch:
+            migrated_count, skipped_count = self.migrate_batched(
+                answers, dry_run, batch_size, skip_periods, skip_status
+            )
+        else:
+            migrated_count, skipped_count, errors = self.migrate_records(
+                answers, dry_run, skip_periods, skip_status
+            )
+
+        # Show summary
+        self.stdout.write("\n" + "=" * 60)
+        self.stdout.write("MIGRATION SUMMARY")
+        self.stdout.write("=" * 60)
+
+        if dry_run:
+            self.stdout.write(f"Would update records: {migrated_count}")
+            self.stdout.write(f"Would skip records: {skipped_count}")
+        else:
+            self.stdout.write(f"Updated records: {migrated_count}")
+            self.stdout.write(f"Skipped records: {skipped_count}")
+
+        if errors:
+            self.stdout.write(self.style.ERROR(f"\nErrors: {len(errors)}"))
+            for error in errors[:10]:
+                self.stdout.write(self.style.ERROR(f"  {error}"))
+            if len(errors) > 10:
+                self.stdout.write(
+                    self.style.ERROR(
+                        f"  ... and {len(errors) - 10} more errors"
+                    )
+                )
+        else:
+            self.stdout.write(self.style.SUCCESS("\nNo errors!"))
+
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING(
+                    "\nThis was a dry run. To execute migration "
+                    "run the command without --dry-run flag"
+                )
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS("\nMigration completed successfully!")
+            )
+
+        # Show recommendations
+        if migrated_count > 0:
+            self.stdout.write("\n" + "-" * 60)
+            self.stdout.write("RECOMMENDATIONS:")
+            self.stdout.write("-" * 60)
+
+            if not skip_periods:
+                period_migrated = stats["with_period"]
+
+                if period_migrated > 0:
+                    self.stdout.write(
+                        f"1. {period_migrated} period records were migrated."
+                    )
+                    self.stdout.write(
+                        "   You can now safely remove the 'period' field "
+                        "from Answer model when ready."
+                    )
+
+            if not skip_status:
+                status_migrated = stats["with_actual"]
+
+                if status_migrated > 0:
+                    self.stdout.write(
+                        f"2. {status_migrated} status records were migrated."
+                    )
+                    self.stdout.write(
+                        "   You can now safely remove the 'actual' field "
+                        "from Answer model when ready."
+                    )
+
+    def migrate_records(self, answers, dry_run, skip_periods, skip_status):
+        """
+        Migrate deprecated fields record by record via Model.save().
+
+        Returns a (migrated, skipped, errors) tuple.
+        """
+        migrated_count = 0
+        skipped_count = 0
+        errors = []
+
         for i, answer in enumerate(answers, 1):
             try:
                 would_update = False
@@ -181,73 +309,88 @@ class Command(BaseCommand):
                     )
                 )
 
-        # Show summary
-        self.stdout.write("\n" + "=" * 60)
-        self.stdout.write("MIGRATION SUMMARY")
-        self.stdout.write("=" * 60)
+        return migrated_count, skipped_count, errors
 
-        if dry_run:
-            self.stdout.write(f"Would update records: {migrated_count}")
-            self.stdout.write(f"Would skip records: {skipped_count}")
-        else:
-            self.stdout.write(f"Updated records: {migrated_count}")
-            self.stdout.write(f"Skipped records: {skipped_count}")
+    def migrate_batched(
+        self, answers, dry_run, batch_size, skip_periods, skip_status
+    ):
+        """
+        Migrate deprecated fields with set-based UPDATE statements.
 
-        if errors:
-            self.stdout.write(self.style.ERROR(f"\nErrors: {len(errors)}"))
-            for error in errors[:10]:
-                self.stdout.write(self.style.ERROR(f"  {error}"))
-            if len(errors) > 10:
-                self.stdout.write(
-                    self.style.ERROR(
-                        f"  ... and {len(errors) - 10} more errors"
-                    )
-                )
-        else:
-            self.stdout.write(self.style.SUCCESS("\nNo errors!"))
+        Answers are processed in primary key windows of ``batch_size``.
+        Each window costs one COUNT and at most two UPDATE queries no
+        matter how many rows it holds. Signals and ``auto_now`` are
+        bypassed, so the 'update' timestamp is set explicitly: replicas
+        following the change feed pick the migrated answers up.
 
-        if dry_run:
-            self.stdout.write(
-                self.style.WARNING(
-                    "\nThis was a dry run. To execute migration "
-                    "run the command without --dry-run flag"
-                )
-            )
-        else:
-            self.stdout.write(
-                self.style.SUCCESS("\nMigration completed successfully!")
-            )
+        Returns a (migrated, skipped) tuple.
+        """
+        bounds = answers.aggregate(
+            low=Min("pk"), high=Max("pk"), total=Count("pk")
+        )
+        if not bounds["total"]:
+            return 0, 0
 
-        # Show recommendations
-        if migrated_count > 0:
-            self.stdout.write("\n" + "-" * 60)
-            self.stdout.write("RECOMMENDATIONS:")
-            self.stdout.write("-" * 60)
+        # period -> month, year
+        period_changed = Q(period__period__isnull=False) & ~Q(
+            month=ExtractMonth("period__period"),
+            year=ExtractYear("period__period"),
+        )
+        period_values = Period.objects.filter(pk=OuterRef("period_id"))
+        period_update = {
+            "month": Subquery(
+                period_values.annotate(value=ExtractMonth("period"))
+                .values("value")[:1]
+            ),
+            "year": Subquery(
+                period_values.annotate(value=ExtractYear("period"))
+                .values("value")[:1]
+            ),
+            "update": Now(),
+        }
+
+        # actual -> status
+        status_changed = (
+            Q(actual=True) & ~Q(status=Answer.STATUS_ACTUAL)
+        ) | (Q(actual=False) & ~Q(status=Answer.STATUS_OUTDATED))
+        status_update = {
+            "status": Case(
+                When(actual=True, then=Value(Answer.STATUS_ACTUAL)),
+                default=Value(Answer.STATUS_OUTDATED),
+            ),
+            "update": Now(),
+        }
+
+        changed = Q(pk__in=[])
+        if not skip_periods:
+            changed |= period_changed
+        if not skip_status:
+            changed |= status_changed
+
+        low, high = bounds["low"], bounds["high"]
+        batches = (high - low) // batch_size + 1
+        migrated_count = 0
 
-            if not skip_periods:
-                period_migrated = (
-                    answers.filter(period__isnull=False)
-                    .exclude(month__isnull=True, year__isnull=True)
-                    .count()
-                )
+        for number, start in enumerate(range(low, high + 1, batch_size), 1):
+            window = Answer.objects.filter(
+                pk__gte=start, pk__lt=start + batch_size, pk__lte=high
+            )
+            window_count = window.filter(changed).count()
 
-                if period_migrated > 0:
-                    self.stdout.write(
-                        f"1. {period_migrated} period records were migrated."
-                    )
-                    self.stdout.write(
-                        "   You can now safely remove the 'period' field "
-                        "from Answer model when ready."
-                    )
+            if not dry_run and window_count:
+                with transaction.atomic():
+                    if not skip_periods:
+                        window.filter(period_changed).update(**period_update)
+                    if not skip_status:
+                        window.filter(status_changed).update(**status_update)
 
-            if not skip_status:
-                status_migrated = answers.filter(actual__isnull=False).count()
+            migrated_count += window_count
+            self.stdout.write(
+                f"Batch {number}/{batches}: IDs {start}-"
+                f"{min(start + batch_size - 1, high)}, "
+                f"{window_count} records "
+                f"{'would be updated' if dry_run else 'updated'} "
+                f"({migrated_count} total)"
+            )
 
-                if status_migrated > 0:
-                    self.stdout.write(
-                        f"2. {status_migrated} status records were migrated."
-                    )
-                    self.stdout.write(
-                        "   You can now safely remove the 'actual' field "
-                        "from Answer model when ready."
-                    )
+        return migrated_count, bounds["total"] - migrated_count
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("answers", "0005_answer_note"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="answer",
+            index=models.Index(
+                fields=["year", "month", "update"],
+                name="answer_year_month_update_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="answer",
+            index=models.Index(fields=["status"], name="answer_status_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="answer",
+            index=models.Index(fields=["create"], name="answer_create_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="answer",
+            index=models.Index(fields=["update"], name="answer_update_idx"),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("answers", "0006_answer_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "answer_id",
+                    models.BigIntegerField(verbose_name="Answer ID"),
+                ),
+                (
+                    "deleted",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Deleted"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Tombstone",
+                "verbose_name_plural": "Tombstones",
+                "ordering": ["id"],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("answers", "0007_tombstone"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="answer",
+            name="answer_status_idx",
+        ),
+        migrations.AddIndex(
+            model_name="answer",
+            index=models.Index(
+                fields=["category", "year", "month", "update"],
+                name="answer_category_period_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="answer",
+            index=models.Index(
+                fields=["status", "year", "month", "update"],
+                name="answer_status_period_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("answers", "0008_answer_filter_indexes"),
+    ]
+
+    operations = [
+        # answer_category_period_idx starts with category_id
+        migrations.AlterField(
+            model_name="answer",
+            name="category",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.PROTECT,
+                to="answers.category",
+                verbose_name="Category",
+            ),
+        ),
+    ]
@@ -1,7 +1,7 @@
 import datetime
 from typing import cast
 
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
 from django.utils.text import format_lazy
 from django.utils.translation import gettext_lazy as _
@@ -53,6 +53,39 @@ class Period(models.Model):
         ordering = ["-period"]
 
 
+class AnswerQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        Delete answers and record their tombstones in one bulk insert.
+        Used by queryset and admin bulk deletes.
+
+        No model references answers, so the rows are removed with a
+        single DELETE. QuerySet.delete() would load every answer to send
+        post_delete, which signals.record_tombstone() listens to.
+        """
+        if self.query.is_sliced:
+            raise TypeError("Cannot use 'limit' or 'offset' with delete().")
+        if self._fields is not None:
+            raise TypeError(
+                "Cannot call delete() after .values() or .values_list()"
+            )
+
+        del_query = self._chain()
+        del_query._for_write = True
+        del_query.query.clear_ordering(force=True)
+        with transaction.atomic(using=del_query.db):
+            Tombstone.objects.using(del_query.db).bulk_create(
+                Tombstone(answer_id=pk)
+                for pk in del_query.values_list("pk", flat=True)
+            )
+            deleted = del_query._raw_delete(del_query.db)
+        self._result_cache = None
+        return deleted, {self.model._meta.label: deleted}
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Answer(models.Model):
     """Answer to test questions with period reference."""
 
@@ -165,9 +198,11 @@ class Answer(models.Model):
         auto_now=True,
     )
 
+    # Covered by answer_category_period_idx, which starts with it
     category = models.ForeignKey(
         "Category",
         on_delete=models.PROTECT,
+        db_index=False,
         verbose_name=_("Category"),
     )
 
@@ -194,6 +229,8 @@ class Answer(models.Model):
         )),
     )
 
+    objects = AnswerQuerySet.as_manager()
+
     def get_absolute_url(self):
         return reverse("answers:answer", kwargs={"pk": self.pk})
 
@@ -252,3 +289,68 @@ class Answer(models.Model):
         verbose_name = _("Answer")
         verbose_name_plural = _("Answers")
         ordering = ["-year", "-month", "update"]
+        indexes = [
+            # Year/month/quarter filters and the list ordering
+            models.Index(
+                fields=["year", "month", "update"],
+                name="answer_year_month_update_idx",
+            ),
+            # Category and status filters keep the list ordering
+            models.Index(
+                fields=["category", "year", "month", "update"],
+                name="answer_category_period_idx",
+            ),
+            models.Index(
+                fields=["status", "year", "month", "update"],
+                name="answer_status_period_idx",
+            ),
+            # Range filters on timestamps (e.g. update__gt)
+            models.Index(fields=["create"], name="answer_create_idx"),
+            models.Index(fields=["update"], name="answer_update_idx"),
+        ]
+
+
+class TombstoneQuerySet(models.QuerySet):
+    def newest_id(self) -> int:
+        """Id of the newest tombstone, 0 if there are none."""
+        return self.order_by("-id").values_list("id", flat=True).first() or 0
+
+    def is_pruned(self, position: int) -> bool:
+        """Whether tombstones after 'position' were already pruned."""
+        oldest = self.order_by("id").values_list("id", flat=True).first()
+        return oldest is not None and position < oldest - 1
+
+    def prune(self, before: datetime.datetime) -> int:
+        """
+        Delete tombstones recorded before 'before'. The newest one is
+        kept, so is_pruned() still knows where the pruned range ends.
+        """
+        newest = self.newest_id()
+        deleted, _ = self.filter(deleted__lt=before, id__lt=newest).delete()
+        return deleted
+
+
+class Tombstone(models.Model):
+    """
+    Record of a deleted answer.
+    Lets delta sync clients drop answers they still have a copy of.
+    """
+
+    answer_id = models.BigIntegerField(
+        verbose_name=_("Answer ID"),
+    )
+
+    deleted = models.DateTimeField(
+        _("Deleted"),
+        auto_now_add=True,
+    )
+
+    objects = TombstoneQuerySet.as_manager()
+
+    def __str__(self):
+        return f"#{self.answer_id}"
+
+    class Meta:
+        verbose_name = _("Tombstone")
+        verbose_name_plural = _("Tombstones")
+        ordering = ["id"]
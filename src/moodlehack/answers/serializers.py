@@ -1,5 +1,14 @@
+import base64
+import binascii
+from operator import itemgetter
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import gettext_lazy as _
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
 from .models import Answer, Category, Period
 
@@ -67,12 +76,94 @@ class AnswerSerializer(serializers.ModelSerializer):
             },
         }
 
+    # Fields dropped by the 'compact' profile
+    deprecated_fields = ["period", "actual"]
+    display_fields = [
+        "period_display",
+        "month_display",
+        "quarter",
+        "quarter_display",
+        "status_display",
+    ]
+    profiles = {
+        "full": [],
+        "compact": deprecated_fields + display_fields,
+    }
+
+    # Model columns the derived fields are computed from
+    field_sources = {
+        "period_display": ["month", "year"],
+        "month_display": ["month"],
+        "quarter": ["month"],
+        "quarter_display": ["month", "year"],
+        "status_display": ["status"],
+    }
+
+    @classmethod
+    def select_fields(cls, params) -> list[str] | None:
+        """
+        Resolve the ?fields=, ?omit= and ?profile= query parameters
+        to a list of field names, or None for the full representation.
+        """
+        fields = params.get("fields")
+        omit = params.get("omit")
+        profile = params.get("profile")
+        if not (fields or omit or profile):
+            return None
+
+        errors = {}
+        known = cls.Meta.fields
+
+        if profile and profile not in cls.profiles:
+            errors["profile"] = [
+                _("Unknown profile: {}.").format(profile)
+            ]
+
+        requested = {}
+        for param, value in (("fields", fields), ("omit", omit)):
+            names = [n.strip() for n in (value or "").split(",") if n.strip()]
+            unknown = [n for n in names if n not in known]
+            if unknown:
+                errors[param] = [
+                    _("Unknown field(s): {}.").format(", ".join(unknown))
+                ]
+            requested[param] = set(names)
+
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        excluded = requested["omit"] | set(cls.profiles.get(profile, []))
+        return [
+            name for name in known
+            if (not requested["fields"] or name in requested["fields"])
+            and name not in excluded
+        ]
+
+    @classmethod
+    def source_columns(cls, fields: list[str]) -> list[str]:
+        """Model columns needed to render the given fields."""
+        columns = set()
+        for name in fields:
+            columns.update(cls.field_sources.get(name, [name]))
+        return [
+            name for name in AnswerListSerializer.value_fields
+            if name in columns
+        ]
+
     def get_fields(self):
         """
-        Set deprecated flag for OpenAPI schema generator.
+        Set deprecated flag for OpenAPI schema generator
+        and keep only the fields selected in the serializer context.
         """
         fields = super().get_fields()
 
+        selected = self.context.get("fields")
+        if selected is not None:
+            fields = {
+                name: field for name, field in fields.items()
+                if name in selected
+            }
+
         # drf-spectacular recognizes this attribute during schema generation
         if "period" in fields:
             fields["period"].deprecated = True
@@ -80,3 +171,173 @@ class AnswerSerializer(serializers.ModelSerializer):
             fields["actual"].deprecated = True
 
         return fields
+
+
+class AnswerListSerializer(serializers.BaseSerializer):
+    """
+    Read-only serializer for rows of Answer.objects.values().
+
+    Produces the same representation as AnswerSerializer, but display
+    fields come from lookup tables built once per serializer instead of
+    per-field serialization of model instances.
+    """
+
+    # Columns fetched with QuerySet.values()
+    value_fields = [
+        "id",
+        "question",
+        "answer",
+        "note",
+        "url",
+        "tag",
+        "status",
+        "month",
+        "year",
+        "category",
+        "create",
+        "update",
+        "period",
+        "actual",
+    ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Resolved in the active language of the current request
+        self.month_names = {
+            month: str(name) for month, name in Answer.MONTH_CHOICES
+        }
+        self.status_names = {
+            status: str(name) for status, name in Answer.STATUS_CHOICES
+        }
+        self.datetime_field = serializers.DateTimeField()
+
+        # Sparse fieldset: render only the selected fields
+        self.getters = None
+        selected = self.context.get("fields")
+        if selected is not None:
+            getters = self.get_field_getters()
+            self.getters = [
+                (name, getters.get(name) or itemgetter(name))
+                for name in selected
+            ]
+
+    def get_field_getters(self):
+        """Callables computing derived fields from a row."""
+        months = self.month_names
+        statuses = self.status_names
+        to_datetime = self.datetime_field.to_representation
+
+        def quarter(row):
+            return (row["month"] - 1) // 3 + 1
+
+        return {
+            "period_display": lambda r: f"{months[r['month']]} {r['year']}",
+            "month_display": lambda r: months[r["month"]],
+            "quarter": quarter,
+            "quarter_display": lambda r: f"{r['year']} Q{quarter(r)}",
+            "status_display": lambda r: statuses.get(r["status"], r["status"]),
+            "create": lambda r: to_datetime(r["create"]),
+            "update": lambda r: to_datetime(r["update"]),
+        }
+
+    def to_representation(self, instance):
+        if self.getters is not None:
+            return {name: get(instance) for name, get in self.getters}
+
+        month = instance["month"]
+        year = instance["year"]
+        status = instance["status"]
+        month_name = self.month_names[month]
+        quarter = (month - 1) // 3 + 1
+        to_datetime = self.datetime_field.to_representation
+
+        return {
+            "id": instance["id"],
+            "question": instance["question"],
+            "answer": instance["answer"],
+            "note": instance["note"],
+            "url": instance["url"],
+            "tag": instance["tag"],
+            "status": status,
+            "month": month,
+            "year": year,
+            "category": instance["category"],
+            "period_display": f"{month_name} {year}",
+            "month_display": month_name,
+            "quarter": quarter,
+            "quarter_display": f"{year} Q{quarter}",
+            "status_display": self.status_names.get(status, status),
+            "create": to_datetime(instance["create"]),
+            "update": to_datetime(instance["update"]),
+            # Deprecated fields
+            "period": instance["period"],
+            "actual": instance["actual"],
+        }
+
+
+@extend_schema_field(OpenApiTypes.STR)
+class SyncCursorField(serializers.Field):
+    """
+    Opaque delta sync cursor.
+
+    Holds the (update, id) position of the last answer a client has
+    seen and the id of the last tombstone, so both streams can be
+    resumed without gaps or repeats.
+    """
+
+    default_error_messages = {
+        "invalid": _("Invalid cursor."),
+    }
+
+    def to_internal_value(self, data):
+        try:
+            text = base64.urlsafe_b64decode(data.encode("ascii")).decode()
+            update, answer, tombstone = text.split("|")
+            cursor = {
+                "update": parse_datetime(update) if update else None,
+                "answer": int(answer),
+                "tombstone": int(tombstone),
+            }
+        except (binascii.Error, UnicodeError, ValueError):
+            self.fail("invalid")
+        if update and cursor["update"] is None:
+            self.fail("invalid")
+        return cursor
+
+    def to_representation(self, value):
+        update = value["update"].isoformat() if value["update"] else ""
+        text = f"{update}|{value['answer']}|{value['tombstone']}"
+        return base64.urlsafe_b64encode(text.encode()).decode("ascii")
+
+
+class AnswerChangesParamsSerializer(serializers.Serializer):
+    """Query parameters of the answers change feed."""
+
+    cursor = SyncCursorField(
+        required=False,
+        help_text=_("Cursor returned by the previous sync."),
+    )
+    limit = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        help_text=_("Maximum number of changed and deleted answers."),
+    )
+
+    def validate_limit(self, value):
+        return min(value, settings.API_PAGINATION["MAX_PAGE_SIZE"])
+
+    def validate(self, attrs):
+        attrs.setdefault(
+            "cursor", {"update": None, "answer": 0, "tombstone": 0}
+        )
+        attrs.setdefault("limit", api_settings.PAGE_SIZE)
+        return attrs
+
+
+class AnswerChangesSerializer(serializers.Serializer):
+    """Answers change feed (used for the OpenAPI schema)."""
+
+    changed = AnswerSerializer(many=True)
+    deleted = serializers.ListField(child=serializers.IntegerField())
+    cursor = SyncCursorField()
+    more = serializers.BooleanField()
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Answer, AnswerQuerySet, Tombstone
+
+
+@receiver(post_delete, sender=Answer)
+def record_tombstone(sender, instance, origin=None, using=None, **kwargs):
+    """
+    Record a tombstone for an answer deleted one by one.
+    AnswerQuerySet.delete() already records them in bulk.
+    """
+    if isinstance(origin, AnswerQuerySet):
+        return
+    Tombstone.objects.using(using).create(answer_id=instance.pk)
@@ -0,0 +1,229 @@
+"""
+Offline snapshots of the answer corpus.
+
+A snapshot is a gzip-compressed compact JSON document that clients
+download once per data version and search locally. Files are named
+after a hash of their content, so they never change once written and
+can be cached forever. 'latest.json' points to the current version.
+
+Snapshots hold the whole corpus: they are stored outside MEDIA_ROOT
+and only served by the authenticated API views (see views.py).
+
+Layout of a snapshot::
+
+    {
+        "format": 1,
+        "fields": ["id", "question", ...],
+        "categories": {"1": "Exams", ...},
+        "answers": [[1, "Question", ...], ...]
+    }
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+from collections.abc import Iterator
+from pathlib import Path
+from typing import IO
+
+from django.urls import reverse
+from django.utils import timezone
+
+from moodlehack.fs import paths
+
+from .models import Answer, Category
+
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_PREFIX = "answers-"
+SNAPSHOT_SUFFIX = ".json.gz"
+MANIFEST_NAME = "latest.json"
+SNAPSHOT_NAME = re.compile(
+    rf"^{SNAPSHOT_PREFIX}[0-9a-f]{{16}}{re.escape(SNAPSHOT_SUFFIX)}$"
+)
+
+# Answer columns stored in every snapshot row
+SNAPSHOT_FIELDS = [
+    "id",
+    "question",
+    "answer",
+    "note",
+    "category",
+    "month",
+    "year",
+]
+
+
+def get_snapshot_dir() -> Path:
+    """Directory of snapshot files (not served as media)."""
+    return paths.ensure_exists(paths.data_dir / "snapshots", mode=0o700)
+
+
+def get_snapshot_url(name: str) -> str:
+    return reverse("answers:snapshot-file", kwargs={"name": name})
+
+
+def get_snapshot_path(name: str, directory: Path | None = None) -> Path | None:
+    """Path of an existing snapshot file, None for any other name."""
+    if not SNAPSHOT_NAME.match(name):
+        return None
+    path = (directory or get_snapshot_dir()) / name
+    return path if path.is_file() else None
+
+
+def read_snapshot(
+    file: IO[bytes], chunk_size: int = 64 * 1024
+) -> Iterator[bytes]:
+    """Yield the decompressed JSON document of an open snapshot file."""
+    with file, gzip.GzipFile(fileobj=file, mode="rb") as archive:
+        while chunk := archive.read(chunk_size):
+            yield chunk
+
+
+def read_manifest(directory: Path) -> dict | None:
+    """Return the current manifest or None if there is no snapshot yet."""
+    try:
+        return json.loads((directory / MANIFEST_NAME).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class SnapshotBuilder:
+    """
+    Build versioned snapshots of answers with the given statuses.
+
+    Rows are streamed from the database into the compressor, so memory
+    use does not grow with the corpus. Scheduled runs hash the document
+    first and only compress and write it when the content has changed.
+    A content hash also catches set-based updates (queryset.update()),
+    which don't touch the 'update' timestamps.
+    """
+
+    def __init__(
+        self,
+        directory: Path | None = None,
+        statuses: list[str] | None = None,
+        keep: int = 3,
+        chunk_size: int = 2000,
+    ):
+        self.directory = directory or get_snapshot_dir()
+        self.statuses = statuses or [Answer.STATUS_ACTUAL]
+        self.keep = max(keep, 1)
+        self.chunk_size = chunk_size
+        self.count = 0
+
+    def get_queryset(self):
+        return Answer.objects.filter(status__in=self.statuses)
+
+    def get_digest(self) -> str:
+        """SHA-256 of the snapshot document for the current data."""
+        digest = hashlib.sha256()
+        for chunk in self.iter_chunks():
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def iter_chunks(self):
+        """Yield the snapshot JSON document in encoded chunks."""
+        dumps = json.JSONEncoder(
+            ensure_ascii=False, separators=(",", ":")
+        ).encode
+        categories = {
+            str(pk): name
+            for pk, name in Category.objects.values_list("pk", "name")
+        }
+        yield (
+            f'{{"format":{SNAPSHOT_FORMAT},'
+            f'"fields":{dumps(SNAPSHOT_FIELDS)},'
+            f'"categories":{dumps(categories)},'
+            f'"answers":['
+        ).encode()
+
+        rows = (
+            self.get_queryset()
+            .order_by("pk")
+            .values_list(*SNAPSHOT_FIELDS)
+            .iterator(chunk_size=self.chunk_size)
+        )
+        separator = ""
+        self.count = 0
+        for row in rows:
+            yield f"{separator}{dumps(row)}".encode()
+            separator = ","
+            self.count += 1
+
+        yield b"]}"
+
+    def build(self, force: bool = False) -> tuple[dict, bool]:
+        """
+        Write a new snapshot if the data has changed.
+
+        Returns a (manifest, created) tuple.
+        """
+        manifest = read_manifest(self.directory)
+        if (
+            not force
+            and manifest
+            and (self.directory / manifest["file"]).exists()
+            and manifest["sha256"] == self.get_digest()
+        ):
+            return manifest, False
+
+        digest = hashlib.sha256()
+        tmp_path = self.directory / f".{SNAPSHOT_PREFIX}{os.getpid()}.tmp"
+        try:
+            # mtime=0 keeps the compressed output reproducible
+            with (
+                tmp_path.open("wb") as file,
+                gzip.GzipFile(
+                    filename="", mode="wb", fileobj=file, mtime=0
+                ) as archive,
+            ):
+                for chunk in self.iter_chunks():
+                    digest.update(chunk)
+                    archive.write(chunk)
+
+            version = digest.hexdigest()[:16]
+            name = f"{SNAPSHOT_PREFIX}{version}{SNAPSHOT_SUFFIX}"
+            path = self.directory / name
+            created = not path.exists()
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "version": version,
+            "file": name,
+            "url": get_snapshot_url(name),
+            "sha256": digest.hexdigest(),
+            "count": self.count,
+            "size": path.stat().st_size,
+            "created": timezone.now().isoformat(),
+        }
+        self.write_manifest(manifest)
+        self.prune(keep_name=name)
+        return manifest, created
+
+    def write_manifest(self, manifest: dict) -> None:
+        tmp_path = self.directory / f".{MANIFEST_NAME}.{os.getpid()}.tmp"
+        tmp_path.write_text(json.dumps(manifest, indent=2))
+        os.replace(tmp_path, self.directory / MANIFEST_NAME)
+
+    def prune(self, keep_name: str) -> list[Path]:
+        """
+        Remove all but the newest 'keep' snapshots.
+        Clients still holding an older manifest can finish downloading.
+        """
+        snapshots = sorted(
+            self.directory.glob(f"{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}"),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
+        removed = []
+        for path in snapshots[self.keep:]:
+            if path.name != keep_name:
+                path.unlink(missing_ok=True)
+                removed.append(path)
+        return removed
@@ -2,6 +2,8 @@ import markdown
 from django import template
 from django.utils.safestring import mark_safe
 
+from moodlehack.core.timing import measure
+
 register = template.Library()
 
 
@@ -23,5 +25,6 @@ def markdown_format(text):
         'toc',
     ]
 
-    html_content = markdown.markdown(text, extensions=md_extensions)
+    with measure("md"):
+        html_content = markdown.markdown(text, extensions=md_extensions)
     return mark_safe(html_content)
@@ -1,3 +1,1013 @@
-from django.test import TestCase
+import datetime
+import gzip
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from moodlehack.accounts.authentication import credential_cache
+from moodlehack.core.pagination import CursorPagination
+from moodlehack.core.renderers import ORJSONRenderer, orjson
+from moodlehack.settings.django import DjangoRestFrameworkSettings
+
+from .importers import (
+    AnswerImporter,
+    ImportedQuestion,
+    parse_attempt_review,
+    parse_gift,
+    parse_moodle_xml,
+)
+from .models import Answer, Category, Period, Tombstone
+from .serializers import AnswerSerializer
+from .snapshots import SnapshotBuilder
+
+# Small question banks and review pages for the importers
+TEST_DATA = Path(__file__).with_name("testdata")
+
+# Answers of the standard dataset: several web and API pages
+DATASET_SIZE = 300
+
+# Isolated cache, so cached sessions and credentials don't leak between
+# tests (and tests don't clear the real cache)
+TEST_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "moodlehack-tests",
+    },
+}
+
+# SQLite query plans: a table scan without an index and a sort of the
+# whole result. Partial sorts ("USE TEMP B-TREE FOR RIGHT PART OF ORDER
+# BY") only sort rows sharing the leading index columns and are allowed.
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+TEMP_SORT = re.compile(r"USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)")
+
+
+def generate_dataset():
+    call_command(
+        "generate_answers",
+        answers=DATASET_SIZE,
+        categories=5,
+        seed=1,
+        stdout=StringIO(),
+    )
+
+
+def explain(sql: str, params) -> list[str]:
+    """SQLite query plan of a statement, one detail line per step."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset()
+        cls.user = get_user_model().objects.create_user("tester")
+        cls.token = Token.objects.create(user=cls.user)
+        Period.objects.create(period=datetime.date(2024, 1, 1))
+        cls.answer = Answer.objects.order_by("pk")[DATASET_SIZE // 2]
+        cls.filters = {
+            "category": cls.answer.category_id,
+            "status": cls.answer.status,
+            "year": cls.answer.year,
+            "month": cls.answer.month,
+            "quarter": cls.answer.quarter,
+        }
+
+    def setUp(self):
+        cache.clear()
+        credential_cache.clear()
+        self.client.force_login(self.user)
+        # Token authentication only, without the session of self.client
+        self.api_client = self.client_class(
+            HTTP_AUTHORIZATION=f"Token {self.token.key}"
+        )
+
+    def request(self, method: str, path: str, data=None, **extra):
+        client = self.api_client if path.startswith("/api/") else self.client
+        response = getattr(client, method)(path, data, **extra)
+        self.assertLess(
+            response.status_code, 400, f"{method.upper()} {path}"
+        )
+        return response
+
+    def capture(self, method: str, path: str, data=None, **extra):
+        """SQL statements (with params) executed by a request."""
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            self.request(method, path, data, **extra)
+        return statements
+
+
+class QueryBudgetTests(QueryTestCase):
+    """
+    Queries per view and API endpoint, measured on a warm request.
+    Budgets don't depend on the number of answers, a higher count
+    usually means a lost select_related() or a query per row.
+    """
+
+    def assertQueryBudget(
+        self, budget: int, method: str, path: str, data=None, **extra
+    ):
+        # Warm up sessions, caches and lazy settings first
+        self.request(method, path, data, **extra)
+        with self.assertNumQueries(budget):
+            self.request(method, path, data, **extra)
+
+    def test_answers_list(self):
+        index = reverse("answers:index")
+        htmx = {"HTTP_HX_REQUEST": "true"}
+        # Session, user, count, page and categories of the filter form.
+        # The user is loaded per request: the test cache is per process.
+        self.assertQueryBudget(5, "get", index)
+        self.assertQueryBudget(5, "get", index, {"page": 3})
+        # Live search renders the list only
+        self.assertQueryBudget(4, "get", index, **htmx)
+        self.assertQueryBudget(4, "get", index, {"q": "system"}, **htmx)
+        self.assertQueryBudget(4, "get", index, self.filters, **htmx)
+
+    def test_answer_pages(self):
+        pk = self.answer.pk
+        self.assertQueryBudget(
+            4, "get", reverse("answers:detail", kwargs={"pk": pk})
+        )
+        self.assertQueryBudget(3, "get", reverse("answers:create"))
+        self.assertQueryBudget(
+            4, "get", reverse("answers:update", kwargs={"pk": pk})
+        )
+        self.assertQueryBudget(3, "get", reverse("answers:import"))
+
+    def test_check_question(self):
+        self.assertQueryBudget(
+            3,
+            "post",
+            reverse("answers:check_question"),
+            {"question": self.answer.question},
+        )
+
+    def test_login_page(self):
+        self.client.logout()
+        self.assertQueryBudget(0, "get", reverse("accounts:login"))
+
+    def test_answers_api(self):
+        api = reverse("answers:answer-list")
+        self.assertQueryBudget(2, "get", api)
+        self.assertQueryBudget(2, "get", api, {"search": "system"})
+        # The category filter validates the category
+        self.assertQueryBudget(3, "get", api, self.filters)
+        self.assertQueryBudget(2, "get", api, {"page": 2, "page_size": 50})
+        self.assertQueryBudget(
+            2, "get", api, {"fields": "id,question,category"}
+        )
+        self.assertQueryBudget(
+            1,
+            "get",
+            reverse("answers:answer-detail", kwargs={"pk": self.answer.pk}),
+        )
+        # Tombstone position (start or pruned check), answers, tombstones
+        self.assertQueryBudget(3, "get", reverse("answers:answer-changes"))
+
+    def test_other_api(self):
+        self.assertQueryBudget(2, "get", reverse("answers:category-list"))
+        self.assertQueryBudget(2, "get", reverse("answers:period-list"))
+
+
+@skipUnless(connection.vendor == "sqlite", "SQLite query plans")
+class QueryPlanTests(QueryTestCase):
+    """
+    The list, search and filter queries of the web list and the API
+    must use indexes for filtering and ordering: no table scans and no
+    sorts of the whole result.
+    """
+
+    def assertIndexedPlans(
+        self,
+        method: str,
+        path: str,
+        data=None,
+        allow_scan: bool = False,
+        **extra,
+    ):
+        table = Answer._meta.db_table
+        statements = [
+            (sql, params)
+            for sql, params in self.capture(method, path, data, **extra)
+            if sql.startswith("SELECT") and f'"{table}"' in sql
+        ]
+        self.assertTrue(statements, f"No queries on {table} for {path}")
+
+        for sql, params in statements:
+            plan = explain(sql, params)
+            message = f"{path} {data or ''}\n{sql}\n" + "\n".join(plan)
+            for step in plan:
+                self.assertIsNone(TEMP_SORT.search(step), message)
+                if not allow_scan:
+                    self.assertIsNone(FULL_SCAN.match(step), message)
+
+    def test_answers_list(self):
+        index = reverse("answers:index")
+        htmx = {"HTTP_HX_REQUEST": "true"}
+        self.assertIndexedPlans("get", index)
+        self.assertIndexedPlans("get", index, {"page": 5})
+        for name, value in self.filters.items():
+            with self.subTest(filter=name):
+                self.assertIndexedPlans("get", index, {name: value}, **htmx)
+        self.assertIndexedPlans(
+            "get",
+            index,
+            {"category": self.answer.category_id, "year": self.answer.year},
+            **htmx,
+        )
+
+    def test_answers_search(self):
+        # Substring search (LIKE '%...%') can't use a B-tree index and
+        # counts matches with a scan, but pages must not be sorted
+        self.assertIndexedPlans(
+            "get",
+            reverse("answers:index"),
+            {"q": "system"},
+            allow_scan=True,
+            HTTP_HX_REQUEST="true",
+        )
+        self.assertIndexedPlans(
+            "get",
+            reverse("answers:answer-list"),
+            {"search": "system"},
+            allow_scan=True,
+        )
+
+    def test_answers_api(self):
+        api = reverse("answers:answer-list")
+        self.assertIndexedPlans("get", api)
+        for name, value in self.filters.items():
+            with self.subTest(filter=name):
+                self.assertIndexedPlans(
+                    "get", api, {name: value}
+                )
+        self.assertIndexedPlans(
+            "get", reverse("answers:answer-changes")
+        )
+
+    def test_category_lookup(self):
+        # The foreign key has no index of its own (migration 0009): the
+        # PROTECT check on category delete uses the composite index
+        queryset = Answer.objects.filter(category=self.answer.category_id)
+        sql, params = queryset.only("pk").query.sql_with_params()
+        plan = explain(sql, params)
+        self.assertTrue(
+            any("answer_category_period_idx" in step for step in plan),
+            "\n".join(plan),
+        )
+
+
+@skipUnless(orjson, "orjson is not installed")
+@override_settings(
+    TIME_ZONE="Europe/Moscow",
+    REST_FRAMEWORK=DjangoRestFrameworkSettings(json_backend="orjson").as_dict,
+)
+class RendererTests(QueryTestCase):
+    """The orjson backend writes the same API output as the stdlib."""
+
+    def assertSameOutput(self, path: str):
+        response = self.request("get", path)
+        content = ORJSONRenderer().render(response.data)
+        self.assertEqual(json.loads(content), response.json())
+        return response.json()
+
+    def test_answers_api(self):
+        data = self.assertSameOutput(reverse("answers:answer-list"))
+        # Timestamps keep the offset of the current time zone
+        self.assertTrue(data["results"][0]["update"].endswith("+03:00"))
+        data = self.assertSameOutput(
+            reverse("answers:answer-detail", kwargs={"pk": self.answer.pk})
+        )
+        self.assertTrue(data["create"].endswith("+03:00"))
+
+
+class SparseFieldsetTests(QueryTestCase):
+    """?fields=, ?omit= and ?profile= return exactly the selected keys."""
+
+    def get_keys(self, params) -> list[str]:
+        """Keys of a list row, checked against the detail endpoint."""
+        api = reverse("answers:answer-list")
+        row = self.request("get", api, params).json()["results"][0]
+        detail = self.request(
+            "get",
+            reverse("answers:answer-detail", kwargs={"pk": row["id"]}),
+            params,
+        ).json()
+        self.assertEqual(list(detail), list(row))
+        return list(row)
+
+    def assertInvalid(self, params, key: str):
+        response = self.api_client.get(reverse("answers:answer-list"), params)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(key, response.json())
+
+    def test_full(self):
+        self.assertEqual(self.get_keys({}), AnswerSerializer.Meta.fields)
+
+    def test_fields(self):
+        # Serializer order, not the order of the parameter
+        self.assertEqual(
+            self.get_keys({"fields": "category,id,question"}),
+            ["id", "question", "category"],
+        )
+
+    def test_omit(self):
+        expected = [
+            name for name in AnswerSerializer.Meta.fields
+            if name not in ("note", "url")
+        ]
+        self.assertEqual(self.get_keys({"omit": "note,url"}), expected)
+
+    def test_compact_profile(self):
+        self.assertEqual(
+            self.get_keys({"profile": "compact"}),
+            [
+                "id",
+                "question",
+                "answer",
+                "note",
+                "url",
+                "tag",
+                "status",
+                "month",
+                "year",
+                "category",
+                "create",
+                "update",
+            ],
+        )
+
+    def test_combined(self):
+        self.assertEqual(
+            self.get_keys(
+                {
+                    "fields": "id,status,status_display,update",
+                    "omit": "update",
+                    "profile": "compact",
+                }
+            ),
+            ["id", "status"],
+        )
+
+    def test_unknown(self):
+        self.assertInvalid({"fields": "id,bogus"}, "fields")
+        self.assertInvalid({"omit": "bogus"}, "omit")
+        self.assertInvalid({"profile": "bogus"}, "profile")
+
+
+class AnswerFilterTests(QueryTestCase):
+    """API filters return exactly the answers matched by the ORM."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Generated answers are saved within milliseconds: move the
+        # older half a day back, so timestamp ranges split the dataset
+        Answer.objects.filter(pk__lt=cls.answer.pk).update(
+            update=cls.answer.update - datetime.timedelta(days=1)
+        )
+
+    def assertFiltered(self, params, queryset):
+        response = self.request(
+            "get",
+            reverse("answers:answer-list"),
+            {**params, "fields": "id", "page_size": DATASET_SIZE},
+        )
+        ids = {row["id"] for row in response.json()["results"]}
+        expected = set(queryset.values_list("pk", flat=True))
+        # The dataset must exercise the filter from both sides
+        self.assertTrue(0 < len(expected) < DATASET_SIZE, params)
+        self.assertEqual(ids, expected, params)
+
+    def test_status_in(self):
+        statuses = [Answer.STATUS_DRAFT, Answer.STATUS_REVIEW]
+        self.assertFiltered(
+            {"status__in": ",".join(statuses)},
+            Answer.objects.filter(status__in=statuses),
+        )
+
+    def test_period_range(self):
+        year = self.answer.year
+        self.assertFiltered(
+            {"year__gte": year, "month__gte": 4, "month__lte": 9},
+            Answer.objects.filter(year__gte=year, month__range=(4, 9)),
+        )
+        self.assertFiltered(
+            {"year__lte": year - 1},
+            Answer.objects.filter(year__lt=year),
+        )
+
+    def test_update_range(self):
+        update = self.answer.update
+        self.assertFiltered(
+            {"update__gt": update.isoformat()},
+            Answer.objects.filter(update__gt=update),
+        )
+        self.assertFiltered(
+            {"update__lte": update.isoformat()},
+            Answer.objects.filter(update__lte=update),
+        )
+
+    def test_quarter(self):
+        for quarter in range(1, 5):
+            with self.subTest(quarter=quarter):
+                self.assertFiltered(
+                    {"quarter": quarter},
+                    Answer.objects.filter(
+                        month__gt=(quarter - 1) * 3, month__lte=quarter * 3
+                    ),
+                )
+
+    def test_invalid_quarter(self):
+        for quarter in ("0", "5", "Q1"):
+            with self.subTest(quarter=quarter):
+                response = self.api_client.get(
+                    reverse("answers:answer-list"), {"quarter": quarter}
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("quarter", response.json())
+
+
+def uses_pagination(pagination_class) -> bool:
+    path = settings.REST_FRAMEWORK["DEFAULT_PAGINATION_CLASS"]
+    return path == f"{pagination_class.__module__}.{pagination_class.__name__}"
+
+
+@skipUnless(not uses_pagination(CursorPagination), "Page pagination")
+class PaginationTests(QueryTestCase):
+    """Page limits of the default page number pagination."""
+
+    def get(self, params=None):
+        return self.request("get", reverse("answers:answer-list"), params)
+
+    def test_pages(self):
+        data = self.get({"page": 3, "page_size": 100}).json()
+        self.assertEqual(data["count"], DATASET_SIZE)
+        self.assertEqual(len(data["results"]), 100)
+        self.assertIsNone(data["next"])
+
+    @override_settings(
+        API_PAGINATION={**settings.API_PAGINATION, "MAX_PAGE_SIZE": 50}
+    )
+    def test_max_page_size(self):
+        data = self.get({"page_size": DATASET_SIZE}).json()
+        self.assertEqual(len(data["results"]), 50)
+
+    @override_settings(
+        API_PAGINATION={
+            **settings.API_PAGINATION,
+            "LEGACY_UNPAGINATED": True,
+            "MAX_UNPAGINATED": 120,
+        }
+    )
+    def test_legacy_unpaginated(self):
+        # Plain list, truncated to the cap
+        data = self.get().json()
+        self.assertIsInstance(data, list)
+        self.assertEqual(len(data), 120)
+        # Clients asking for a page still get one
+        data = self.get({"page_size": 10}).json()
+        self.assertEqual(len(data["results"]), 10)
+
+    def test_cursor_mode(self):
+        # DRF binds the pagination class when the views are imported, so
+        # cursor mode can only be tested in a process configured for it
+        env = {
+            **os.environ,
+            "MOODLEHACK_DJANGO__REST_FRAMEWORK__PAGINATION": "cursor",
+        }
+        label = f"{__name__}.{CursorPaginationTests.__name__}"
+        result = subprocess.run(
+            [sys.executable, "-m", "moodlehack.manage", "test", label],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertNotIn("skipped", result.stderr, result.stderr)
+
+
+@skipUnless(uses_pagination(CursorPagination), "Cursor pagination")
+class CursorPaginationTests(QueryTestCase):
+    """Run by PaginationTests.test_cursor_mode in a separate process."""
+
+    def follow(self, params) -> list[dict]:
+        """Rows of every page, following the 'next' links."""
+        rows = []
+        url = reverse("answers:answer-list")
+        while url:
+            data = self.request("get", url, params).json()
+            self.assertNotIn("count", data)
+            rows.extend(data["results"])
+            url, params = data["next"], None
+        return rows
+
+    def test_ordering(self):
+        expected = list(
+            Answer.objects.order_by("-update", "-id")
+            .values_list("id", flat=True)
+        )
+        for params in (
+            {"page_size": 70},
+            {"page_size": 70, "fields": "id,question"},
+        ):
+            with self.subTest(**params):
+                rows = self.follow(params)
+                self.assertEqual([row["id"] for row in rows], expected)
+
+    @override_settings(
+        API_PAGINATION={**settings.API_PAGINATION, "MAX_PAGE_SIZE": 50}
+    )
+    def test_max_page_size(self):
+        data = self.request(
+            "get",
+            reverse("answers:answer-list"),
+            {"page_size": DATASET_SIZE},
+        ).json()
+        self.assertEqual(len(data["results"]), 50)
+        self.assertIsNotNone(data["next"])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ChangeFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("tester")
+        cls.category = Category.objects.create(name="Sync")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def create_answers(self, count: int) -> list[Answer]:
+        return [
+            Answer.objects.create(
+                question=f"Question {Answer.objects.count()}",
+                answer="Answer",
+                category=self.category,
+            )
+            for _ in range(count)
+        ]
+
+    def sync(self, cursor=None, status: int = 200, **params) -> dict:
+        if cursor is not None:
+            params["cursor"] = cursor
+        response = self.client.get(reverse("answers:answer-changes"), params)
+        self.assertEqual(response.status_code, status, response.content)
+        return response.json()
+
+    def sync_all(self, cursor=None, limit: int = 100) -> tuple:
+        """Follow the feed to the end: changed ids, deleted ids, cursor."""
+        changed, deleted = [], []
+        while True:
+            data = self.sync(cursor, limit=limit)
+            changed += [answer["id"] for answer in data["changed"]]
+            deleted += data["deleted"]
+            cursor = data["cursor"]
+            if not data["more"]:
+                return changed, deleted, cursor
+
+    def test_initial_sync(self):
+        answers = self.create_answers(5)
+        changed, deleted, _ = self.sync_all(limit=2)
+        self.assertEqual(changed, [answer.pk for answer in answers])
+        self.assertEqual(deleted, [])
+
+    def test_updates_and_creates(self):
+        first, second, third = self.create_answers(3)
+        _, _, cursor = self.sync_all()
+        self.assertEqual(self.sync(cursor)["changed"], [])
+
+        first.answer = "Changed"
+        first.save()
+        fourth, = self.create_answers(1)
+        changed, _, cursor = self.sync_all(cursor)
+        self.assertEqual(changed, [first.pk, fourth.pk])
+
+    def test_same_update_time(self):
+        # Pages split answers with the same timestamp: the id decides
+        answers = self.create_answers(5)
+        Answer.objects.update(update=timezone.now())
+        changed, _, cursor = self.sync_all(limit=2)
+        self.assertEqual(changed, [answer.pk for answer in answers])
+        self.assertEqual(self.sync(cursor)["changed"], [])
+
+    def test_single_delete(self):
+        first, second = self.create_answers(2)
+        _, _, cursor = self.sync_all()
+        pk = first.pk
+        first.delete()
+        _, deleted, _ = self.sync_all(cursor)
+        self.assertEqual(deleted, [pk])
+
+    def test_queryset_delete(self):
+        answers = self.create_answers(5)
+        _, _, cursor = self.sync_all()
+        queryset = Answer.objects.filter(pk__in=[a.pk for a in answers[1:4]])
+        # Ids, tombstones and the delete: answers aren't loaded
+        with CaptureQueriesContext(connection) as context:
+            deleted = queryset.delete()
+        self.assertEqual(deleted, (3, {"answers.Answer": 3}))
+        self.assertEqual(
+            [query["sql"].split()[0] for query in context.captured_queries],
+            ["SAVEPOINT", "SELECT", "INSERT", "DELETE", "RELEASE"],
+        )
+        self.assertEqual(Tombstone.objects.count(), 3)
+        _, deleted, _ = self.sync_all(cursor, limit=2)
+        self.assertEqual(deleted, [a.pk for a in answers[1:4]])
+
+    def test_initial_sync_skips_old_deletes(self):
+        first, second = self.create_answers(2)
+        first.delete()
+        changed, deleted, cursor = self.sync_all()
+        self.assertEqual((changed, deleted), ([second.pk], []))
+        pk = second.pk
+        second.delete()
+        _, deleted, _ = self.sync_all(cursor)
+        self.assertEqual(deleted, [pk])
+
+    def test_invalid_cursor(self):
+        self.sync("not a cursor", status=400)
+
+    def test_pruned_cursor(self):
+        pks = [answer.pk for answer in self.create_answers(4)]
+        _, _, cursor = self.sync_all()
+        Answer.objects.all().delete()
+        Tombstone.objects.update(
+            deleted=timezone.now() - datetime.timedelta(days=100)
+        )
+
+        call_command("cleartombstones", days=90, verbosity=0)
+        # The newest tombstone marks the end of the pruned range
+        self.assertEqual(
+            list(Tombstone.objects.values_list("answer_id", flat=True)),
+            [pks[-1]],
+        )
+        self.sync(cursor, status=410)
+        # A fresh sync starts after the pruned deletes
+        changed, deleted, _ = self.sync_all()
+        self.assertEqual((changed, deleted), ([], []))
+
+    def test_cleanup_keeps_recent(self):
+        pks = [answer.pk for answer in self.create_answers(2)]
+        _, _, cursor = self.sync_all()
+        Answer.objects.all().delete()
+        call_command("cleartombstones", verbosity=0)
+        self.assertEqual(Tombstone.objects.count(), 2)
+        _, deleted, _ = self.sync_all(cursor)
+        self.assertEqual(deleted, pks)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("tester")
+        category = Category.objects.create(name="Snapshots")
+        for number in range(3):
+            Answer.objects.create(
+                question=f"Question {number}",
+                answer="Answer",
+                category=category,
+            )
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        for module in ("snapshots", "views"):
+            patcher = mock.patch(
+                f"moodlehack.answers.{module}.get_snapshot_dir",
+                return_value=self.directory,
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.builder = SnapshotBuilder(directory=self.directory)
+        self.manifest, _ = self.builder.build()
+        self.client.force_login(self.user)
+
+    def get_manifest(self, **headers):
+        return self.client.get(
+            reverse("answers:snapshot-latest"), headers=headers
+        )
+
+    def get_file(self, **headers):
+        return self.client.get(self.manifest["url"], headers=headers)
+
+    def test_login_required(self):
+        self.client.logout()
+        self.assertIn(self.get_manifest().status_code, (401, 403))
+        self.assertIn(self.get_file().status_code, (401, 403))
+
+    def test_manifest(self):
+        response = self.get_manifest()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 3)
+        self.assertEqual(response.json()["url"], self.manifest["url"])
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+
+        response = self.get_manifest(if_none_match=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_no_snapshot(self):
+        (self.directory / "latest.json").unlink()
+        self.assertEqual(self.get_manifest().status_code, 404)
+
+    def test_gzip_download(self):
+        response = self.get_file(accept_encoding="gzip, deflate, br")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("Accept-Encoding", response["Vary"])
+        content = gzip.decompress(b"".join(response.streaming_content))
+        self.assertEqual(len(json.loads(content)["answers"]), 3)
+
+        response = self.get_file(if_none_match=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_identity_download(self):
+        for accept_encoding in ("", "identity", "gzip;q=0, br"):
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.get_file(accept_encoding=accept_encoding)
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.has_header("Content-Encoding"))
+                content = b"".join(response.streaming_content)
+                self.assertEqual(len(json.loads(content)["answers"]), 3)
+
+    def test_unknown_file(self):
+        for name in ("latest.json", "answers-0123456789abcdef.json.gz"):
+            with self.subTest(name=name):
+                response = self.client.get(
+                    reverse("answers:snapshot-file", kwargs={"name": name})
+                )
+                self.assertEqual(response.status_code, 404)
+
+    def test_rebuild(self):
+        _, created = self.builder.build()
+        self.assertFalse(created)
+        # Set-based updates don't touch the 'update' timestamps
+        Answer.objects.filter(question="Question 1").update(answer="New")
+        manifest, created = self.builder.build()
+        self.assertTrue(created)
+        self.assertNotEqual(manifest["version"], self.manifest["version"])
+
+
+class ImporterTests(TestCase):
+    def test_moodle_xml(self):
+        items = list(parse_moodle_xml(str(TEST_DATA / "questions.xml")))
+        self.assertEqual(items, [
+            ImportedQuestion(
+                "How many layers does the OSI model have?", "7", "Networks"
+            ),
+            ImportedQuestion(
+                "Which protocols are connectionless?",
+                "- UDP\n- ICMP",
+                "Networks",
+            ),
+            ImportedQuestion(
+                "Match the statements.",
+                "- SELECT → DQL\n- INSERT → DML",
+                "SQL",
+            ),
+        ])
+
+    def test_gift(self):
+        with (TEST_DATA / "questions.gift").open(encoding="utf-8") as file:
+            items = list(parse_gift(file))
+        self.assertEqual(items, [
+            ImportedQuestion(
+                "How many layers does the OSI model have?", "7", "Networks"
+            ),
+            ImportedQuestion(
+                "The default HTTP port is _____ .", "80", "Networks"
+            ),
+            ImportedQuestion(
+                "Which protocols are connectionless?",
+                "- UDP\n- ICMP",
+                "Networks",
+            ),
+            ImportedQuestion(
+                "SQL is a declarative language.", "True", "Databases"
+            ),
+            ImportedQuestion(
+                "Match the statements.",
+                "- SELECT → DQL\n- INSERT → DML",
+                "Databases",
+            ),
+            ImportedQuestion("A colon needs escaping:", "a{b}", "Databases"),
+        ])
+
+    def test_attempt_review(self):
+        page = (TEST_DATA / "review.html").read_text(encoding="utf-8")
+        expected = [
+            ImportedQuestion("How many layers does the OSI model have?", "7"),
+            ImportedQuestion(
+                "Which protocols are connectionless?", "- UDP\n- ICMP"
+            ),
+            ImportedQuestion("Правильный ответ на вопрос?", "да"),
+        ]
+        # Chunk boundaries fall inside tags and text
+        for size in (len(page), 100, 7):
+            with self.subTest(chunk_size=size):
+                chunks = [
+                    page[i:i + size] for i in range(0, len(page), size)
+                ]
+                self.assertEqual(
+                    list(parse_attempt_review(chunks)), expected
+                )
+
+    def test_duplicate_category_names(self):
+        first = Category.objects.create(name="Networks")
+        Category.objects.create(name="Networks")
+        importer = AnswerImporter(batch_size=2)
+        stats = importer.run(
+            parse_moodle_xml(str(TEST_DATA / "questions.xml"))
+        )
+        self.assertEqual(
+            stats, {"created": 3, "updated": 0, "skipped": 0}
+        )
+        self.assertEqual(
+            Answer.objects.filter(category=first).count(), 2
+        )
+        self.assertTrue(Category.objects.filter(name="SQL").exists())
+
+    def test_import_view(self):
+        self.client.force_login(
+            get_user_model().objects.create_user("tester")
+        )
+        Category.objects.create(name="Networks")
+        selected = Category.objects.create(name="Networks")
+        page = (TEST_DATA / "review.html").read_bytes()
+        response = self.client.post(
+            reverse("answers:import"),
+            {
+                "files": [SimpleUploadedFile("review.html", page)],
+                "html": page.decode(),
+                "category": selected.pk,
+                "status": Answer.STATUS_REVIEW,
+            },
+            follow=True,
+        )
+        self.assertRedirects(response, reverse("answers:index"))
+        self.assertContains(response, "Imported 3 new answers, 3 already")
+        # The selected category, not the oldest one of the same name
+        self.assertEqual(
+            set(Answer.objects.values_list("category", "status")),
+            {(selected.pk, Answer.STATUS_REVIEW)},
+        )
+        self.assertEqual(Answer.objects.count(), 3)
+
+    def test_import_command(self):
+        call_command(
+            "import_questions", str(TEST_DATA), stdout=StringIO()
+        )
+        # The same questions in several files are imported once
+        self.assertEqual(Answer.objects.count(), 7)
+        out = StringIO()
+        call_command("import_questions", str(TEST_DATA), stdout=out)
+        self.assertIn("Created: 0, updated: 0, skipped: 12", out.getvalue())
+
+
+class GenerateAnswersTests(TestCase):
+    def test_invalid_options(self):
+        errors = {
+            "--answers must not be negative": {"answers": -1},
+            "Need at least one category": {"categories": 0},
+            "--batch-size must be positive": {"batch_size": 0},
+            "--russian must be between 0 and 1": {"russian": 1.5},
+        }
+        for message, options in errors.items():
+            with self.subTest(message), self.assertRaisesMessage(
+                CommandError, message
+            ):
+                call_command("generate_answers", **options)
+        self.assertFalse(Answer.objects.exists())
+
+
+class MigratePeriodsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Legacy")
+        march = Period.objects.create(period=datetime.date(2024, 3, 1))
+        empty = Period.objects.create(period=None)
+        legacy = [
+            # period, actual, month, year, status
+            (march, True, 1, 2023, Answer.STATUS_OUTDATED),
+            (march, False, 1, 2023, Answer.STATUS_ACTUAL),
+            (march, None, 1, 2023, Answer.STATUS_DRAFT),
+            (march, True, 3, 2024, Answer.STATUS_ACTUAL),
+            (empty, False, 5, 2025, Answer.STATUS_OUTDATED),
+            (empty, False, 5, 2025, Answer.STATUS_REVIEW),
+            (None, True, 6, 2025, Answer.STATUS_UNKNOWN),
+            (None, None, 7, 2025, Answer.STATUS_REVIEW),
+        ]
+        for number, (period, actual, month, year, status) in enumerate(
+            legacy
+        ):
+            Answer.objects.create(
+                question=f"Legacy question {number}",
+                answer="Answer",
+                category=category,
+                period=period,
+                actual=actual,
+                month=month,
+                year=year,
+                status=status,
+            )
+        # Last synced a day ago, so any migration time is newer
+        Answer.objects.update(
+            update=timezone.now() - datetime.timedelta(days=1)
+        )
+        # Rows whose month, year or status the migration changes
+        pks = list(Answer.objects.order_by("pk").values_list("pk", flat=True))
+        cls.migrated = [pks[number] for number in (0, 1, 2, 5, 6)]
+        cls.user = get_user_model().objects.create_user("replica")
+
+    def migrate(self, *args) -> tuple[list, list[str]]:
+        """Migrated values and reported counts, rolled back afterwards."""
+        out = StringIO()
+        with transaction.atomic():
+            call_command(
+                "migrate_periods", "--force", *args, stdout=out
+            )
+            values = list(
+                Answer.objects.order_by("pk").values_list(
+                    "month", "year", "status"
+                )
+            )
+            transaction.set_rollback(True)
+        counts = re.findall(
+            r"^(?:Updated|Skipped) records: \d+$", out.getvalue(), re.M
+        )
+        return values, counts
+
+    def test_batch_matches_records(self):
+        values, counts = self.migrate()
+        self.assertEqual(
+            values,
+            [
+                (3, 2024, Answer.STATUS_ACTUAL),
+                (3, 2024, Answer.STATUS_OUTDATED),
+                (3, 2024, Answer.STATUS_DRAFT),
+                (3, 2024, Answer.STATUS_ACTUAL),
+                (5, 2025, Answer.STATUS_OUTDATED),
+                (5, 2025, Answer.STATUS_OUTDATED),
+                (6, 2025, Answer.STATUS_ACTUAL),
+                (7, 2025, Answer.STATUS_REVIEW),
+            ],
+        )
+        self.assertEqual(
+            counts, ["Updated records: 5", "Skipped records: 3"]
+        )
+        for batch_size in ("1", "3", "5000"):
+            with self.subTest(batch_size=batch_size):
+                self.assertEqual(
+                    self.migrate("--batch", "--batch-size", batch_size),
+                    (values, counts),
+                )
+
+    def test_change_feed(self):
+        # Replicas learn about the migrated answers
+        self.client.force_login(self.user)
+        url = reverse("answers:answer-changes")
+        for args in ((), ("--batch",)):
+            with self.subTest(args=args), transaction.atomic():
+                cursor = self.client.get(url).json()["cursor"]
+                call_command(
+                    "migrate_periods", "--force", *args, stdout=StringIO()
+                )
+                data = self.client.get(url, {"cursor": cursor}).json()
+                self.assertCountEqual(
+                    [answer["id"] for answer in data["changed"]],
+                    self.migrated,
+                )
+                transaction.set_rollback(True)
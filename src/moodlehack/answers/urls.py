@@ -14,11 +14,22 @@ urlpatterns = [
     # WEB URLs
     path("", views.AnswersListView.as_view(), name="index"),
     path("create/", views.AnswerCreateView.as_view(), name="create"),
+    path("import/", views.AttemptImportView.as_view(), name="import"),
     path("<int:pk>/", views.AnswerDetailView.as_view(), name="detail"),
     path("<int:pk>/update/", views.AnswerUpdateView.as_view(), name="update"),
     path("<int:pk>/delete/", views.AnswerDeleteView.as_view(), name="delete"),
     # API URLs
     path("api/v1/", include(router.urls)),
+    path(
+        "api/v1/snapshots/latest/",
+        views.SnapshotManifestView.as_view(),
+        name="snapshot-latest",
+    ),
+    path(
+        "api/v1/snapshots/<str:name>",
+        views.SnapshotFileView.as_view(),
+        name="snapshot-file",
+    ),
     # HTMX URLs
     path(
         "check-question/", views.check_question_exists, name="check_question"
@@ -1,22 +1,64 @@
+import codecs
+import time
+
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
 from django.db.models import Q
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse_lazy
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
 from django.utils.text import format_lazy
 from django.utils.translation import gettext_lazy as _
 from django.views import generic
 from django.views.decorators.http import require_POST
-from django.views.generic import CreateView, DeleteView, UpdateView
-from rest_framework import filters, viewsets
+from django.views.generic import CreateView, DeleteView, FormView, UpdateView
+from django_filters.rest_framework import DjangoFilterBackend
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import (
+    OpenApiParameter,
+    OpenApiResponse,
+    extend_schema,
+    extend_schema_view,
+)
+from rest_framework import filters, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotFound
 from rest_framework.permissions import IsAuthenticated
-
-from .forms import AnswerForm
-from .models import Answer, Category, Period
-from .serializers import AnswerSerializer, CategorySerializer, PeriodSerializer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from moodlehack.core import metrics
+
+from .filters import AnswerFilter
+from .forms import AnswerForm, AttemptImportForm
+from .importers import (
+    DEFAULT_CATEGORY,
+    AnswerImporter,
+    parse_attempt_review,
+)
+from .models import Answer, Category, Period, Tombstone
+from .snapshots import (
+    SNAPSHOT_PREFIX,
+    SNAPSHOT_SUFFIX,
+    get_snapshot_dir,
+    get_snapshot_path,
+    get_snapshot_url,
+    read_manifest,
+    read_snapshot,
+)
+from .serializers import (
+    AnswerChangesParamsSerializer,
+    AnswerChangesSerializer,
+    AnswerListSerializer,
+    AnswerSerializer,
+    CategorySerializer,
+    PeriodSerializer,
+    SyncCursorField,
+)
 
 
 # HTMX views
@@ -124,7 +166,14 @@ class AnswersListView(LoginRequiredMixin, generic.ListView):
         Inject additional choices into the template context
         for filter dropdowns.
         """
+        start = time.perf_counter()
         context = super().get_context_data(**kwargs)
+        if self.request.GET.get("q"):
+            # Evaluate the page now, so only the search itself is timed
+            len(context["object_list"])
+            metrics.registry.observe(
+                "search_duration_seconds", time.perf_counter() - start
+            )
 
         # Provide choice lists directly from the Model
         context["categories"] = Category.objects.all()
@@ -227,6 +276,49 @@ class AnswerDeleteView(LoginRequiredMixin, SuccessMessageMixin, DeleteView):
     success_message = _("Answer successfully deleted!")
 
 
+class AttemptImportView(LoginRequiredMixin, FormView):
+    """
+    Import question/answer pairs from uploaded or pasted
+    Moodle attempt review pages.
+    """
+
+    form_class = AttemptImportForm
+    template_name = "answers/answer_import.html"
+    success_url = reverse_lazy("answers:index")
+
+    def form_valid(self, form):
+        importer = AnswerImporter(
+            default_category=(
+                form.cleaned_data["category"] or DEFAULT_CATEGORY
+            ),
+            status=form.cleaned_data["status"],
+        )
+        stats = importer.run(self.iter_questions(form))
+
+        messages.success(
+            self.request,
+            format_lazy(
+                _("Imported {created} new answers, {skipped} already known."),
+                created=stats["created"],
+                skipped=stats["skipped"],
+            )
+        )
+        return super().form_valid(form)
+
+    def iter_questions(self, form):
+        """Stream every uploaded file and the pasted HTML to the parser."""
+        for upload in form.cleaned_data["files"]:
+            chunks = codecs.iterdecode(upload.chunks(), "utf-8", "replace")
+            yield from parse_attempt_review(chunks)
+        if form.cleaned_data["html"]:
+            yield from parse_attempt_review([form.cleaned_data["html"]])
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["page_title"] = _("Import attempts")
+        return context
+
+
 # API Views
 class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
@@ -242,9 +334,244 @@ class PeriodViewSet(viewsets.ModelViewSet):
     permission_classes = (IsAuthenticated,)
 
 
+SPARSE_FIELDSET_PARAMETERS = [
+    OpenApiParameter(
+        "fields",
+        description=_("Comma-separated list of fields to include."),
+    ),
+    OpenApiParameter(
+        "omit",
+        description=_("Comma-separated list of fields to exclude."),
+    ),
+    OpenApiParameter(
+        "profile",
+        enum=list(AnswerSerializer.profiles),
+        description=_(
+            "Field profile. 'compact' drops deprecated and display fields."
+        ),
+    ),
+]
+
+
+class SyncCursorExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = _(
+        "Deleted answers since this cursor are no longer recorded, "
+        "sync from the beginning."
+    )
+    default_code = "cursor_expired"
+
+
+@extend_schema_view(
+    list=extend_schema(
+        responses=AnswerSerializer(many=True),
+        parameters=SPARSE_FIELDSET_PARAMETERS,
+    ),
+    retrieve=extend_schema(parameters=SPARSE_FIELDSET_PARAMETERS),
+    changes=extend_schema(
+        parameters=[AnswerChangesParamsSerializer]
+        + SPARSE_FIELDSET_PARAMETERS,
+        responses={
+            200: AnswerChangesSerializer,
+            410: OpenApiResponse(description=SyncCursorExpired.default_detail),
+        },
+    ),
+)
 class AnswerViewSet(viewsets.ModelViewSet):
     queryset = Answer.objects.all()
     serializer_class = AnswerSerializer
     permission_classes = (IsAuthenticated,)
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filterset_class = AnswerFilter
     search_fields = ["question", "answer"]
+
+    # Change feed position: answers are replayed in (update, id) order
+    sync_ordering = ("update", "id")
+
+    def get_selected_fields(self):
+        """Sparse fieldset requested by the client (GET only)."""
+        if not hasattr(self, "_selected_fields"):
+            self._selected_fields = None
+            if self.request.method == "GET":
+                self._selected_fields = AnswerSerializer.select_fields(
+                    self.request.query_params
+                )
+        return self._selected_fields
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        selected = self.get_selected_fields()
+
+        if self.action in ("list", "changes"):
+            # Read-optimized path: plain rows instead of model instances
+            if selected is not None:
+                # Cursors read their position from the rows
+                if self.action == "changes":
+                    ordering = list(self.sync_ordering)
+                else:
+                    ordering = [
+                        name.lstrip("-")
+                        for name in getattr(self.paginator, "ordering", ())
+                    ]
+                return queryset.values(
+                    *AnswerSerializer.source_columns(selected + ordering)
+                )
+            return queryset.values(*AnswerListSerializer.value_fields)
+
+        if selected is not None:
+            return queryset.only(*AnswerSerializer.source_columns(selected))
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["fields"] = self.get_selected_fields()
+        return context
+
+    def get_serializer_class(self):
+        if self.action in ("list", "changes"):
+            return AnswerListSerializer
+        return super().get_serializer_class()
+
+    @action(detail=False, filter_backends=[], pagination_class=None)
+    def changes(self, request):
+        """
+        Delta sync: answers created or updated and ids of answers deleted
+        since the given cursor. Without a cursor the feed starts from the
+        beginning, so a replica can be built and kept current in
+        O(changes). Follow the returned cursor while 'more' is true.
+        Cursors older than the tombstone retention are answered with
+        410 Gone.
+        """
+        params = AnswerChangesParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        cursor = dict(params.validated_data["cursor"])
+        limit = params.validated_data["limit"]
+
+        if "cursor" not in request.query_params:
+            # A new replica copies the answers which exist now, only
+            # deletes from here on concern it. Read before the answers,
+            # so a delete in between is still reported.
+            cursor["tombstone"] = Tombstone.objects.newest_id()
+        elif Tombstone.objects.is_pruned(cursor["tombstone"]):
+            raise SyncCursorExpired()
+
+        answers = self.get_queryset().order_by(*self.sync_ordering)
+        if cursor["update"] is not None:
+            answers = answers.filter(
+                Q(update__gt=cursor["update"])
+                | Q(update=cursor["update"], id__gt=cursor["answer"])
+            )
+        changed = list(answers[: limit + 1])
+
+        tombstones = list(
+            Tombstone.objects.filter(id__gt=cursor["tombstone"])
+            .order_by("id")
+            .values_list("id", "answer_id")[: limit + 1]
+        )
+
+        more = len(changed) > limit or len(tombstones) > limit
+        changed = changed[:limit]
+        tombstones = tombstones[:limit]
+
+        if changed:
+            cursor["update"] = changed[-1]["update"]
+            cursor["answer"] = changed[-1]["id"]
+        if tombstones:
+            cursor["tombstone"] = tombstones[-1][0]
+
+        serializer = self.get_serializer(changed, many=True)
+        return Response({
+            "changed": serializer.data,
+            "deleted": [row[1] for row in tombstones],
+            "cursor": SyncCursorField().to_representation(cursor),
+            "more": more,
+        })
+
+
+def accepts_gzip(header: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip responses."""
+    weights = {}
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        weight = 1.0
+        key, _, value = params.strip().partition("=")
+        if key.strip().lower() == "q":
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    return weights.get("gzip", weights.get("*", 0.0)) > 0
+
+
+class SnapshotManifestView(APIView):
+    """
+    Manifest of the current offline snapshot: version, download URL,
+    size and number of answers. Revalidated on every use (ETag).
+    """
+
+    permission_classes = (IsAuthenticated,)
+    cache_control = "private, no-cache"
+
+    @extend_schema(responses={200: OpenApiTypes.OBJECT, 404: None})
+    def get(self, request):
+        manifest = read_manifest(get_snapshot_dir())
+        if manifest is None:
+            raise NotFound(_("No snapshot has been built yet."))
+
+        etag = quote_etag(manifest["version"])
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            manifest["url"] = get_snapshot_url(manifest["file"])
+            response = Response(manifest)
+        response["ETag"] = etag
+        response["Cache-Control"] = self.cache_control
+        return response
+
+
+class SnapshotFileView(APIView):
+    """
+    Download a snapshot version. Files never change, so clients cache
+    them forever. Sent gzip-encoded to clients that accept it and
+    decompressed on the fly otherwise.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    cache_control = "private, max-age=31536000, immutable"
+
+    def perform_content_negotiation(self, request, force=False):
+        # The file is JSON whatever the client accepts, errors too
+        return super().perform_content_negotiation(request, force=True)
+
+    @extend_schema(
+        responses={(200, "application/json"): OpenApiTypes.BINARY, 404: None}
+    )
+    def get(self, request, name):
+        path = get_snapshot_path(name)
+        if path is None:
+            raise NotFound()
+
+        version = name.removeprefix(SNAPSHOT_PREFIX)
+        etag = quote_etag(version.removesuffix(SNAPSHOT_SUFFIX))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                file = path.open("rb")
+            except FileNotFoundError:
+                # Pruned by a newer build in the meantime
+                raise NotFound()
+            if accepts_gzip(request.headers.get("Accept-Encoding", "")):
+                response = FileResponse(
+                    file,
+                    content_type="application/json",
+                    filename=name.removesuffix(".gz"),
+                )
+                response["Content-Encoding"] = "gzip"
+            else:
+                response = StreamingHttpResponse(
+                    read_snapshot(file), content_type="application/json"
+                )
+        response["ETag"] = etag
+        response["Cache-Control"] = self.cache_control
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
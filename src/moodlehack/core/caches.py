@@ -0,0 +1,21 @@
+"""
+Helpers for the configured Django caches.
+
+LocMemCache keeps entries in the memory of each worker process, so
+a value written (or deleted) by one worker is invisible to the others.
+Features that share state between workers (invalidation, counters)
+check is_shared() and fall back to per-process behavior otherwise.
+"""
+
+from django.conf import settings
+
+# Backends whose entries are not seen by other processes
+LOCAL_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+def is_shared(alias: str = "default") -> bool:
+    """Whether a cache alias is shared by all worker processes."""
+    return settings.CACHES[alias]["BACKEND"] not in LOCAL_BACKENDS
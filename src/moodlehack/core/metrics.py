@@ -0,0 +1,168 @@
+"""
+In-process operational metrics.
+
+Counters, gauges and histograms are kept per process in 'registry'.
+The serve app periodically writes every worker's registry to a shared
+directory and sums them for the Prometheus '/metrics' endpoint (see
+moodlehack.serve.metrics), so code here only records values:
+
+    from moodlehack.core import metrics
+
+    metrics.registry.inc("cache_requests_total", cache="x", result="hit")
+    metrics.registry.observe("search_duration_seconds", 0.012)
+"""
+
+import threading
+import time
+
+from django.utils.deprecation import MiddlewareMixin
+
+PREFIX = "moodlehack_"
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    "http_request_duration_seconds": (
+        "histogram",
+        "Request latency by route name",
+        LATENCY_BUCKETS,
+    ),
+    "http_requests_in_flight": (
+        "gauge",
+        "Requests being processed",
+        None,
+    ),
+    "db_queries_total": (
+        "counter",
+        "Executed database queries",
+        None,
+    ),
+    "db_query_duration_seconds_total": (
+        "counter",
+        "Time spent executing database queries",
+        None,
+    ),
+    "cache_requests_total": (
+        "counter",
+        "Cache lookups by cache layer and result (hit/miss)",
+        None,
+    ),
+    "search_duration_seconds": (
+        "histogram",
+        "Live search query latency",
+        LATENCY_BUCKETS,
+    ),
+    "process_resident_memory_bytes": (
+        "gauge",
+        "Resident memory of the worker process",
+        None,
+    ),
+}
+
+
+def label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    """Thread-safe metric values of the current process."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        """Forget all values, e.g. those inherited by a forked worker."""
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self.histograms = {}
+
+    def inc(self, name: str, amount: float = 1.0, **labels) -> None:
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0.0) + amount
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self.lock:
+            self.gauges[(name, label_key(labels))] = value
+
+    def add(self, name: str, amount: float, **labels) -> None:
+        """Change a gauge by 'amount' (e.g. requests in flight)."""
+        key = (name, label_key(labels))
+        with self.lock:
+            self.gauges[key] = self.gauges.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        buckets = METRICS[name][2]
+        key = (name, label_key(labels))
+        with self.lock:
+            values = self.histograms.get(key)
+            if values is None:
+                values = self.histograms[key] = [0] * (len(buckets) + 2)
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    break
+            else:
+                index = len(buckets)
+            values[index] += 1
+            values[-1] += value
+
+    def dump(self) -> dict:
+        """JSON serializable copy of all values."""
+        with self.lock:
+            return {
+                kind: [
+                    [name, list(labels), value]
+                    for (name, labels), value in store.items()
+                ]
+                for kind, store in (
+                    ("counters", self.counters),
+                    ("gauges", self.gauges),
+                    ("histograms", self.histograms),
+                )
+            }
+
+
+registry = Registry()
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    registry.inc(
+        "cache_requests_total", cache=cache, result="hit" if hit else "miss"
+    )
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting all queries and their time."""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        registry.inc("db_queries_total")
+        registry.inc(
+            "db_query_duration_seconds_total", time.perf_counter() - start
+        )
+
+
+def install_query_metrics(sender, connection, **kwargs) -> None:
+    """'connection_created' receiver adding record_query once."""
+    if record_query not in connection.execute_wrappers:
+        # First position: wrappers added later by 'with
+        # connection.execute_wrapper()' are removed with pop()
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class RouteNameMiddleware(MiddlewareMixin):
+    """
+    Expose the resolved view name to the ASGI server, which labels
+    request metrics with it.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        scope = getattr(request, "scope", None)
+        if scope is not None:
+            scope["route_name"] = request.resolver_match.view_name
@@ -0,0 +1,81 @@
+"""
+Pagination classes for Django REST Framework.
+
+Limits come from the API_PAGINATION setting ([django.rest_framework]).
+Both classes can serve plain lists to legacy clients that never ask
+for a page, but such responses are always truncated to a hard cap.
+"""
+
+from django.conf import settings
+from rest_framework import pagination
+from rest_framework.response import Response
+
+
+class LegacyPaginationMixin:
+    """
+    Serve unpaginated lists to clients that don't send any of
+    ``legacy_query_params`` when 'legacy_unpaginated' is enabled.
+    """
+
+    legacy_query_params = ()
+
+    def is_legacy_request(self, request):
+        if not settings.API_PAGINATION["LEGACY_UNPAGINATED"]:
+            return False
+        params = request.query_params
+        return not any(name in params for name in self.legacy_query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.legacy = self.is_legacy_request(request)
+        if self.legacy:
+            limit = settings.API_PAGINATION["MAX_UNPAGINATED"]
+            return list(queryset[:limit])
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.legacy:
+            return Response(data)
+        return super().get_paginated_response(data)
+
+
+class PageNumberPagination(
+    LegacyPaginationMixin, pagination.PageNumberPagination
+):
+    """?page=N&page_size=M with a configurable maximum page size."""
+
+    page_size_query_param = "page_size"
+
+    @property
+    def legacy_query_params(self):
+        return (self.page_query_param, self.page_size_query_param)
+
+    @property
+    def max_page_size(self):
+        return settings.API_PAGINATION["MAX_PAGE_SIZE"]
+
+
+class CursorPagination(LegacyPaginationMixin, pagination.CursorPagination):
+    """
+    Opaque cursors over (update, id), newest changes first.
+
+    Stable under concurrent inserts and costs one indexed range query
+    per page instead of OFFSET scans. Models without an 'update' field
+    are paginated by primary key.
+    """
+
+    ordering = ("-update", "-id")
+    page_size_query_param = "page_size"
+
+    @property
+    def legacy_query_params(self):
+        return (self.cursor_query_param, self.page_size_query_param)
+
+    @property
+    def max_page_size(self):
+        return settings.API_PAGINATION["MAX_PAGE_SIZE"]
+
+    def get_ordering(self, request, queryset, view):
+        names = {field.name for field in queryset.model._meta.get_fields()}
+        if all(field.lstrip("-") in names for field in self.ordering):
+            return self.ordering
+        return ("-pk",)
@@ -0,0 +1,37 @@
+"""
+High-performance JSON parser for Django REST Framework.
+
+Uses orjson when it is installed and falls back to the stdlib based
+DRF JSONParser otherwise, so it is always safe to enable.
+"""
+
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .renderers import ORJSONRenderer, orjson
+
+
+class ORJSONParser(JSONParser):
+    """
+    Parse UTF-8 JSON request bodies with orjson.
+
+    orjson always rejects NaN and Infinity, which matches STRICT_JSON.
+    Other request encodings are left to the stdlib parser.
+    """
+
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+
+        if orjson is None or codecs.lookup(encoding).name != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}") from exc
@@ -0,0 +1,187 @@
+"""
+Slow query log and N+1 query detection.
+
+QueryInspector wraps database execution (connection.execute_wrapper)
+and reports to the 'moodlehack.queries' logger:
+
+    - every statement slower than 'slow_query' seconds;
+    - statements of the same shape (SQL with placeholders) executed
+      'threshold' times or more in one request, typically a missing
+      select_related()/prefetch_related() in a loop or template.
+
+Reports include the view and the origin of the query: the innermost
+moodlehack frame and, for queries triggered while rendering, the
+template line. With 'raise_errors' an N+1 pattern raises NPlusOneError
+instead, which is the default in DEBUG and under the test runner.
+
+The middleware times every query, but tracks shapes only for a sample
+of requests (QUERY_INSPECTOR["SAMPLE_RATE"]) outside DEBUG and tests.
+Tests can use the inspector directly::
+
+    with QueryInspector(threshold=3, raise_errors=True):
+        client.get("/")
+"""
+
+import contextlib
+import logging
+import random
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core import mail
+from django.db import connections
+
+logger = logging.getLogger("moodlehack.queries")
+
+PACKAGE_DIR = str(Path(__file__).resolve().parent.parent)
+# Database wrappers, never the origin of a query
+SKIPPED_FILES = {
+    str(Path(__file__).resolve().with_name(name))
+    for name in ("queries.py", "timing.py", "metrics.py")
+}
+
+# IN (%s, %s, ...) lists differ in length only
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+
+
+class NPlusOneError(Exception):
+    """The same query shape was repeated within one request."""
+
+
+def get_shape(sql: str) -> str:
+    return IN_LIST.sub("IN (...)", sql)
+
+
+def get_origin() -> str:
+    """Innermost application frame and template line of the caller."""
+    origin, template = "", ""
+    frame = sys._getframe(1)
+    while frame and not (origin and template):
+        filename = frame.f_code.co_filename
+        if (
+            not origin
+            and filename.startswith(PACKAGE_DIR)
+            and filename not in SKIPPED_FILES
+        ):
+            origin = (
+                f"{filename[len(PACKAGE_DIR) + 1:]}:{frame.f_lineno} "
+                f"in {frame.f_code.co_name}"
+            )
+        if not template:
+            node = frame.f_locals.get("self")
+            token = getattr(node, "token", None)
+            node_origin = getattr(node, "origin", None)
+            if token is not None and node_origin is not None:
+                name = node_origin.template_name or node_origin.name
+                template = f"{name}:{token.lineno}"
+        frame = frame.f_back
+    return ", ".join(filter(None, (origin, template))) or "unknown"
+
+
+class QueryInspector:
+    """Execute wrapper logging slow queries and N+1 patterns."""
+
+    def __init__(
+        self,
+        slow_query: float = 0.2,
+        threshold: int = 5,
+        track_shapes: bool = True,
+        raise_errors: bool = False,
+        request=None,
+    ):
+        self.slow_query = slow_query
+        self.threshold = threshold
+        self.track_shapes = track_shapes
+        self.raise_errors = raise_errors
+        self.request = request
+        self.shapes = Counter()
+        self.exit_stack = None
+
+    @property
+    def view(self) -> str:
+        if self.request is None:
+            return ""
+        match = getattr(self.request, "resolver_match", None)
+        return match.view_name if match else self.request.path
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.track_shapes and self.threshold:
+            shape = get_shape(sql)
+            self.shapes[shape] += 1
+            if self.shapes[shape] == self.threshold:
+                self.report_repeated(shape)
+
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if self.slow_query and duration >= self.slow_query:
+                logger.warning(
+                    "Slow query (%.1f ms) in %s at %s: %s",
+                    duration * 1000,
+                    self.view or "-",
+                    get_origin(),
+                    sql,
+                    extra={
+                        "duration_ms": round(duration * 1000, 1),
+                        "view": self.view,
+                        "sql": sql,
+                    },
+                )
+
+    def report_repeated(self, shape: str) -> None:
+        message = (
+            f"Query repeated {self.threshold} times in "
+            f"{self.view or '-'} at {get_origin()}, consider "
+            f"select_related() or prefetch_related(): {shape}"
+        )
+        if self.raise_errors:
+            raise NPlusOneError(message)
+        logger.warning(message, extra={"view": self.view, "sql": shape})
+
+    def __enter__(self):
+        self.exit_stack = contextlib.ExitStack()
+        for connection in connections.all():
+            self.exit_stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.exit_stack.close()
+
+
+class QueryInspectorMiddleware:
+    """Inspect the queries of every request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        options = settings.QUERY_INSPECTOR
+        self.slow_query = options["SLOW_QUERY"]
+        self.threshold = options["THRESHOLD"]
+        self.sample_rate = options["SAMPLE_RATE"]
+        self.raise_errors = options["RAISE_ERRORS"]
+
+    @staticmethod
+    def is_strict() -> bool:
+        # The test runner sets up a locmem outbox
+        return settings.DEBUG or hasattr(mail, "outbox")
+
+    def __call__(self, request):
+        strict = self.is_strict()
+        raise_errors = (
+            strict if self.raise_errors is None else self.raise_errors
+        )
+        track_shapes = strict or random.random() < self.sample_rate
+
+        with QueryInspector(
+            slow_query=self.slow_query,
+            threshold=self.threshold,
+            track_shapes=track_shapes,
+            raise_errors=raise_errors,
+            request=request,
+        ):
+            return self.get_response(request)
@@ -0,0 +1,50 @@
+"""
+High-performance JSON renderer for Django REST Framework.
+
+Uses orjson when it is installed and falls back to the stdlib based
+DRF JSONRenderer otherwise, so it is always safe to enable.
+"""
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Render data with orjson.
+
+    Serializer fields format datetimes like with the stdlib renderer
+    (in the current time zone), only datetimes passed as is are
+    serialized natively (RFC 3339, 'Z' for UTC). Unknown types are
+    delegated to the DRF JSONEncoder. Indented output (e.g.
+    'application/json; indent=4') is left to the stdlib renderer.
+    """
+
+    options = (
+        orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b""
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data, default=self.encoder_class().default, option=self.options
+        )
+
+        # Keep the output a strict javascript subset like JSONRenderer
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028")
+            ret = ret.replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
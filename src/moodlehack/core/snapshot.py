@@ -0,0 +1,175 @@
+"""
+Compiled settings snapshot.
+
+Building the settings parses the environment and settings.toml through
+the nested pydantic models and creates the data, media, static and
+cache directories on every process start (and in every server worker).
+'moodlehack compilesettings' resolves them once into a JSON file, and
+core/settings.py loads that file directly while it is up to date:
+without pydantic, validation or filesystem side effects.
+
+The snapshot stores a fingerprint of everything the settings are built
+from: the version and sources of the settings, the application paths,
+the content of settings.toml and the MOODLEHACK_* environment
+variables. Any change makes it stale and the settings are built from
+the configuration again, so a snapshot never hides a configuration
+change. Set MOODLEHACK_SETTINGS_SNAPSHOT to another file, or to 0 to
+disable it.
+
+The file holds the secret key and passwords and is only readable by
+its owner, like settings.toml should be.
+"""
+
+import hashlib
+import ipaddress
+import json
+import os
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+from moodlehack import __version__
+from moodlehack.fs import paths
+
+from .startup import ENV_VAR as PROFILE_ENV_VAR
+
+ENV_VAR = f"{paths.appname.upper()}_SETTINGS_SNAPSHOT"
+FORMAT = 1
+
+# Variables which don't change the settings
+IGNORED_ENV_VARS = {ENV_VAR, PROFILE_ENV_VAR}
+
+# Modules defining the settings, an edit makes the snapshot stale
+SOURCES = [
+    Path(__file__).with_name("settings_cfg.py"),
+    *sorted((Path(__file__).parent.parent / "settings").glob("*.py")),
+]
+
+# JSON has no paths, tuples or networks: {"$tag": value} keeps the types
+TAGS = {
+    "$path": Path,
+    "$tuple": tuple,
+    "$ip_network": ipaddress.ip_network,
+}
+
+
+def snapshot_file() -> Path | None:
+    """Path to the snapshot, None if disabled."""
+    value = os.environ.get(ENV_VAR, "").strip()
+    if value.lower() in ("0", "false", "no", "off"):
+        return None
+    if value:
+        return Path(value)
+    return paths.cache_dir / "settings.json"
+
+
+def fingerprint() -> str:
+    """Hash of the inputs of the settings."""
+    prefix = f"{paths.appname.upper()}_"
+    try:
+        settings_file = hashlib.sha256(
+            paths.settings_file.read_bytes()
+        ).hexdigest()
+    except OSError:
+        settings_file = None
+    inputs = {
+        "version": __version__,
+        "sources": [
+            (source.name, source.stat().st_mtime_ns) for source in SOURCES
+        ],
+        "paths": {name: str(path) for name, path in paths.as_dict.items()},
+        "settings_file": settings_file,
+        "environ": sorted(
+            (name, value)
+            for name, value in os.environ.items()
+            if name.startswith(prefix) and name not in IGNORED_ENV_VARS
+        ),
+    }
+    return hashlib.sha256(
+        json.dumps(inputs, sort_keys=True).encode()
+    ).hexdigest()
+
+
+def encode(value: Any) -> Any:
+    """Convert a setting to JSON types, tagging the others."""
+    if isinstance(value, dict):
+        return {str(key): encode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [encode(item) for item in value]
+    if isinstance(value, tuple):
+        return {"$tuple": [encode(item) for item in value]}
+    if isinstance(value, Path):
+        return {"$path": str(value)}
+    if isinstance(value, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+        return {"$ip_network": str(value)}
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    raise TypeError(
+        f"Can't store {type(value).__name__} in the settings snapshot"
+    )
+
+
+def decode(obj: dict) -> Any:
+    if len(obj) == 1:
+        tag, value = next(iter(obj.items()))
+        if tag in TAGS:
+            return TAGS[tag](value)
+    return obj
+
+
+def collect(module: ModuleType) -> dict[str, Any]:
+    """Django settings (uppercase names) of a settings module."""
+    return {
+        name: getattr(module, name)
+        for name in dir(module)
+        if name.isupper()
+    }
+
+
+def dump(settings: dict[str, Any], path: Path) -> None:
+    """Write the snapshot atomically, readable by the owner only."""
+    content = json.dumps(
+        {
+            "format": FORMAT,
+            "version": __version__,
+            "fingerprint": fingerprint(),
+            "settings": encode(settings),
+        },
+        indent=2,
+    )
+    paths.ensure_exists(path.parent)
+    temp = path.with_name(f".{path.name}.{os.getpid()}")
+    fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, "w") as file:
+            file.write(content + "\n")
+        os.replace(temp, path)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+
+
+def read(path: Path) -> dict[str, Any] | None:
+    """Snapshot content, None if missing or unreadable."""
+    try:
+        data = json.loads(path.read_text(), object_hook=decode)
+    except (OSError, ValueError, TypeError):
+        return None
+    if not isinstance(data, dict) or data.get("format") != FORMAT:
+        return None
+    return data
+
+
+def is_current(data: dict[str, Any]) -> bool:
+    return data.get("fingerprint") == fingerprint()
+
+
+def load() -> dict[str, Any] | None:
+    """Settings of an up-to-date snapshot, None to build them."""
+    path = snapshot_file()
+    if path is None:
+        return None
+    data = read(path)
+    if data is None or not is_current(data):
+        return None
+    return data["settings"]
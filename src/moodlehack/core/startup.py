@@ -0,0 +1,167 @@
+"""
+Startup profiling for the CLI and server workers.
+
+Set MOODLEHACK_PROFILE_STARTUP=1 (or the number of rows to show) to
+print a breakdown of the process start to stderr:
+
+    moodlehack startup: boot phases (settings, app registry, command
+    or ASGI application) and import time per package and module.
+
+The profiler is a meta path finder that times how long each module
+takes to be found and executed, like 'python -X importtime' but per
+process phase and without restarting the interpreter. It must be
+enabled before the imports it measures (see manage.py and
+serve/asgi.py), and only costs anything when the variable is set.
+"""
+
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+ENV_VAR = "MOODLEHACK_PROFILE_STARTUP"
+DEFAULT_LIMIT = 20
+
+
+class ImportProfiler:
+    """Meta path finder timing module imports (find and exec)."""
+
+    def __init__(self):
+        # Module name -> [cumulative, children] seconds
+        self.modules: dict[str, list[float]] = {}
+        self.stack: list[str] = []
+
+    def find_spec(self, fullname, path=None, target=None):
+        start = time.perf_counter()
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        elapsed = time.perf_counter() - start
+
+        loader = spec.loader
+        # Built-in and frozen importers are shared classes, skip them
+        if loader is not None and not isinstance(loader, type):
+            exec_module = getattr(loader, "exec_module", None)
+            if exec_module is not None:
+                loader.exec_module = self.wrap(
+                    loader, exec_module, fullname, elapsed
+                )
+        return spec
+
+    def wrap(self, loader, exec_module, fullname: str, find_time: float):
+        def timed_exec_module(module):
+            # Restore the loader's own method (zip importers are shared)
+            loader.__dict__.pop("exec_module", None)
+            name = module.__name__
+            entry = self.modules[name] = [0.0, 0.0]
+            self.stack.append(name)
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                self.stack.pop()
+                entry[0] = time.perf_counter() - start
+                if name == fullname:
+                    entry[0] += find_time
+                if self.stack:
+                    self.modules[self.stack[-1]][1] += entry[0]
+
+        return timed_exec_module
+
+    def install(self) -> None:
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self) -> None:
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def self_times(self) -> dict[str, float]:
+        return {
+            name: max(cumulative - children, 0.0)
+            for name, (cumulative, children) in self.modules.items()
+        }
+
+
+class StartupProfile:
+    """Boot phases and imports of this process."""
+
+    def __init__(self, limit: int = DEFAULT_LIMIT):
+        self.limit = limit
+        self.start = time.perf_counter()
+        self.phases: list[tuple[str, float]] = []
+        self.imports = ImportProfiler()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def format(self) -> str:
+        total = time.perf_counter() - self.start
+        self_times = self.imports.self_times()
+        lines = [
+            f"Startup profile (pid {os.getpid()}): {total * 1000:.1f} ms, "
+            f"{len(self_times)} modules imported in "
+            f"{sum(self_times.values()) * 1000:.1f} ms",
+            "",
+            "Phases (ms):",
+        ]
+        for name, elapsed in self.phases:
+            lines.append(f"  {name:<32} {elapsed * 1000:9.1f}")
+
+        packages = defaultdict(lambda: [0.0, 0])
+        for name, elapsed in self_times.items():
+            package = packages[name.partition(".")[0]]
+            package[0] += elapsed
+            package[1] += 1
+        lines += ["", "Imports by package (ms, modules):"]
+        for name, (elapsed, count) in sorted(
+            packages.items(), key=lambda item: -item[1][0]
+        )[:self.limit]:
+            lines.append(f"  {name:<32} {elapsed * 1000:9.1f} {count:5}")
+
+        lines += ["", "Slowest imports (cumulative ms, self ms):"]
+        for name, (cumulative, _) in sorted(
+            self.imports.modules.items(), key=lambda item: -item[1][0]
+        )[:self.limit]:
+            lines.append(
+                f"  {name:<48} {cumulative * 1000:9.1f} "
+                f"{self_times[name] * 1000:9.1f}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def report(self) -> None:
+        self.imports.uninstall()
+        sys.stderr.write(self.format())
+
+
+def enable() -> StartupProfile | None:
+    """Start profiling if MOODLEHACK_PROFILE_STARTUP is set."""
+    value = os.environ.get(ENV_VAR, "").strip()
+    if value.lower() in ("", "0", "false", "no", "off"):
+        return None
+    profile = StartupProfile(
+        limit=int(value) if value.isdigit() and int(value) > 1
+        else DEFAULT_LIMIT
+    )
+    profile.imports.install()
+    return profile
+
+
+@contextmanager
+def phase(profile: StartupProfile | None, name: str):
+    """Time a phase when profiling, do nothing otherwise."""
+    if profile is None:
+        yield
+    else:
+        with profile.phase(name):
+            yield
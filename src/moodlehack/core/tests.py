@@ -0,0 +1,100 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+
+from . import queries
+from .queries import NPlusOneError, QueryInspector
+from .timing import ServerTimingMiddleware
+
+TIMING = {"SAMPLE_RATE": 1.0, "HEADER": True, "LOG": False}
+
+
+@override_settings(SERVER_TIMING=TIMING, DEBUG=False, INTERNAL_IPS=[])
+class ServerTimingTests(SimpleTestCase):
+    def get_header(self, user=None, **extra):
+        request = RequestFactory().get("/", **extra)
+        request.user = user or SimpleNamespace(is_staff=False)
+        middleware = ServerTimingMiddleware(lambda request: HttpResponse())
+        return middleware(request).headers.get("Server-Timing")
+
+    def test_hidden(self):
+        self.assertIsNone(self.get_header())
+
+    def test_staff(self):
+        header = self.get_header(SimpleNamespace(is_staff=True))
+        self.assertIn("db;dur=", header)
+
+    @override_settings(INTERNAL_IPS=["10.0.0.1"])
+    def test_internal_ip(self):
+        self.assertIsNotNone(self.get_header(REMOTE_ADDR="10.0.0.1"))
+        self.assertIsNone(self.get_header(REMOTE_ADDR="10.0.0.2"))
+
+    @override_settings(SERVER_TIMING={**TIMING, "HEADER": False})
+    def test_disabled(self):
+        self.assertIsNone(self.get_header(SimpleNamespace(is_staff=True)))
+
+
+class QueryInspectorTests(TestCase):
+    def setUp(self):
+        self.users = get_user_model().objects
+
+    def test_repeated(self):
+        executed = []
+        with self.assertRaises(NPlusOneError) as raised:
+            with QueryInspector(threshold=3, raise_errors=True):
+                for pk in range(5):
+                    executed.append(pk)
+                    self.users.filter(pk=pk).exists()
+        self.assertEqual(executed, [0, 1, 2])
+        message = str(raised.exception)
+        self.assertIn("Query repeated 3 times in - at core/tests.py:", message)
+        self.assertIn("in test_repeated", message)
+
+    def test_below_threshold(self):
+        with QueryInspector(threshold=3, raise_errors=True) as inspector:
+            for pk in range(2):
+                self.users.filter(pk=pk).exists()
+            # Another shape
+            self.users.filter(username="tester").exists()
+        self.assertEqual(sorted(inspector.shapes.values()), [1, 2])
+
+    def test_in_lists(self):
+        self.assertEqual(
+            queries.get_shape('SELECT 1 WHERE "id" IN (%s, %s, %s)'),
+            'SELECT 1 WHERE "id" IN (...)',
+        )
+        with self.assertLogs("moodlehack.queries", "WARNING") as logs:
+            with QueryInspector(threshold=3):
+                for size in range(1, 4):
+                    self.users.filter(pk__in=range(size)).exists()
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("IN (...)", logs.records[0].sql)
+
+    def test_slow_query(self):
+        request = RequestFactory().get("/answers/")
+        request.resolver_match = SimpleNamespace(view_name="answers:index")
+        clock = mock.Mock(side_effect=[10.0, 10.5])
+        with (
+            self.assertLogs("moodlehack.queries", "WARNING") as logs,
+            mock.patch.object(
+                queries, "time", SimpleNamespace(perf_counter=clock)
+            ),
+            QueryInspector(slow_query=0.2, request=request),
+        ):
+            self.users.exists()
+        record = logs.records[0]
+        self.assertEqual(record.view, "answers:index")
+        self.assertEqual(record.duration_ms, 500.0)
+        self.assertIn(
+            "Slow query (500.0 ms) in answers:index at core/tests.py:",
+            record.getMessage(),
+        )
+        self.assertIn("in test_slow_query", record.getMessage())
@@ -0,0 +1,173 @@
+"""
+Per-request timing instrumentation.
+
+For a sample of requests (SERVER_TIMING["SAMPLE_RATE"]) the middleware
+records the number and duration of database queries (through
+connection.execute_wrapper), template and Markdown render time and the
+total handler time. The results are logged to the 'moodlehack.timing'
+logger with structured 'extra' fields. With SERVER_TIMING["HEADER"]
+they are also sent as a Server-Timing header (visible in the devtools
+network tab), but only to staff users, INTERNAL_IPS and everyone in
+DEBUG mode: query counts and timings help probing the server.
+
+Other code can time its own sections with measure(name); it does
+nothing outside of an instrumented request.
+"""
+
+import contextlib
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger("moodlehack.timing")
+
+# Server-Timing metric names and descriptions, in header order
+METRICS = {
+    "db": "Database",
+    "tpl": "Templates",
+    "md": "Markdown",
+}
+
+current_timings: ContextVar["RequestTimings | None"] = ContextVar(
+    "current_timings", default=None
+)
+
+
+class RequestTimings:
+    """Accumulated durations (in seconds) of one request."""
+
+    def __init__(self):
+        self.durations = dict.fromkeys(METRICS, 0.0)
+        self.queries = 0
+        self.active = set()
+
+    def add(self, name: str, duration: float) -> None:
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper counting queries and their time."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.add("db", time.perf_counter() - start)
+
+
+@contextlib.contextmanager
+def measure(name: str):
+    """Add the duration of the block to the current request's timings."""
+    timings = current_timings.get()
+    # Nested sections of the same name (e.g. includes) are counted once
+    if timings is None or name in timings.active:
+        yield
+        return
+    timings.active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.active.discard(name)
+        timings.add(name, time.perf_counter() - start)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        with measure("tpl"):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Django template backend whose templates record render time."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+class ServerTimingMiddleware:
+    """Instrument sampled requests and report their timings."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.SERVER_TIMING["SAMPLE_RATE"]
+        self.header = settings.SERVER_TIMING["HEADER"]
+        self.log = settings.SERVER_TIMING["LOG"]
+
+    def __call__(self, request):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        total = time.perf_counter() - start
+
+        if self.header and self.shows_header(request):
+            response.headers["Server-Timing"] = self.format_header(
+                timings, total
+            )
+        if self.log and logger.isEnabledFor(logging.INFO):
+            self.log_timings(request, response, timings, total)
+        return response
+
+    @staticmethod
+    def shows_header(request) -> bool:
+        """Whether the client may see the timings of its request."""
+        if settings.DEBUG:
+            return True
+        if request.META.get("REMOTE_ADDR") in settings.INTERNAL_IPS:
+            return True
+        user = getattr(request, "user", None)
+        return bool(user and user.is_staff)
+
+    @staticmethod
+    def format_header(timings: RequestTimings, total: float) -> str:
+        metrics = []
+        for name, description in METRICS.items():
+            duration = timings.durations[name]
+            if name == "db":
+                description = f"{timings.queries} queries"
+            elif not duration:
+                continue
+            metrics.append(
+                f'{name};dur={duration * 1000:.1f};desc="{description}"'
+            )
+        metrics.append(f'total;dur={total * 1000:.1f};desc="Total"')
+        return ", ".join(metrics)
+
+    @staticmethod
+    def log_timings(request, response, timings, total) -> None:
+        fields = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "db_queries": timings.queries,
+            "total_ms": round(total * 1000, 1),
+        }
+        for name, duration in timings.durations.items():
+            fields[f"{name}_ms"] = round(duration * 1000, 1)
+        logger.info(
+            "%(method)s %(path)s %(status)s total=%(total_ms)sms "
+            "db=%(db_ms)sms/%(db_queries)s tpl=%(tpl_ms)sms md=%(md_ms)sms",
+            fields,
+            extra=fields,
+        )
@@ -1,8 +1,11 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from rest_framework.authtoken import views
 
+from moodlehack.accounts.views import SignedTokenView
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("accounts/", include("moodlehack.accounts.urls")),
@@ -21,3 +24,8 @@ urlpatterns += [
     # API Token Auth
     path("api/v1/auth", views.obtain_auth_token)
 ]
+
+if settings.API_AUTH["SIGNED_TOKENS"]:
+    urlpatterns += [
+        path("api/v1/auth/signed", SignedTokenView.as_view()),
+    ]
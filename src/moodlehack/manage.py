@@ -6,16 +6,38 @@ import sys
 
 def main():
     """Run administrative tasks."""
+    from moodlehack.core import startup
+
+    # MOODLEHACK_PROFILE_STARTUP=1 reports imports and boot phases
+    profile = startup.enable()
+
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "moodlehack.core.settings")
     try:
-        from django.core.management import execute_from_command_line
+        with startup.phase(profile, "django.core.management"):
+            from django.core.management import execute_from_command_line
     except ImportError as exc:
         raise ImportError(
             "Couldn't import Django. Are you sure it's installed and "
             "available on your PYTHONPATH environment variable? Did you "
             "forget to activate a virtual environment?"
         ) from exc
-    execute_from_command_line(sys.argv)
+
+    if profile is None:
+        execute_from_command_line(sys.argv)
+        return
+
+    import django
+    from django.conf import settings
+
+    with profile.phase("settings"):
+        settings.INSTALLED_APPS
+    with profile.phase("django.setup"):
+        django.setup()
+    try:
+        with profile.phase(f"command: {' '.join(sys.argv[1:2]) or 'help'}"):
+            execute_from_command_line(sys.argv)
+    finally:
+        profile.report()
 
 
 if __name__ == '__main__':
@@ -6,6 +6,14 @@ combining Django ASGI application with Starlette ASGI server and
 static file serving.
 """
 
-from .runner import runserver
+
+def runserver() -> None:
+    """Run Uvicorn server with application settings"""
+    # 'serve' is an installed app: keep Uvicorn and Starlette out of
+    # the startup of every other command
+    from .runner import runserver
+
+    runserver()
+
 
 __all__ = ["runserver"]
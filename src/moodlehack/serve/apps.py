@@ -7,9 +7,17 @@ infrastructure and static/media file routing via Starlette.
 """
 
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
 from django.utils.translation import gettext_lazy as _
 
+from moodlehack.core.metrics import install_query_metrics
+
 
 class ServeConfig(AppConfig):
     name = "moodlehack.serve"
     verbose_name = _("Serve")
+
+    def ready(self):
+        if settings.SERVE["METRICS"]["ENABLED"]:
+            connection_created.connect(install_query_metrics)
@@ -1,26 +1,46 @@
 """ASGI application factory for app."""
 
-from starlette.applications import Starlette
+import os
+import typing as t
 
+from moodlehack.core import startup
 
-def get_asgi_application() -> Starlette:
+if t.TYPE_CHECKING:
+    from starlette.applications import Starlette
+
+
+def get_asgi_application() -> "Starlette":
     """Get or create ASGI application instance."""
+    # MOODLEHACK_PROFILE_STARTUP=1 reports the boot of every worker
+    profile = startup.enable()
+
     import django
     from django.apps import apps
     from django.conf import settings
+    from starlette.applications import Starlette
 
-    from .lifespan import lifespan
-    from .middleware import middleware
-    from .routes import routes
-
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "moodlehack.core.settings")
+    with startup.phase(profile, "settings"):
+        settings.INSTALLED_APPS
     if not apps.ready:
-        django.setup(set_prefix=False)
-
-    return Starlette(
-        debug=settings.DEBUG,
-        routes=routes,
-        middleware=middleware,
-        lifespan=lifespan
-    )
+        with startup.phase(profile, "django.setup"):
+            django.setup(set_prefix=False)
+
+    # Routes import app modules, so load them once apps are ready
+    with startup.phase(profile, "application"):
+        from .lifespan import lifespan
+        from .middleware import middleware
+        from .routes import routes
+
+        application = Starlette(
+            debug=settings.DEBUG,
+            routes=routes,
+            middleware=middleware,
+            lifespan=lifespan
+        )
+
+    if profile is not None:
+        profile.report()
+    return application
 
 application = get_asgi_application()
@@ -0,0 +1,343 @@
+"""
+Asyncio HTTP load generator for 'serve bench'.
+
+Virtual users keep one HTTP/1.1 keep-alive connection each (TCP or a
+UNIX socket) and run weighted scenarios until the deadline:
+
+    login   log in through the login form (new session)
+    search  type a word into live search, one HTMX request per keystroke
+    page    open the answers list, another page of it and an answer
+    api     search and fetch answers through the REST API (token auth)
+
+Every request is recorded with its label, status and latency.
+"""
+
+import asyncio
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from urllib.parse import urlencode
+
+CSRF_INPUT = re.compile(
+    rb'name="csrfmiddlewaretoken" value="([^"]+)"'
+)
+
+SCENARIOS = ("login", "search", "page", "api")
+
+
+class HTTPConnection:
+    """Minimal HTTP/1.1 client connection with keep-alive."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int | None = None,
+        uds: str | None = None,
+        host_header: str = "localhost",
+        timeout: float = 30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.uds = uds
+        self.host_header = host_header
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def connect(self) -> None:
+        if self.uds:
+            self.reader, self.writer = await asyncio.open_unix_connection(
+                self.uds
+            )
+        else:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port
+            )
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self.reader = self.writer = None
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        headers: dict[str, str] | None = None,
+        body: bytes = b"",
+    ) -> tuple[int, list[tuple[str, str]], bytes]:
+        lines = [
+            f"{method} {path} HTTP/1.1",
+            f"Host: {self.host_header}",
+            f"Content-Length: {len(body)}",
+        ]
+        lines.extend(f"{name}: {value}" for name, value in (
+            headers or {}
+        ).items())
+        payload = ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+
+        # A kept-alive connection may have been closed by the server
+        for attempt in range(2):
+            if self.writer is None:
+                await self.connect()
+            try:
+                self.writer.write(payload)
+                await self.writer.drain()
+                return await asyncio.wait_for(
+                    self.read_response(), self.timeout
+                )
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if attempt:
+                    raise
+
+    async def read_response(self):
+        while True:
+            status_line = await self.reader.readline()
+            if not status_line:
+                raise ConnectionResetError("Connection closed")
+            status = int(status_line.split()[1])
+            headers = []
+            while (line := await self.reader.readline()) not in (
+                b"\r\n", b""
+            ):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers.append((name.strip().lower(), value.strip()))
+            # Skip informational responses
+            if status >= 200:
+                break
+
+        values = dict(headers)
+        if "content-length" in values:
+            body = await self.reader.readexactly(
+                int(values["content-length"])
+            )
+        elif values.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while size := int((await self.reader.readline()).strip(), 16):
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            await self.reader.readline()
+            body = b"".join(chunks)
+        else:
+            body = await self.reader.read()
+            await self.close()
+
+        if values.get("connection", "").lower() == "close":
+            await self.close()
+        return status, headers, body
+
+
+@dataclass
+class Stats:
+    latencies: dict[str, list[float]] = field(
+        default_factory=lambda: defaultdict(list)
+    )
+    statuses: dict[str, Counter] = field(
+        default_factory=lambda: defaultdict(Counter)
+    )
+    failures: Counter = field(default_factory=Counter)
+
+    def record(self, label: str, status: int, latency: float) -> None:
+        self.latencies[label].append(latency)
+        self.statuses[label][status] += 1
+
+    def summary(self, elapsed: float) -> list[dict]:
+        rows = []
+        for label in sorted(self.latencies):
+            latencies = sorted(self.latencies[label])
+            count = len(latencies)
+            rows.append({
+                "label": label,
+                "count": count,
+                "errors": sum(
+                    total for status, total in self.statuses[label].items()
+                    if status >= 400
+                ) + self.failures[label],
+                "statuses": dict(self.statuses[label]),
+                "p50": latencies[int(count * 0.50)],
+                "p90": latencies[min(int(count * 0.90), count - 1)],
+                "p99": latencies[min(int(count * 0.99), count - 1)],
+                "max": latencies[-1],
+                "rps": count / elapsed,
+            })
+        return rows
+
+
+class VirtualUser:
+    """One simulated browser (session cookies) and API client (token)."""
+
+    def __init__(self, workload: "Workload"):
+        self.workload = workload
+        self.connection = workload.new_connection()
+        self.cookies: dict[str, str] = {}
+        self.rng = random.Random()
+
+    async def send(
+        self,
+        label: str,
+        method: str,
+        path: str,
+        headers: dict[str, str] | None = None,
+        body: bytes = b"",
+        api: bool = False,
+    ) -> tuple[int, bytes]:
+        headers = dict(headers or {})
+        if api:
+            headers["Authorization"] = f"Token {self.workload.token}"
+        elif self.cookies:
+            headers["Cookie"] = "; ".join(
+                f"{name}={value}" for name, value in self.cookies.items()
+            )
+
+        start = time.perf_counter()
+        try:
+            status, response_headers, content = await self.connection.request(
+                method, path, headers, body
+            )
+        except (OSError, asyncio.TimeoutError, ValueError):
+            self.workload.stats.failures[label] += 1
+            await self.connection.close()
+            return 0, b""
+        self.workload.stats.record(label, status, time.perf_counter() - start)
+
+        for name, value in response_headers:
+            if name == "set-cookie":
+                cookie, _, _ = value.partition(";")
+                cookie_name, _, cookie_value = cookie.partition("=")
+                if cookie_value and cookie_value != '""':
+                    self.cookies[cookie_name] = cookie_value
+                else:
+                    self.cookies.pop(cookie_name, None)
+        return status, content
+
+    async def think(self, seconds: float) -> None:
+        if self.workload.think:
+            await asyncio.sleep(seconds * self.workload.think)
+
+    async def login(self) -> None:
+        self.cookies.clear()
+        path = self.workload.urls["login"]
+        _, content = await self.send("login.form", "GET", path)
+        match = CSRF_INPUT.search(content)
+        body = urlencode({
+            "csrfmiddlewaretoken": match.group(1).decode() if match else "",
+            "username": self.workload.username,
+            "password": self.workload.password,
+        }).encode()
+        await self.send(
+            "login.submit",
+            "POST",
+            path,
+            {"Content-Type": "application/x-www-form-urlencoded"},
+            body,
+        )
+
+    async def search(self) -> None:
+        """Live search: one HTMX request per keystroke."""
+        urls = self.workload.urls
+        word = self.rng.choice(self.workload.words)
+        for length in range(min(3, len(word)), len(word) + 1):
+            await self.send(
+                "search.keystroke",
+                "GET",
+                f"{urls['index']}?{urlencode({'q': word[:length]})}",
+                {"HX-Request": "true"},
+            )
+            await self.think(self.rng.uniform(0.1, 0.3))
+
+    async def page(self) -> None:
+        urls = self.workload.urls
+        await self.send("page.index", "GET", urls["index"])
+        await self.think(self.rng.uniform(0.5, 2.0))
+        page = self.rng.randint(1, self.workload.pages)
+        await self.send("page.list", "GET", f"{urls['index']}?page={page}")
+        await self.think(self.rng.uniform(0.5, 2.0))
+        pk = self.rng.choice(self.workload.pks)
+        await self.send(
+            "page.detail", "GET", urls["detail"].format(pk=pk)
+        )
+        await self.think(self.rng.uniform(1.0, 3.0))
+
+    async def api(self) -> None:
+        urls = self.workload.urls
+        query = urlencode({
+            "search": self.rng.choice(self.workload.words),
+            "page_size": 20,
+        })
+        await self.send(
+            "api.search", "GET", f"{urls['api_list']}?{query}", api=True
+        )
+        pk = self.rng.choice(self.workload.pks)
+        await self.send(
+            "api.detail", "GET", urls["api_detail"].format(pk=pk), api=True
+        )
+
+    async def run(self, deadline: float) -> None:
+        scenarios = list(self.workload.mix)
+        weights = list(self.workload.mix.values())
+        await self.login()
+        try:
+            while time.monotonic() < deadline:
+                scenario = self.rng.choices(scenarios, weights)[0]
+                await getattr(self, scenario)()
+        finally:
+            await self.connection.close()
+
+
+@dataclass
+class Workload:
+    """Target server, credentials, sample data and scenario weights."""
+
+    username: str
+    password: str
+    token: str
+    words: list[str]
+    pks: list[int]
+    mix: dict[str, float]
+    # login, index, detail, api_list and api_detail ('{pk}' placeholders)
+    urls: dict[str, str]
+    host: str = "127.0.0.1"
+    port: int | None = None
+    uds: str | None = None
+    host_header: str = "localhost"
+    pages: int = 10
+    think: float = 1.0
+    stats: Stats = field(default_factory=Stats)
+
+    def new_connection(self) -> HTTPConnection:
+        return HTTPConnection(
+            host=self.host,
+            port=self.port,
+            uds=self.uds,
+            host_header=self.host_header,
+        )
+
+    async def run(self, concurrency: int, duration: float) -> float:
+        """Run virtual users until 'duration' elapses; return elapsed."""
+        start = time.monotonic()
+        deadline = start + duration
+        await asyncio.gather(*(
+            VirtualUser(self).run(deadline) for _ in range(concurrency)
+        ))
+        return time.monotonic() - start
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    """Parse 'search=50,page=25,...' into scenario weights."""
+    mix = {}
+    for part in filter(None, value.split(",")):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}'")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError("The mix needs at least one weighted scenario")
+    return mix
@@ -2,22 +2,260 @@
 Lifespan event handlers for application.
 
 This module contains all startup and shutdown logic for the ASGI application.
+
+Before a worker reports the application started (and Uvicorn accepts
+connections), it is warmed up: templates are compiled, URL patterns
+resolved, translation catalogs loaded, the database verified and lazy
+caches filled, instead of on the first requests. Each step is timed
+and logged. The preforking master (see prefork.py) runs the same steps
+before forking, so workers only repeat what is per process.
 """
 
-from collections.abc import AsyncIterator
+import asyncio
+import contextlib
+import logging
+import time
+from collections.abc import AsyncIterator, Callable
 from contextlib import asynccontextmanager
+from importlib import import_module
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
+from asgiref.sync import sync_to_async
+from django import forms
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connections
+from django.forms.renderers import get_default_renderer
+from django.template import engines
+from django.urls import URLResolver, get_resolver
+from django.utils import translation
+from rest_framework.settings import api_settings
 from starlette.applications import Starlette
 
+from moodlehack.fs import paths
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+# Next to Uvicorn's own startup messages
+startup_logger = logging.getLogger("uvicorn.error")
+
+# Languages of the interface (see settings.django.DjangoI18nSettings)
+WARM_LANGUAGES = ("ru", "en")
+
+# Tombstones are kept for days, pruning them daily is enough
+TOMBSTONE_CLEANUP_INTERVAL = 24 * 60 * 60
+
+
+def find_templates(directory: Path, subdirectory: str = "") -> set[str]:
+    """Names of the HTML templates in a template directory."""
+    return {
+        path.relative_to(directory).as_posix()
+        for path in (directory / subdirectory).rglob("*.html")
+    }
+
+
+def warm_templates() -> str:
+    """Compile the templates of the pages and forms into the cache."""
+    engine = engines["django"]
+    pack = settings.CRISPY_TEMPLATE_PACK
+    names = set()
+    for directory in map(Path, engine.template_dirs):
+        if directory.is_relative_to(paths.base_dir):
+            names.update(find_templates(directory))
+        # Field and layout templates of crispy forms, used by every form
+        elif (directory / pack).is_dir():
+            names.update(find_templates(directory, pack))
+    for name in sorted(names):
+        engine.get_template(name)
+
+    # Widgets are rendered by the form renderer's own engine
+    renderer = get_default_renderer()
+    widgets = find_templates(
+        Path(forms.__file__).parent / "templates", "django/forms"
+    )
+    for name in sorted(widgets):
+        renderer.get_template(name)
+    return f"{len(names)} templates, {len(widgets)} form templates"
+
+
+def warm_urls() -> str:
+    """Import the URLconf and compile the patterns of every route."""
+    resolver = get_resolver()
+    # Builds the reverse lookup tables, compiling every pattern
+    resolver.reverse_dict
+
+    def count(patterns) -> int:
+        return sum(
+            count(pattern.url_patterns)
+            if isinstance(pattern, URLResolver) else 1
+            for pattern in patterns
+        )
+
+    return f"{count(resolver.url_patterns)} patterns"
+
+
+def warm_translations() -> str:
+    """Load the translation catalogs of the interface languages."""
+    for language in WARM_LANGUAGES:
+        with translation.override(language):
+            pass
+    return ", ".join(WARM_LANGUAGES)
+
+
+def warm_database() -> str:
+    """Connect to every database and check it answers."""
+    for alias in connections:
+        connection = connections[alias]
+        connection.ensure_connection()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+    # Connections belong to this thread, requests open their own
+    connections.close_all()
+    return ", ".join(connections)
+
+
+def warm_caches() -> str:
+    """Fill lazy in-process caches and open the cache backends."""
+    # DRF imports the configured classes on first access
+    for name in api_settings.defaults:
+        getattr(api_settings, name)
+    # Imports the password hashers used on login and token checks
+    get_hashers()
+    for alias in settings.CACHES:
+        caches[alias].get("warm-up")
+    return ", ".join(settings.CACHES)
+
+
+# Name, step and whether the worker can't serve when it fails
+WARM_UP_STEPS: list[tuple[str, Callable[[], str], bool]] = [
+    ("templates", warm_templates, False),
+    ("urls", warm_urls, False),
+    ("translations", warm_translations, False),
+    ("database", warm_database, True),
+    ("caches", warm_caches, False),
+]
+
+
+def warm_up() -> None:
+    """Run the warm-up steps, logging the duration of each."""
+    total = time.perf_counter()
+    for name, step, required in WARM_UP_STEPS:
+        start = time.perf_counter()
+        try:
+            detail = step()
+        except Exception:
+            if required:
+                raise
+            startup_logger.exception("Warm-up step '%s' failed", name)
+            continue
+        startup_logger.info(
+            "Warm-up %s: %s in %.1f ms",
+            name,
+            detail,
+            (time.perf_counter() - start) * 1000,
+        )
+    startup_logger.info(
+        "Warm-up complete in %.1f ms", (time.perf_counter() - total) * 1000
+    )
+
+
+def clears_sessions() -> bool:
+    """
+    Whether the session engine keeps expired sessions to clear.
+    Signed cookies can't be cleared ('clearsessions' fails) and the
+    cache expires sessions by itself.
+    """
+    engine = import_module(settings.SESSION_ENGINE)
+    return issubclass(engine.SessionStore, DBStore)
+
+
+def run_once(command: str, interval: int) -> bool:
+    """
+    Run a management command unless another worker of this host runs
+    it or ran it less than half an interval ago. Returns whether the
+    command ran here.
+    """
+    stamp = paths.ensure_exists(paths.cache_dir) / f"{command}.last-run"
+    with open(stamp, "a+") as file:
+        if fcntl is not None:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+        file.seek(0)
+        try:
+            last_run = float(file.read())
+        except ValueError:
+            last_run = 0.0
+        if time.time() - last_run < interval / 2:
+            return False
+        call_command(command, verbosity=0)
+        file.seek(0)
+        file.truncate()
+        file.write(str(time.time()))
+    return True
+
+
+async def run_periodically(command: str, interval: int) -> None:
+    """Run a cleanup management command every 'interval' seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await sync_to_async(run_once)(command, interval)
+        except Exception:
+            logger.exception("Failed to run '%s'", command)
+
+
+async def flush_metrics(interval: float) -> None:
+    """Share this worker's metrics with the others every 'interval' s."""
+    directory = settings.SERVE["METRICS"]["DIRECTORY"]
+    while True:
+        try:
+            await asyncio.to_thread(metrics.flush, directory)
+        except Exception:
+            logger.exception("Failed to write metrics")
+        await asyncio.sleep(interval)
+
 
 @asynccontextmanager
 async def lifespan(app: Starlette) -> AsyncIterator[None]:
     """Main lifespan handler."""
+    tasks: list[asyncio.Task] = []
 
     # add actions below before app run:
+    if settings.SERVE["WARMUP"]["ENABLED"]:
+        await sync_to_async(warm_up)()
+    if settings.SESSION_CLEANUP_INTERVAL and clears_sessions():
+        tasks.append(asyncio.create_task(run_periodically(
+            "clearsessions", settings.SESSION_CLEANUP_INTERVAL
+        )))
+    if settings.API_SYNC["RETENTION_DAYS"]:
+        tasks.append(asyncio.create_task(run_periodically(
+            "cleartombstones", TOMBSTONE_CLEANUP_INTERVAL
+        )))
+    if settings.SERVE["METRICS"]["ENABLED"]:
+        tasks.append(asyncio.create_task(
+            flush_metrics(settings.SERVE["METRICS"]["FLUSH_INTERVAL"])
+        ))
 
     # .................................
     yield
     # .................................
 
     # add actions below after app stop:
+    for task in tasks:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    if settings.SERVE["METRICS"]["ENABLED"]:
+        metrics.flush(settings.SERVE["METRICS"]["DIRECTORY"])
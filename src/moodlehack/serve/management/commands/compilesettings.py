@@ -0,0 +1,64 @@
+import importlib
+
+from django.core.management.base import BaseCommand, CommandError
+
+from moodlehack.core import snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Resolve the configuration once into a settings snapshot, "
+        "loaded at startup without validation while it is up to date"
+    )
+
+    def add_arguments(self, parser):
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument(
+            "--check",
+            action="store_true",
+            help="Exit with status 1 if the snapshot is missing or stale",
+        )
+        action.add_argument(
+            "--clear",
+            action="store_true",
+            help="Remove the snapshot",
+        )
+
+    def handle(self, *args, **options):
+        path = snapshot.snapshot_file()
+        if path is None:
+            raise CommandError(
+                f"The settings snapshot is disabled by {snapshot.ENV_VAR}"
+            )
+
+        if options["clear"]:
+            path.unlink(missing_ok=True)
+            self.stdout.write(f"Removed {path}")
+            return
+
+        if options["check"]:
+            data = snapshot.read(path)
+            if data is None:
+                self.stderr.write(f"No settings snapshot at {path}")
+                raise SystemExit(1)
+            if not snapshot.is_current(data):
+                self.stderr.write(
+                    f"{path} is stale: the configuration changed since "
+                    f"it was compiled (version {data.get('version')})"
+                )
+                raise SystemExit(1)
+            self.stdout.write(f"{path} is up to date")
+            return
+
+        # Build from the configuration, even if this process was
+        # started from a snapshot. Django fills in database defaults in
+        # place, so store the values of a fresh run of the module.
+        module = importlib.import_module("moodlehack.core.settings_cfg")
+        settings = snapshot.collect(importlib.reload(module))
+        try:
+            snapshot.dump(settings, path)
+        except TypeError as exc:
+            raise CommandError(str(exc)) from exc
+        self.stdout.write(self.style.SUCCESS(
+            f"Compiled {len(settings)} settings to {path}"
+        ))
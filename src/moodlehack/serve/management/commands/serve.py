@@ -1,8 +1,21 @@
+import asyncio
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
 import typing as t
+from pathlib import Path
 
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.shortcuts import resolve_url
+from django.urls import reverse
 from django_typer.management import TyperCommand, command
+from rest_framework.authtoken.models import Token
 from rich.console import Console
 from rich.panel import Panel
 from rich.status import Status
@@ -10,6 +23,75 @@ from rich.table import Table
 from rich.text import Text
 from typer import Option
 
+from moodlehack.answers.models import Answer
+from moodlehack.answers.views import AnswersListView
+from moodlehack.serve.bench import Workload, parse_mix
+
+
+def get_host() -> str:
+    """First concrete host of ALLOWED_HOSTS for the Host header."""
+    return next(
+        (
+            host for host in settings.ALLOWED_HOSTS
+            if "*" not in host and not host.startswith(".")
+        ),
+        "localhost",
+    )
+
+
+def get_url_template(name: str) -> str:
+    """URL of a '<int:pk>' route with a '{pk}' placeholder."""
+    sentinel = 2**31 - 1
+    return reverse(name, kwargs={"pk": sentinel}).replace(
+        str(sentinel), "{pk}"
+    )
+
+
+def get_bench_env(
+    port: int | None,
+    uds: str | None,
+    workers: int | None,
+    limit_concurrency: int | None,
+    ratelimit: bool,
+) -> dict[str, str]:
+    """Environment of the benchmarked server process."""
+    # Environment settings override the configuration files
+    env = dict(
+        os.environ,
+        MOODLEHACK_UVICORN__HOST="127.0.0.1",
+        MOODLEHACK_UVICORN__LOGGING__ACCESS_LOG="false",
+    )
+    if uds:
+        env["MOODLEHACK_UVICORN__ADVANCED__UDS"] = uds
+    else:
+        env["MOODLEHACK_UVICORN__PORT"] = str(port)
+    if workers:
+        env["MOODLEHACK_UVICORN__PERFORMANCE__WORKERS"] = str(workers)
+    if limit_concurrency:
+        env["MOODLEHACK_UVICORN__PERFORMANCE__LIMIT_CONCURRENCY"] = str(
+            limit_concurrency
+        )
+    if not ratelimit:
+        env["MOODLEHACK_SERVE__RATELIMIT__ENABLED"] = "false"
+    return env
+
+
+async def wait_until_ready(
+    workload: Workload, server: subprocess.Popen, timeout: float = 30.0
+) -> bool:
+    """Wait until the server accepts connections or exits."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and server.poll() is None:
+        connection = workload.new_connection()
+        try:
+            await connection.connect()
+            return True
+        except OSError:
+            await asyncio.sleep(0.1)
+        finally:
+            await connection.close()
+    return False
+
 
 class Command(TyperCommand):
     """Server management commands for running ASGI server with Uvicorn."""
@@ -150,3 +232,269 @@ class Command(TyperCommand):
             self.console.print(
                 "[bold yellow]Server shutdown completed.[/bold yellow]"
             )
+
+    @command()
+    def bench(
+        self,
+        duration: t.Annotated[
+            float, Option(help="Seconds to run the workload for.")
+        ] = 30.0,
+        concurrency: t.Annotated[
+            int, Option(help="Number of concurrent virtual users.")
+        ] = 20,
+        mix: t.Annotated[
+            str,
+            Option(
+                help=(
+                    "Scenario weights: login, search (live search "
+                    "keystrokes), page (navigation) and api."
+                )
+            ),
+        ] = "search=50,page=25,api=20,login=5",
+        think: t.Annotated[
+            float,
+            Option(help="Think time multiplier, 0 disables pauses."),
+        ] = 1.0,
+        port: t.Annotated[
+            int | None,
+            Option(help="Port to start the server on (free one by default)."),
+        ] = None,
+        uds: t.Annotated[
+            str | None,
+            Option(help="Serve on this UNIX domain socket instead of a port."),
+        ] = None,
+        workers: t.Annotated[
+            int | None, Option(help="Uvicorn worker processes.")
+        ] = None,
+        limit_concurrency: t.Annotated[
+            int | None, Option(help="Uvicorn concurrency limit.")
+        ] = None,
+        ratelimit: t.Annotated[
+            bool, Option(help="Keep the server rate limits enabled.")
+        ] = False,
+        username: t.Annotated[
+            str | None,
+            Option(help="Log in as this user (a temporary one by default)."),
+        ] = None,
+        password: t.Annotated[
+            str | None, Option(help="Password of --username.")
+        ] = None,
+    ) -> None:
+        """
+        Start the server and load test it with simulated users.
+
+        Virtual users log in, type into live search, browse the answers
+        and call the API against a Uvicorn server started on a local
+        port or socket, then latency and throughput are reported per
+        request type.
+
+        Args:
+            duration: Seconds to run the workload for
+            concurrency: Number of concurrent virtual users
+            mix: Comma separated scenario=weight pairs
+            think: Think time multiplier between user actions
+            port: Port to start the server on
+            uds: UNIX domain socket to start the server on
+            workers: Uvicorn worker processes
+            limit_concurrency: Uvicorn concurrency limit
+            ratelimit: Whether to keep rate limiting enabled
+            username: User to log in as
+            password: Password of the user
+        """
+        try:
+            weights = parse_mix(mix)
+        except ValueError as e:
+            self.console.print(f"[bold red]{e}[/bold red]")
+            return
+        if username and not password:
+            self.console.print(
+                "[bold red]--password is required with --username[/bold red]"
+            )
+            return
+
+        sample = self.get_bench_sample()
+        if sample is None:
+            self.console.print(
+                "[bold red]No answers to browse, run generate_answers "
+                "first[/bold red]"
+            )
+            return
+        words, pks = sample
+
+        User = get_user_model()
+        temporary_user = None
+        if username:
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                self.console.print(
+                    f"[bold red]User '{username}' does not exist[/bold red]"
+                )
+                return
+        else:
+            username = f"bench-{secrets.token_hex(4)}"
+            password = secrets.token_urlsafe(16)
+            user = temporary_user = User.objects.create_user(
+                username=username, password=password
+            )
+        token, token_created = Token.objects.get_or_create(user=user)
+
+        if not uds and not port:
+            with socket.socket() as sock:
+                sock.bind(("127.0.0.1", 0))
+                port = sock.getsockname()[1]
+
+        workload = Workload(
+            username=username,
+            password=password,
+            token=token.key,
+            words=words,
+            pks=pks,
+            mix=weights,
+            urls={
+                "login": resolve_url(settings.LOGIN_URL),
+                "index": reverse("answers:index"),
+                "detail": get_url_template("answers:detail"),
+                "api_list": reverse("answers:answer-list"),
+                "api_detail": get_url_template("answers:answer-detail"),
+            },
+            port=port,
+            uds=uds,
+            host_header=get_host(),
+            pages=max(
+                -(-Answer.objects.count() // AnswersListView.paginate_by), 1
+            ),
+            think=think,
+        )
+        env = get_bench_env(port, uds, workers, limit_concurrency, ratelimit)
+
+        try:
+            elapsed = self.run_bench_server(
+                workload, env, concurrency, duration
+            )
+        finally:
+            if uds:
+                Path(uds).unlink(missing_ok=True)
+            # Leave the database as it was: no token, no temporary user
+            if temporary_user is not None:
+                temporary_user.delete()
+            elif token_created:
+                token.delete()
+        if elapsed is None:
+            return
+
+        self.print_bench_report(workload.stats.summary(elapsed), elapsed, {
+            "Target": uds or f"127.0.0.1:{port}",
+            "Workers": str(workers or 1),
+            "Users": str(concurrency),
+            "Mix": mix,
+        })
+
+    @staticmethod
+    def get_bench_sample() -> tuple[list[str], list[int]] | None:
+        """Words of recent questions and answer ids to request."""
+        recent = list(
+            Answer.objects.order_by("-pk").values_list("pk", "question")[:500]
+        )
+        if not recent:
+            return None
+        words = sorted({
+            word.lower()
+            for _, question in recent
+            for word in question.split()
+            if len(word) > 3 and word.isalpha()
+        }) or ["test"]
+        return words, [pk for pk, _ in recent]
+
+    def run_bench_server(
+        self,
+        workload: Workload,
+        env: dict[str, str],
+        concurrency: int,
+        duration: float,
+    ) -> float | None:
+        """
+        Start the server, run the workload against it and stop it.
+        Returns the elapsed time, None when the server did not start.
+        """
+        log = tempfile.TemporaryFile()
+        server = subprocess.Popen(
+            [
+                sys.executable, "-m", "moodlehack.manage",
+                "serve", "runserver", "--no-migrate", "--no-collectstatic",
+            ],
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        try:
+            with Status("Starting server...", console=self.console):
+                ready = asyncio.run(wait_until_ready(workload, server))
+            if not ready:
+                log.seek(0)
+                self.console.print(
+                    "[bold red]Server failed to start:[/bold red]\n"
+                    + log.read().decode(errors="replace")[-2000:]
+                )
+                return None
+
+            with Status(
+                f"Running {concurrency} users for {duration:g} s...",
+                console=self.console,
+            ):
+                return asyncio.run(workload.run(concurrency, duration))
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+            log.close()
+
+    def print_bench_report(
+        self, rows: list[dict], elapsed: float, info: dict[str, str]
+    ) -> None:
+        """Print latency and throughput per request type."""
+        table = Table(title="Latency (ms) and throughput")
+        table.add_column("Request", style="bold cyan", no_wrap=True)
+        for column in ("Count", "Errors", "p50", "p90", "p99", "Max", "RPS"):
+            table.add_column(column, justify="right")
+        table.add_column("Statuses")
+
+        for row in rows:
+            errors = str(row["errors"])
+            table.add_row(
+                row["label"],
+                str(row["count"]),
+                f"[bold red]{errors}[/bold red]" if row["errors"] else errors,
+                *(f"{row[key] * 1000:.1f}" for key in (
+                    "p50", "p90", "p99", "max"
+                )),
+                f"{row['rps']:.1f}",
+                ", ".join(
+                    f"{status}: {count}"
+                    for status, count in sorted(row["statuses"].items())
+                ),
+            )
+
+        total = sum(row["count"] for row in rows)
+        errors = sum(row["errors"] for row in rows)
+        summary = Table(show_header=False, box=None)
+        summary.add_column(style="bold cyan")
+        summary.add_column(style="white")
+        for name, value in info.items():
+            summary.add_row(name, value)
+        summary.add_row("Duration", f"{elapsed:.1f} s")
+        summary.add_row("Requests", f"{total} ({total / elapsed:.1f}/s)")
+        summary.add_row(
+            "Errors", Text(str(errors), style="bold red" if errors else "")
+        )
+
+        self.console.print(table)
+        self.console.print(
+            Panel(
+                summary,
+                title="[bold green]Benchmark[/bold green]",
+                border_style="green",
+                padding=(1, 2),
+            )
+        )
@@ -0,0 +1,333 @@
+"""
+Prometheus metrics for the Starlette server.
+
+Every uvicorn worker keeps its own registry (moodlehack.core.metrics)
+and writes it to '<directory>/<pid>.json' every 'flush_interval'
+seconds and on shutdown. The '/metrics' endpoint, served by whichever
+worker receives the scrape, sums the files of all workers:
+
+    - counters and histograms of exited workers are kept, so totals
+      never go backwards while the server runs. They are merged into
+      'exited.json' and the worker's file is removed (see retire());
+    - gauges (in-flight requests, RSS) only count live workers.
+
+The directory is cleared when the server starts (see runner.py).
+Access is limited to 'allowed_ips' or a 'bearer_token'.
+"""
+
+import contextlib
+import json
+import math
+import os
+import secrets
+import time
+from collections.abc import Iterable, Iterator
+from ipaddress import ip_address
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from moodlehack.core.metrics import METRICS, PREFIX, registry
+from moodlehack.fs import paths
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Counters and histograms of all exited workers
+EXITED = "exited.json"
+
+
+def get_rss() -> int:
+    """Resident set size of the current process in bytes."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        # Peak rather than current RSS, in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def flush(directory: Path) -> None:
+    """Write the registry of this process for the other workers."""
+    registry.set("process_resident_memory_bytes", get_rss(), pid=os.getpid())
+    paths.ensure_exists(directory, mode=0o700)
+    write(directory / f"{os.getpid()}.json", registry.dump())
+
+
+def write(path: Path, data: dict) -> None:
+    """Replace a metric file atomically."""
+    tmp_path = path.with_name(f".{path.stem}.tmp")
+    tmp_path.write_text(json.dumps(data))
+    os.replace(tmp_path, path)
+
+
+def read(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def clear(directory: Path) -> None:
+    """Remove the files of a previous server run."""
+    for path in directory.glob("*.json"):
+        path.unlink(missing_ok=True)
+
+
+def is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextlib.contextmanager
+def lock(directory: Path, exclusive: bool) -> Iterator[None]:
+    """
+    Lock the directory: retire() moves values between files under an
+    exclusive lock, collect() reads them all under a shared one.
+    """
+    paths.ensure_exists(directory, mode=0o700)
+    with open(directory / ".lock", "a") as file:
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+def add(collected: dict, data: dict, gauges: bool = True) -> None:
+    """Add the values of a metric file to the sums of collect()."""
+    for name, labels, value in data["counters"]:
+        key = (name, tuple(map(tuple, labels)))
+        collected["counter"][key] = collected["counter"].get(key, 0.0) + value
+    for name, labels, values in data["histograms"]:
+        key = (name, tuple(map(tuple, labels)))
+        total = collected["histogram"].setdefault(key, [0] * len(values))
+        for index, value in enumerate(values):
+            total[index] += value
+    if gauges:
+        for name, labels, value in data["gauges"]:
+            key = (name, tuple(map(tuple, labels)))
+            collected["gauge"][key] = collected["gauge"].get(key, 0.0) + value
+
+
+def retire(directory: Path, pids: Iterable[int]) -> None:
+    """
+    Merge the counters and histograms of exited workers into EXITED and
+    remove their files. The directory doesn't grow with every recycled
+    worker and a new process reusing a pid can't overwrite the values.
+    """
+    with lock(directory, exclusive=True):
+        files = [
+            path for path in (directory / f"{pid}.json" for pid in pids)
+            if path.exists()
+        ]
+        if not files:
+            return
+        collected = {"counter": {}, "gauge": {}, "histogram": {}}
+        for path in (directory / EXITED, *files):
+            if (data := read(path)) is not None:
+                add(collected, data, gauges=False)
+        write(
+            directory / EXITED,
+            {
+                "counters": [
+                    [name, list(labels), value]
+                    for (name, labels), value in collected["counter"].items()
+                ],
+                "gauges": [],
+                "histograms": [
+                    [name, list(labels), values]
+                    for (name, labels), values
+                    in collected["histogram"].items()
+                ],
+            },
+        )
+        for path in files:
+            path.unlink(missing_ok=True)
+
+
+def collect(directory: Path) -> dict:
+    """Sum the metric files of all workers."""
+    # Files of workers which exited without a supervisor retiring them
+    # (Uvicorn's own multiprocess mode)
+    pids = [
+        int(path.stem) for path in directory.glob("*.json")
+        if path.stem.isdigit()
+    ]
+    retire(directory, [pid for pid in pids if not is_alive(pid)])
+
+    collected = {"counter": {}, "gauge": {}, "histogram": {}}
+    with lock(directory, exclusive=False):
+        for path in directory.glob("*.json"):
+            if (data := read(path)) is not None:
+                add(collected, data)
+    return collected
+
+
+def escape(value) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
+
+
+def format_labels(labels, extra: tuple = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def render(collected: dict) -> str:
+    """Prometheus text exposition format."""
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = sorted(
+            (key, value) for key, value in collected[kind].items()
+            if key[0] == name
+        )
+        if not series:
+            continue
+        full_name = PREFIX + name
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {kind}")
+        for (_, labels), value in series:
+            if kind != "histogram":
+                lines.append(
+                    f"{full_name}{format_labels(labels)} "
+                    f"{format_value(value)}"
+                )
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, math.inf), value[:-1]):
+                cumulative += count
+                le = ("le", format_value(bound))
+                lines.append(
+                    f"{full_name}_bucket{format_labels(labels, (le,))} "
+                    f"{cumulative}"
+                )
+            lines.append(
+                f"{full_name}_sum{format_labels(labels)} "
+                f"{format_value(value[-1])}"
+            )
+            lines.append(
+                f"{full_name}_count{format_labels(labels)} {cumulative}"
+            )
+    return "\n".join(lines) + "\n"
+
+
+class MetricsEndpoint:
+    """ASGI endpoint serving the metrics of all workers."""
+
+    def __init__(
+        self,
+        directory: Path,
+        allowed_ips: tuple = (),
+        token: str | None = None,
+    ):
+        self.directory = directory
+        self.allowed_ips = allowed_ips
+        self.token = token
+
+    def is_allowed(self, request: Request) -> bool:
+        if self.token:
+            scheme, _, credentials = request.headers.get(
+                "authorization", ""
+            ).partition(" ")
+            if scheme.lower() == "bearer" and secrets.compare_digest(
+                credentials.encode(), self.token.encode()
+            ):
+                return True
+        if request.client is None:
+            return False
+        try:
+            client = ip_address(request.client.host)
+        except ValueError:
+            return False
+        return any(client in network for network in self.allowed_ips)
+
+    def scrape(self) -> str:
+        flush(self.directory)
+        return render(collect(self.directory))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        request = Request(scope, receive)
+        if not self.is_allowed(request):
+            response = Response(status_code=403)
+        else:
+            response = PlainTextResponse(
+                await run_in_threadpool(self.scrape), media_type=CONTENT_TYPE
+            )
+        await response(scope, receive, send)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording in-flight requests and latency labelled
+    by route, method and status. The route is the Django view name
+    (set by RouteNameMiddleware) or the name of a static mount.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        mounts: tuple[tuple[str, str], ...] = (),
+    ):
+        self.app = app
+        self.mounts = mounts
+
+    def get_route(self, scope: Scope) -> str:
+        if route_name := scope.get("route_name"):
+            return route_name
+        for prefix, name in self.mounts:
+            if scope["path"].startswith(prefix):
+                return name
+        return "unmatched"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        registry.add("http_requests_in_flight", 1)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            registry.add("http_requests_in_flight", -1)
+            registry.observe(
+                "http_request_duration_seconds",
+                time.perf_counter() - start,
+                route=self.get_route(scope),
+                method=scope["method"],
+                status=str(status),
+            )
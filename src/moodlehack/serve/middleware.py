@@ -8,15 +8,70 @@ application layer.
 Key components:
     - TrustedHostMiddleware: Prevents HTTP Host Header attacks by validating
       the Host header against the Django ALLOWED_HOSTS setting.
+    - MetricsMiddleware: Records in-flight requests and latency per route
+      for the /metrics endpoint ([serve.metrics]).
+    - RateLimitMiddleware: Token bucket budgets per API token, session or
+      client IP for API, HTMX search and page routes, within a budget per
+      client IP ([serve.ratelimit]).
+    - LoadSheddingMiddleware: Rejects low-priority work with 503 when
+      in-flight requests (and recent latency) grow too high
+      ([serve.shedding]).
 """
 
 from django.conf import settings
 from starlette.middleware import Middleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 
+from .metrics import MetricsMiddleware
+from .ratelimit import RateLimitMiddleware
+from .shedding import LoadSheddingMiddleware
+
 middleware = [
     Middleware(
         TrustedHostMiddleware,
         allowed_hosts=settings.ALLOWED_HOSTS,
     ),
 ]
+
+# Before rate limiting and load shedding, so rejections are counted too
+if settings.SERVE["METRICS"]["ENABLED"]:
+    middleware.append(
+        Middleware(
+            MetricsMiddleware,
+            mounts=(
+                (settings.SERVE["METRICS"]["URL"], "metrics"),
+                (settings.MEDIA_URL, "media"),
+                (settings.STATIC_URL, "static"),
+            ),
+        )
+    )
+
+if settings.SERVE["RATELIMIT"]["ENABLED"]:
+    middleware.append(
+        Middleware(
+            RateLimitMiddleware,
+            budgets=settings.SERVE["RATELIMIT"]["BUDGETS"],
+            backend=settings.SERVE["RATELIMIT"]["BACKEND"],
+            cache_alias=settings.SERVE["RATELIMIT"]["CACHE_ALIAS"],
+            # Static files are cheap and requested in bursts
+            exempt_paths=(settings.STATIC_URL, settings.MEDIA_URL),
+        )
+    )
+
+if settings.SERVE["SHEDDING"]["ENABLED"]:
+    middleware.append(
+        Middleware(
+            LoadSheddingMiddleware,
+            max_in_flight=settings.SERVE["SHEDDING"]["MAX_IN_FLIGHT"],
+            target_latency=settings.SERVE["SHEDDING"]["TARGET_LATENCY"],
+            window=settings.SERVE["SHEDDING"]["WINDOW"],
+            min_samples=settings.SERVE["SHEDDING"]["MIN_SAMPLES"],
+            retry_after=settings.SERVE["SHEDDING"]["RETRY_AFTER"],
+            low_priority_paths=settings.SERVE["SHEDDING"][
+                "LOW_PRIORITY_PATHS"
+            ],
+            # Monitoring keeps working while the worker is overloaded
+            high_priority_paths=(settings.SERVE["METRICS"]["URL"],),
+            exempt_paths=(settings.STATIC_URL, settings.MEDIA_URL),
+        )
+    )
@@ -0,0 +1,332 @@
+"""
+Preforking server: load the application once, fork the workers.
+
+With 'workers' Uvicorn spawns fresh interpreters which import the app
+again: every worker imports Django, sets it up and loads the URLconf
+and views on its own. Here the master process imports and warms the
+application (see lifespan.warm_up), binds the socket and forks the
+workers from itself. They share the master's memory copy-on-write (the
+heap is frozen first, so the garbage collector doesn't touch the
+shared pages) and a worker replaced after a crash or recycling is
+serving in milliseconds.
+
+Workers are recycled:
+    - after 'uvicorn.performance.limit_max_requests' requests, plus a
+      random 'limit_max_requests_jitter' so they don't restart at the
+      same time (by Uvicorn);
+    - when their resident memory exceeds 'serve.workers.max_memory_mb'.
+
+The master handles signals like Uvicorn's supervisor: INT and TERM
+stop the server, HUP replaces all workers, TTIN and TTOU add or remove
+a worker. The metrics of exited workers are merged as they are reaped
+(see metrics.retire).
+"""
+
+import gc
+import logging
+import os
+import select
+import signal
+import sys
+from pathlib import Path
+from typing import Any
+
+import uvicorn
+from uvicorn.config import STARTUP_FAILURE
+
+from . import metrics
+
+logger = logging.getLogger("uvicorn.error")
+
+SIGNALS = {
+    signal.SIGINT: "int",
+    signal.SIGTERM: "term",
+    signal.SIGHUP: "hup",
+    signal.SIGTTIN: "ttin",
+    signal.SIGTTOU: "ttou",
+    signal.SIGCHLD: "chld",
+}
+
+
+def is_supported(options: dict[str, Any]) -> bool:
+    """Whether the server options can run preforked."""
+    return hasattr(os, "fork") and not options.get("reload")
+
+
+def preload() -> None:
+    """Import and warm the application in the master process."""
+    from django.conf import settings
+    from django.core.cache import caches
+    from django.db import connections
+
+    from . import asgi  # noqa: F401
+    from .lifespan import warm_up
+
+    # Workers inherit the warm state, their own warm-up only repeats
+    # what is per process (database connections, cache backends)
+    if settings.SERVE["WARMUP"]["ENABLED"]:
+        warm_up()
+    else:
+        from django.urls import get_resolver
+
+        # Import the URLconf with every view module
+        get_resolver().url_patterns
+
+    # Workers must not share the connections of the master
+    connections.close_all()
+    caches.close_all()
+
+
+class WorkerServer(uvicorn.Server):
+    """Uvicorn server of a worker, stopping above a memory ceiling."""
+
+    def __init__(self, config: uvicorn.Config, max_memory: int | None):
+        super().__init__(config)
+        self.max_memory = max_memory
+
+    async def on_tick(self, counter: int) -> bool:
+        if await super().on_tick(counter):
+            return True
+        # Once per second, like Uvicorn's own housekeeping. A worker
+        # serves at least one request, so a ceiling below the memory
+        # of a fresh worker can't make them restart in a loop.
+        if (
+            self.max_memory
+            and counter % 10 == 0
+            and self.server_state.total_requests
+        ):
+            rss = metrics.get_rss()
+            if rss > self.max_memory:
+                logger.info(
+                    "Resident memory of %d MiB exceeds %d MiB. "
+                    "Terminating process.",
+                    rss >> 20,
+                    self.max_memory >> 20,
+                )
+                return True
+        return False
+
+
+class Arbiter:
+    """Master process forking and supervising the workers."""
+
+    def __init__(
+        self,
+        config: uvicorn.Config,
+        sockets: list,
+        workers: int,
+        max_memory: int | None = None,
+        metrics_directory: Path | None = None,
+    ):
+        self.config = config
+        self.sockets = sockets
+        self.workers = workers
+        self.max_memory = max_memory
+        self.metrics_directory = metrics_directory
+        self.pids: set[int] = set()
+        # Workers asked to stop, not replaced when they exit
+        self.retired: set[int] = set()
+        self.signals: list[int] = []
+        self.should_exit = False
+        self.exit_code = 0
+
+    def run(self) -> int:
+        logger.info("Started parent process [%d]", os.getpid())
+        # Signal handlers only queue the signal, a pipe wakes the loop
+        self.wakeup_r, self.wakeup_w = os.pipe()
+        os.set_blocking(self.wakeup_r, False)
+        os.set_blocking(self.wakeup_w, False)
+        signal.set_wakeup_fd(self.wakeup_w)
+        for sig in SIGNALS:
+            signal.signal(sig, self.queue_signal)
+
+        # Objects of the preloaded application live as long as the
+        # workers: keep the collector from writing to their pages
+        gc.collect()
+        gc.freeze()
+
+        self.spawn_workers()
+        while not self.should_exit:
+            self.sleep()
+            self.handle_signals()
+            self.reap_workers()
+            if not self.should_exit:
+                self.spawn_workers()
+
+        self.stop_workers()
+        logger.info("Stopping parent process [%d]", os.getpid())
+        return self.exit_code
+
+    def queue_signal(self, sig: int, frame) -> None:
+        self.signals.append(sig)
+
+    def sleep(self) -> None:
+        select.select([self.wakeup_r], [], [], 1.0)
+        try:
+            while os.read(self.wakeup_r, 1024):
+                pass
+        except BlockingIOError:
+            pass
+
+    def handle_signals(self) -> None:
+        while self.signals:
+            handler = getattr(self, f"handle_{SIGNALS[self.signals.pop(0)]}")
+            handler()
+
+    def handle_int(self) -> None:
+        logger.info("Received SIGINT, exiting.")
+        self.should_exit = True
+
+    def handle_term(self) -> None:
+        logger.info("Received SIGTERM, exiting.")
+        self.should_exit = True
+
+    def handle_hup(self) -> None:
+        logger.info("Received SIGHUP, replacing worker processes.")
+        for pid in list(self.pids):
+            self.spawn_worker()
+            self.retire_worker(pid)
+
+    def handle_ttin(self) -> None:
+        logger.info("Received SIGTTIN, increasing the number of processes.")
+        self.workers += 1
+
+    def handle_ttou(self) -> None:
+        logger.info("Received SIGTTOU, decreasing number of processes.")
+        if self.workers <= 1 or not self.pids:
+            logger.info(
+                "Already reached one process, cannot decrease the number "
+                "of processes anymore."
+            )
+            return
+        self.workers -= 1
+        self.retire_worker(next(iter(self.pids)))
+
+    def handle_chld(self) -> None:
+        # Exited workers are reaped after every wakeup
+        pass
+
+    def spawn_workers(self) -> None:
+        while len(self.pids) < self.workers:
+            self.spawn_worker()
+
+    def spawn_worker(self) -> None:
+        pid = os.fork()
+        if pid:
+            self.pids.add(pid)
+            return
+
+        # Worker process: count from zero, or every worker would report
+        # the queries of the master's warm-up again
+        metrics.registry.clear()
+
+        # Never return into the master's loop
+        code = 0
+        try:
+            self.run_worker()
+        except SystemExit as exc:
+            code = exc.code if isinstance(exc.code, int) else 1
+        except BaseException:
+            logger.exception("Worker process [%d] failed", os.getpid())
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def run_worker(self) -> None:
+        signal.set_wakeup_fd(-1)
+        os.close(self.wakeup_r)
+        os.close(self.wakeup_w)
+        for sig in SIGNALS:
+            signal.signal(sig, signal.SIG_DFL)
+        server = WorkerServer(self.config, max_memory=self.max_memory)
+        server.run(sockets=self.sockets)
+
+    def retire_worker(self, pid: int) -> None:
+        self.pids.discard(pid)
+        self.retired.add(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def reap_workers(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            self.retire_metrics(pid)
+            if pid in self.retired:
+                self.retired.discard(pid)
+                continue
+            self.pids.discard(pid)
+
+            code = os.waitstatus_to_exitcode(status)
+            if code == STARTUP_FAILURE:
+                # The app would fail the same way in every new worker
+                logger.error(
+                    "Child process [%d] failed to start, stopping the "
+                    "parent process.",
+                    pid,
+                )
+                self.should_exit = True
+                self.exit_code = STARTUP_FAILURE
+            elif code == 0:
+                logger.info("Child process [%d] recycled", pid)
+            else:
+                logger.info("Child process [%d] died", pid)
+
+    def retire_metrics(self, pid: int) -> None:
+        if self.metrics_directory is None:
+            return
+        try:
+            metrics.retire(self.metrics_directory, [pid])
+        except OSError:
+            logger.exception("Failed to merge metrics of [%d]", pid)
+
+    def stop_workers(self) -> None:
+        for pid in list(self.pids):
+            self.retire_worker(pid)
+        while self.retired:
+            try:
+                pid, _ = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            self.retired.discard(pid)
+
+
+def run(
+    options: dict[str, Any],
+    max_memory: int | None = None,
+    metrics_directory: Path | None = None,
+) -> None:
+    """Run the preforking server with uvicorn.run() options."""
+    options = dict(options)
+    workers = options.pop("workers", None) or 1
+    # Configures logging before the warm-up logs its steps
+    config = uvicorn.Config(
+        app="moodlehack.serve.asgi:application", **options
+    )
+    preload()
+    config.load()
+    sock = config.bind_socket()
+
+    arbiter = Arbiter(
+        config,
+        [sock],
+        workers,
+        max_memory=max_memory,
+        metrics_directory=metrics_directory,
+    )
+    try:
+        exit_code = arbiter.run()
+    finally:
+        sock.close()
+        if config.uds and os.path.exists(config.uds):
+            os.remove(config.uds)
+    if exit_code:
+        sys.exit(exit_code)
@@ -0,0 +1,204 @@
+"""
+Token bucket rate limiting for the Starlette server.
+
+Requests are grouped into budgets (API, HTMX search, pages) and keyed by
+the client's API credentials, session cookie or IP address. Every key
+has a bucket of 'burst' tokens refilled at 'rate' tokens per second;
+a request takes one token or is rejected with 429 Too Many Requests.
+
+Credentials are not verified at this layer, so every request also takes
+a token from the 'client' budget of its IP address first. A client
+rotating made-up credentials gets no more requests than its address
+allows, and can't create more buckets than that either.
+
+Responses carry the RateLimit-Limit, RateLimit-Remaining and
+RateLimit-Reset headers, rejections also carry Retry-After.
+"""
+
+import hashlib
+import math
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from moodlehack.core.caches import is_shared
+
+
+def consume(state, now: float, rate: float, burst: int):
+    """
+    Refill a bucket up to 'now' and try to take one token.
+
+    Returns (new_state, allowed, tokens_left).
+    """
+    tokens, updated = state if state else (burst, now)
+    tokens = min(burst, tokens + max(now - updated, 0) * rate)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    return (tokens, now), allowed, tokens
+
+
+class LocalBucketStore:
+    """
+    Buckets in process memory: exact, but per uvicorn worker.
+    The least recently used keys are evicted beyond 'max_keys'.
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int):
+        state, allowed, tokens = consume(
+            self.buckets.get(key), time.monotonic(), rate, burst
+        )
+        self.buckets[key] = state
+        self.buckets.move_to_end(key)
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return allowed, tokens
+
+
+class CacheBucketStore:
+    """
+    Buckets in a Django cache shared by all workers (file, redis, ...).
+    Updates are read-modify-write, so concurrent requests of one client
+    may occasionally overshoot the limit by a request or two.
+    """
+
+    def __init__(self, alias: str = "default"):
+        if not is_shared(alias):
+            raise ImproperlyConfigured(
+                f"Rate limit buckets can't be shared through the "
+                f"per-process cache '{alias}', configure a file or redis "
+                f"cache or use the 'local' backend"
+            )
+        self.cache = caches[alias]
+
+    async def take(self, key: str, rate: float, burst: int):
+        state, allowed, tokens = consume(
+            await self.cache.aget(key), time.time(), rate, burst
+        )
+        # A bucket left alone long enough is full again: let it expire
+        timeout = math.ceil(burst / rate) + 1
+        await self.cache.aset(key, state, timeout)
+        return allowed, tokens
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware applying token bucket budgets per client.
+
+    'budgets' maps "api", "search", "page" and "client" (per IP address,
+    for every request) to (rate, burst). The "auto" backend shares the
+    buckets through the cache when it is shared by all workers and keeps
+    them per worker otherwise.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        budgets: dict[str, tuple[float, int]],
+        backend: str = "auto",
+        cache_alias: str = "default",
+        exempt_paths: tuple[str, ...] = (),
+    ):
+        self.app = app
+        self.budgets = budgets
+        self.exempt_paths = exempt_paths
+        if backend == "auto":
+            backend = "cache" if is_shared(cache_alias) else "local"
+        if backend == "cache":
+            self.store = CacheBucketStore(cache_alias)
+        else:
+            self.store = LocalBucketStore()
+
+    def get_budget(self, scope: Scope, headers: Headers) -> str:
+        if scope["path"].startswith("/api/"):
+            return "api"
+        if "hx-request" in headers:
+            return "search"
+        return "page"
+
+    @staticmethod
+    def get_address(scope: Scope) -> str:
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+    def get_identity(self, scope: Scope, headers: Headers) -> str:
+        """API credentials, then session cookie, then client address."""
+        if authorization := headers.get("authorization"):
+            return "auth:" + self.digest(authorization)
+
+        cookies = headers.get("cookie", "")
+        session_cookie = f"{settings.SESSION_COOKIE_NAME}="
+        for cookie in cookies.split(";"):
+            cookie = cookie.strip()
+            if cookie.startswith(session_cookie):
+                return "session:" + self.digest(cookie)
+
+        return self.get_address(scope)
+
+    @staticmethod
+    def digest(value: str) -> str:
+        return hashlib.blake2b(value.encode(), digest_size=12).hexdigest()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith(
+            self.exempt_paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        request_budget = self.get_budget(scope, headers)
+        # The address first: a rejected request creates no other bucket
+        buckets = [
+            ("client", self.get_address(scope)),
+            (request_budget, self.get_identity(scope, headers)),
+        ]
+        for budget, identity in buckets:
+            rate, burst = self.budgets[budget]
+            allowed, tokens = await self.store.take(
+                f"ratelimit:{budget}:{identity}", rate, burst
+            )
+            if not allowed:
+                break
+
+        limit_headers = {
+            "RateLimit-Limit": str(burst),
+            "RateLimit-Remaining": str(math.floor(tokens)),
+            "RateLimit-Reset": str(math.ceil((burst - tokens) / rate)),
+        }
+
+        if not allowed:
+            limit_headers["Retry-After"] = str(
+                max(math.ceil((1 - tokens) / rate), 1)
+            )
+            if request_budget == "api":
+                response = JSONResponse(
+                    {"detail": "Request was throttled."},
+                    status_code=429,
+                    headers=limit_headers,
+                )
+            else:
+                response = PlainTextResponse(
+                    "Too Many Requests",
+                    status_code=429,
+                    headers=limit_headers,
+                )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).update(limit_headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
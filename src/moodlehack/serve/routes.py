@@ -6,14 +6,16 @@ with static file serving for media and static assets.
 """
 
 from django.conf import settings
-from starlette.routing import Mount
+from starlette.routing import BaseRoute, Mount, Route
 from starlette.staticfiles import StaticFiles
 
 from moodlehack.core.asgi import application
 
+from .metrics import MetricsEndpoint
+
 # Route ordering matters - static and media mounts must precede the root route
 # to prevent Django from handling static file requests.
-routes: list[Mount] = [
+routes: list[BaseRoute] = [
     Mount(
         path=settings.MEDIA_URL,
         app=StaticFiles(directory=settings.MEDIA_ROOT),
@@ -30,3 +32,18 @@ routes: list[Mount] = [
         name="app"
     ),
 ]
+
+if settings.SERVE["METRICS"]["ENABLED"]:
+    routes.insert(
+        0,
+        Route(
+            path=settings.SERVE["METRICS"]["URL"],
+            endpoint=MetricsEndpoint(
+                directory=settings.SERVE["METRICS"]["DIRECTORY"],
+                allowed_ips=settings.SERVE["METRICS"]["ALLOWED_IPS"],
+                token=settings.SERVE["METRICS"]["TOKEN"],
+            ),
+            methods=["GET"],
+            name="metrics",
+        ),
+    )
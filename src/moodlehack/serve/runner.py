@@ -5,12 +5,45 @@ This module provides the main entry point for running the production server
 using Uvicorn with configuration loaded from application settings.
 """
 
+import logging
+
 import uvicorn
 from django.conf import settings
 
+from . import metrics, prefork
+
+logger = logging.getLogger("uvicorn.error")
+
 
 def runserver() -> None:
     """Run Uvicorn server with application settings"""
+    metrics_directory = None
+    if settings.SERVE["METRICS"]["ENABLED"]:
+        # Start counting from zero, workers write new files
+        metrics_directory = settings.SERVE["METRICS"]["DIRECTORY"]
+        metrics.clear(metrics_directory)
+
+    options = settings.UVICORN
+    workers = settings.SERVE["WORKERS"]
+    # A supervisor is needed for several workers or to recycle them
+    supervised = (
+        (options.get("workers") or 1) > 1
+        or options.get("limit_max_requests")
+        or workers["MAX_MEMORY"]
+    )
+    if workers["PRELOAD"] and supervised and prefork.is_supported(options):
+        prefork.run(
+            options,
+            max_memory=workers["MAX_MEMORY"],
+            metrics_directory=metrics_directory,
+        )
+        return
+
+    if workers["MAX_MEMORY"]:
+        logger.warning(
+            "serve.workers.max_memory_mb is ignored: workers are only "
+            "recycled by memory when preforked (preload, without reload)"
+        )
     uvicorn.run(
         app="moodlehack.serve.asgi:application",
         **settings.UVICORN
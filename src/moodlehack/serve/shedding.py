@@ -0,0 +1,156 @@
+"""
+Adaptive load shedding for the Starlette server.
+
+Unlike uvicorn's static 'limit_concurrency', admission depends on the
+observed state of the worker: requests in flight and the p95 latency of
+recently answered requests. Under pressure work is shed by priority,
+with a fast 503 and Retry-After:
+
+    low     API list dumps, OpenAPI schema/Swagger, admin
+    normal  pages and other API calls
+    high    the metrics endpoint, never shed here
+
+Priorities only depend on the route: headers such as HX-Request are set
+by the client and would let anyone skip the queue.
+
+Requests in flight are the primary signal. Low-priority requests are
+rejected when half of 'max_in_flight' is in use, or a quarter of it
+while p95 latency exceeds the target; normal ones when 'max_in_flight'
+is reached, or half of it while p95 latency exceeds twice the target.
+Slow requests of an idle worker (e.g. password hashing on login) don't
+shed anything, and latency counts only from 'min_samples' requests on.
+
+Latency is the time to the start of the response, so streaming a large
+download doesn't count. Exempt paths (static and media files) are
+neither shed nor measured.
+"""
+
+import re
+import time
+from collections import deque
+
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 1
+PRIORITY_HIGH = 2
+
+# Collection endpoints such as /api/v1/answers/
+API_LIST_PATH = re.compile(r"^/api/v\d+/[\w-]+/$")
+
+
+class LatencyWindow:
+    """
+    Latencies of requests answered within the last 'window' seconds.
+    The p95 is 0 until the window holds 'min_samples' latencies.
+    """
+
+    def __init__(self, window: float, min_samples: int = 20,
+                 maxlen: int = 1024):
+        self.window = window
+        self.min_samples = min_samples
+        self.samples = deque(maxlen=maxlen)
+        self._p95 = 0.0
+        self._computed = 0.0
+
+    def add(self, now: float, duration: float) -> None:
+        self.samples.append((now, duration))
+
+    def p95(self, now: float) -> float:
+        # Recomputed at most 4 times per second
+        if now - self._computed < 0.25:
+            return self._p95
+        self._computed = now
+
+        horizon = now - self.window
+        while self.samples and self.samples[0][0] < horizon:
+            self.samples.popleft()
+        if len(self.samples) < self.min_samples:
+            self._p95 = 0.0
+            return self._p95
+
+        durations = sorted(duration for _, duration in self.samples)
+        self._p95 = durations[min(int(0.95 * len(durations)),
+                                  len(durations) - 1)]
+        return self._p95
+
+
+class LoadSheddingMiddleware:
+    """ASGI middleware rejecting low-priority work under load."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_in_flight: int = 64,
+        target_latency: float = 0.5,
+        window: float = 10.0,
+        min_samples: int = 20,
+        retry_after: int = 5,
+        low_priority_paths: tuple[str, ...] = (),
+        high_priority_paths: tuple[str, ...] = (),
+        exempt_paths: tuple[str, ...] = (),
+    ):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.target_latency = target_latency
+        self.retry_after = retry_after
+        self.low_priority_paths = low_priority_paths
+        self.high_priority_paths = high_priority_paths
+        self.exempt_paths = exempt_paths
+        self.latency = LatencyWindow(window, min_samples)
+        self.in_flight = 0
+
+    def get_priority(self, scope: Scope) -> int:
+        path = scope["path"]
+        if path.startswith(self.high_priority_paths):
+            return PRIORITY_HIGH
+        if path.startswith(self.low_priority_paths):
+            return PRIORITY_LOW
+        if scope["method"] == "GET" and API_LIST_PATH.match(path):
+            return PRIORITY_LOW
+        return PRIORITY_NORMAL
+
+    def get_load_level(self, now: float) -> int:
+        """Lowest priority still admitted (0 means everything)."""
+        p95 = self.latency.p95(now)
+        if self.in_flight >= self.max_in_flight or (
+            self.in_flight >= self.max_in_flight // 2
+            and p95 > 2 * self.target_latency
+        ):
+            return PRIORITY_HIGH
+        if self.in_flight >= self.max_in_flight // 2 or (
+            self.in_flight >= self.max_in_flight // 4
+            and p95 > self.target_latency
+        ):
+            return PRIORITY_NORMAL
+        return PRIORITY_LOW
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith(
+            self.exempt_paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.monotonic()
+        if self.get_priority(scope) < self.get_load_level(start):
+            response = PlainTextResponse(
+                "Service Unavailable",
+                status_code=503,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_measured(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                now = time.monotonic()
+                self.latency.add(now, now - start)
+            await send(message)
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send_measured)
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,495 @@
+import asyncio
+import json
+import signal
+import tempfile
+import time
+from ipaddress import ip_network
+from pathlib import Path
+from unittest import mock, skipIf
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from uvicorn.config import STARTUP_FAILURE
+
+from moodlehack.core.metrics import registry
+
+from . import lifespan, metrics, prefork
+from .metrics import MetricsEndpoint
+from .ratelimit import CacheBucketStore, LocalBucketStore, RateLimitMiddleware
+from .shedding import (
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    PRIORITY_NORMAL,
+    LoadSheddingMiddleware,
+)
+
+LOCMEM_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "moodlehack-tests",
+    },
+}
+FILE_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": tempfile.gettempdir(),
+    },
+}
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def request(app, path: str = "/", headers=(), client: str = "10.0.0.1"):
+    """Send a GET request through an ASGI app, return the status."""
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "headers": [
+            (name.lower().encode(), value.encode())
+            for name, value in headers
+        ],
+        "client": (client, 50000),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return messages[0]["status"]
+
+
+class PeriodicCommandTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        for target, value in [
+            ("paths", mock.Mock(**{"ensure_exists.return_value": (
+                self.directory
+            )})),
+            ("call_command", mock.Mock()),
+        ]:
+            patcher = mock.patch.object(lifespan, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_once_per_interval(self):
+        self.assertTrue(lifespan.run_once("clearsessions", 3600))
+        # Another worker wakes up at the same time
+        self.assertFalse(lifespan.run_once("clearsessions", 3600))
+        lifespan.call_command.assert_called_once_with(
+            "clearsessions", verbosity=0
+        )
+
+    def test_after_interval(self):
+        stamp = self.directory / "clearsessions.last-run"
+        stamp.write_text(str(time.time() - 3600))
+        self.assertTrue(lifespan.run_once("clearsessions", 3600))
+
+    @skipIf(lifespan.fcntl is None, "no file locks")
+    def test_running_elsewhere(self):
+        stamp = self.directory / "clearsessions.last-run"
+        with open(stamp, "a+") as file:
+            lifespan.fcntl.flock(file, lifespan.fcntl.LOCK_EX)
+            self.assertFalse(lifespan.run_once("clearsessions", 3600))
+        lifespan.call_command.assert_not_called()
+
+    def test_session_engines(self):
+        engines = {
+            "db": True,
+            "cached_db": True,
+            "cache": False,
+            "signed_cookies": False,
+        }
+        for engine, clears in engines.items():
+            path = f"django.contrib.sessions.backends.{engine}"
+            with self.subTest(engine), override_settings(
+                SESSION_ENGINE=path
+            ):
+                self.assertIs(lifespan.clears_sessions(), clears)
+
+
+@override_settings(SERVE={**settings.SERVE, "WARMUP": {"ENABLED": True}})
+class WarmUpTests(SimpleTestCase):
+    def setUp(self):
+        self.database = mock.Mock(return_value="default")
+        self.caches = mock.Mock(return_value="default")
+        patcher = mock.patch.object(lifespan, "WARM_UP_STEPS", [
+            ("templates", self.fail, False),
+            ("database", self.database, True),
+            ("caches", self.caches, False),
+        ])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def fail():
+        raise RuntimeError("broken")
+
+    def test_optional_step_failed(self):
+        with self.assertLogs("uvicorn.error") as logs:
+            lifespan.warm_up()
+        self.assertIn("Warm-up step 'templates' failed", logs.output[0])
+        self.assertIn("RuntimeError: broken", logs.output[0])
+        self.assertIn("Warm-up database: default", logs.output[1])
+        self.assertIn("Warm-up caches: default", logs.output[2])
+        self.assertIn("Warm-up complete", logs.output[3])
+
+    def test_required_step_failed(self):
+        self.database.side_effect = RuntimeError("unreachable")
+        ready = []
+
+        async def serve():
+            async with lifespan.lifespan(None):
+                ready.append(True)
+
+        with (
+            self.assertLogs("uvicorn.error"),
+            self.assertRaisesMessage(RuntimeError, "unreachable"),
+        ):
+            asyncio.run(serve())
+        # Uvicorn reports the startup failure instead
+        self.assertEqual(ready, [])
+        self.caches.assert_not_called()
+
+
+class RateLimitTests(SimpleTestCase):
+    budgets = {
+        "client": (0.001, 5),
+        "api": (0.001, 3),
+        "search": (0.001, 3),
+        "page": (0.001, 3),
+    }
+
+    def setUp(self):
+        self.app = RateLimitMiddleware(
+            ok_app, budgets=self.budgets, backend="local"
+        )
+
+    def test_per_credentials(self):
+        token = [("Authorization", "Token one")]
+        statuses = [request(self.app, "/api/v1/", token) for _ in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        # Another token from the same address has its own API budget
+        other = [("Authorization", "Token two")]
+        self.assertEqual(request(self.app, "/api/v1/", other), 200)
+
+    def test_rotating_credentials(self):
+        statuses = [
+            request(
+                self.app, "/api/v1/", [("Authorization", f"Token {i}")]
+            )
+            for i in range(10)
+        ]
+        self.assertEqual(statuses, [200] * 5 + [429] * 5)
+        # Rejected by the address budget before a bucket was created
+        self.assertEqual(len(self.app.store.buckets), 6)
+        self.assertEqual(request(self.app, client="10.0.0.2"), 200)
+
+    def test_backends(self):
+        for caches, store in [
+            (LOCMEM_CACHES, LocalBucketStore),
+            (FILE_CACHES, CacheBucketStore),
+        ]:
+            with override_settings(CACHES=caches):
+                middleware = RateLimitMiddleware(ok_app, self.budgets)
+            self.assertIsInstance(middleware.store, store)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_per_process_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            RateLimitMiddleware(ok_app, self.budgets, backend="cache")
+
+
+class LoadSheddingTests(SimpleTestCase):
+    def setUp(self):
+        self.app = LoadSheddingMiddleware(
+            ok_app,
+            max_in_flight=8,
+            target_latency=0.5,
+            min_samples=5,
+            low_priority_paths=("/admin/",),
+            high_priority_paths=("/metrics",),
+            exempt_paths=("/static/",),
+        )
+        self.clock = time.monotonic()
+
+    def add_latencies(self, count: int, duration: float):
+        for _ in range(count):
+            self.app.latency.add(self.clock, duration)
+
+    def get_level(self) -> int:
+        # Past the p95 recomputation interval of the previous call
+        self.clock += 1
+        return self.app.get_load_level(self.clock)
+
+    def test_priorities(self):
+        priorities = {
+            "/admin/": PRIORITY_LOW,
+            "/api/v1/answers/": PRIORITY_LOW,
+            "/api/v1/answers/1/": PRIORITY_NORMAL,
+            "/": PRIORITY_NORMAL,
+            "/metrics": PRIORITY_HIGH,
+        }
+        for path, priority in priorities.items():
+            scope = {"path": path, "method": "GET"}
+            self.assertEqual(self.app.get_priority(scope), priority, path)
+
+    def test_htmx_header_not_trusted(self):
+        self.app.in_flight = 8
+        self.assertEqual(request(self.app, "/", [("HX-Request", "true")]), 503)
+        self.assertEqual(request(self.app, "/metrics"), 200)
+
+    def test_few_slow_requests(self):
+        # A couple of slow logins don't count yet
+        self.app.in_flight = 2
+        self.add_latencies(4, 2.0)
+        self.assertEqual(self.get_level(), PRIORITY_LOW)
+        self.add_latencies(1, 2.0)
+        self.assertEqual(self.get_level(), PRIORITY_NORMAL)
+
+    def test_latency(self):
+        self.add_latencies(20, 2.0)
+        # Slow requests of an idle worker shed nothing
+        self.app.in_flight = 1
+        self.assertEqual(self.get_level(), PRIORITY_LOW)
+        self.app.in_flight = 2
+        self.assertEqual(self.get_level(), PRIORITY_NORMAL)
+        self.app.in_flight = 4
+        self.assertEqual(self.get_level(), PRIORITY_HIGH)
+
+    def test_in_flight(self):
+        self.app.in_flight = 4
+        self.assertEqual(self.get_level(), PRIORITY_NORMAL)
+        self.app.in_flight = 8
+        self.assertEqual(self.get_level(), PRIORITY_HIGH)
+
+    def test_exempt_paths(self):
+        self.app.in_flight = 8
+        self.assertEqual(request(self.app, "/static/app.css"), 200)
+        self.assertEqual(len(self.app.latency.samples), 0)
+        self.app.in_flight = 0
+        request(self.app, "/")
+        self.assertEqual(len(self.app.latency.samples), 1)
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        # Workers 1000 and 1001 run, 1002 exited
+        patcher = mock.patch.object(
+            metrics, "is_alive", lambda pid: pid != 1002
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write(self, pid: int, requests: float, in_flight: float, latency):
+        (self.directory / f"{pid}.json").write_text(json.dumps({
+            "counters": [["db_queries_total", [], requests]],
+            "gauges": [["http_requests_in_flight", [], in_flight]],
+            "histograms": [[
+                "search_duration_seconds", [["route", "index"]], latency
+            ]],
+        }))
+
+    def test_sum(self):
+        buckets = len(metrics.METRICS["search_duration_seconds"][2])
+        self.write(1000, 3, 1, [1] + [0] * buckets + [0.004])
+        self.write(1001, 4, 2, [0, 2] + [0] * (buckets - 1) + [0.015])
+        collected = metrics.collect(self.directory)
+        self.assertEqual(collected["counter"], {("db_queries_total", ()): 7})
+        self.assertEqual(
+            collected["gauge"], {("http_requests_in_flight", ()): 3}
+        )
+        self.assertEqual(
+            collected["histogram"],
+            {
+                ("search_duration_seconds", (("route", "index"),)): (
+                    [1, 2] + [0] * (buckets - 1) + [0.019]
+                ),
+            },
+        )
+
+    def test_dead_worker(self):
+        buckets = len(metrics.METRICS["search_duration_seconds"][2])
+        self.write(1000, 3, 1, [1] + [0] * buckets + [0.004])
+        self.write(1002, 4, 2, [0, 2] + [0] * (buckets - 1) + [0.015])
+        collected = metrics.collect(self.directory)
+        # Counters and histograms are kept, the gauges are dropped
+        self.assertEqual(collected["counter"], {("db_queries_total", ()): 7})
+        self.assertEqual(
+            collected["gauge"], {("http_requests_in_flight", ()): 1}
+        )
+        self.assertEqual(metrics.collect(self.directory), collected)
+
+    def test_histogram(self):
+        # 0.005 (1), 0.01 (2), 0.025 (0) ... +Inf (3)
+        buckets = len(metrics.METRICS["search_duration_seconds"][2])
+        self.write(1000, 0, 0, [1, 2] + [0] * (buckets - 2) + [3, 42.5])
+        lines = metrics.render(metrics.collect(self.directory)).splitlines()
+        name = "moodlehack_search_duration_seconds"
+        series = [line for line in lines if line.startswith(name)]
+        self.assertEqual(
+            series[:3],
+            [
+                f'{name}_bucket{{route="index",le="0.005"}} 1',
+                f'{name}_bucket{{route="index",le="0.01"}} 3',
+                f'{name}_bucket{{route="index",le="0.025"}} 3',
+            ],
+        )
+        self.assertEqual(
+            series[-3:],
+            [
+                f'{name}_bucket{{route="index",le="+Inf"}} 6',
+                f'{name}_sum{{route="index"}} 42.5',
+                f'{name}_count{{route="index"}} 6',
+            ],
+        )
+        self.assertEqual(len(series), buckets + 3)
+
+    def test_access(self):
+        endpoint = MetricsEndpoint(
+            self.directory,
+            allowed_ips=(ip_network("10.0.0.0/24"),),
+            token="secret",
+        )
+        for client, headers, status in [
+            ("10.0.0.1", [], 200),
+            ("10.0.1.1", [], 403),
+            ("10.0.1.1", [("Authorization", "Bearer secret")], 200),
+            ("10.0.1.1", [("Authorization", "Bearer wrong")], 403),
+            ("10.0.1.1", [("Authorization", "Token secret")], 403),
+        ]:
+            with self.subTest(client=client, headers=headers):
+                self.assertEqual(
+                    request(endpoint, "/", headers, client), status
+                )
+
+class ArbiterTests(SimpleTestCase):
+    """Worker supervision, with fork(), kill() and waitpid() mocked."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.arbiter = prefork.Arbiter(
+            config=None,
+            sockets=[],
+            workers=2,
+            metrics_directory=self.directory,
+        )
+        pids = iter(range(1000, 2000))
+        # (pid, wait status) of exited workers
+        self.exited = []
+        for target, value in [
+            ("fork", mock.Mock(side_effect=lambda: next(pids))),
+            ("kill", mock.Mock()),
+            ("waitpid", mock.Mock(side_effect=self.waitpid)),
+        ]:
+            patcher = mock.patch.object(prefork.os, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.arbiter.spawn_workers()
+
+    def waitpid(self, pid, options):
+        return self.exited.pop(0) if self.exited else (0, 0)
+
+    def exit(self, pid: int, code: int):
+        """Let a worker exit and run one loop iteration of the master."""
+        self.exited.append((pid, code << 8))
+        with self.assertLogs("uvicorn.error") as logs:
+            self.arbiter.reap_workers()
+            self.arbiter.spawn_workers()
+            # assertLogs() needs a record: retired workers log nothing
+            prefork.logger.info("reaped")
+        return logs.output[:-1]
+
+    def assertKilled(self, *pids):
+        self.assertEqual(
+            [call.args for call in prefork.os.kill.call_args_list],
+            [(pid, signal.SIGTERM) for pid in pids],
+        )
+
+    def test_recycled(self):
+        (self.directory / "1000.json").write_text(json.dumps({
+            "counters": [["db_queries_total", [], 3.0]],
+            "gauges": [["http_requests_in_flight", [], 1.0]],
+            "histograms": [],
+        }))
+        logs = self.exit(1000, 0)
+        self.assertIn("Child process [1000] recycled", logs[0])
+        self.assertEqual(self.arbiter.pids, {1001, 1002})
+        # Counters are kept, the worker's file is gone
+        self.assertEqual(
+            sorted(path.name for path in self.directory.glob("*.json")),
+            [metrics.EXITED],
+        )
+        collected = metrics.collect(self.directory)
+        self.assertEqual(collected["counter"], {("db_queries_total", ()): 3})
+        self.assertEqual(collected["gauge"], {})
+
+    def test_died(self):
+        logs = self.exit(1001, 1)
+        self.assertIn("Child process [1001] died", logs[0])
+        self.assertEqual(self.arbiter.pids, {1000, 1002})
+        self.assertFalse(self.arbiter.should_exit)
+
+    def test_hup(self):
+        self.arbiter.handle_hup()
+        self.assertEqual(self.arbiter.pids, {1002, 1003})
+        self.assertKilled(1000, 1001)
+        # Retired workers aren't replaced when they exit
+        self.assertEqual(self.exit(1000, 0), [])
+        self.assertEqual(self.exit(1001, 0), [])
+        self.assertEqual(self.arbiter.pids, {1002, 1003})
+        self.assertEqual(self.arbiter.retired, set())
+
+    def test_ttin_ttou(self):
+        self.arbiter.handle_ttin()
+        self.arbiter.spawn_workers()
+        self.assertEqual(self.arbiter.pids, {1000, 1001, 1002})
+        self.arbiter.handle_ttou()
+        self.arbiter.handle_ttou()
+        self.assertEqual(self.arbiter.workers, 1)
+        self.assertEqual(len(self.arbiter.pids), 1)
+        with self.assertLogs("uvicorn.error") as logs:
+            self.arbiter.handle_ttou()
+        self.assertIn("Already reached one process", logs.output[-1])
+        self.assertEqual(self.arbiter.workers, 1)
+        self.assertEqual(prefork.os.kill.call_count, 2)
+
+    def test_startup_failure(self):
+        self.exited.append((1000, STARTUP_FAILURE << 8))
+        with self.assertLogs("uvicorn.error", "ERROR"):
+            self.arbiter.reap_workers()
+        self.assertTrue(self.arbiter.should_exit)
+        self.assertEqual(self.arbiter.exit_code, STARTUP_FAILURE)
+        self.assertEqual(self.arbiter.pids, {1001})
+
+    def test_worker_registry(self):
+        # The master's values aren't reported by the new worker
+        registry.inc("db_queries_total")
+        counters = []
+        prefork.os.fork.side_effect = lambda: 0
+        with (
+            mock.patch.object(
+                self.arbiter,
+                "run_worker",
+                lambda: counters.append(dict(registry.counters)),
+            ),
+            mock.patch.object(prefork.os, "_exit") as exit,
+        ):
+            self.arbiter.spawn_worker()
+        self.assertEqual(counters, [{}])
+        exit.assert_called_once_with(0)
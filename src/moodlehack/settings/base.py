@@ -12,6 +12,7 @@ from moodlehack.fs import paths
 
 from .django import DjangoCoreSettings
 from .paths import AppPathSettings
+from .serve import ServeSettings
 from .site import SiteSettings
 from .uvicorn import UvicornServerSettings
 
@@ -28,6 +29,7 @@ class AppSettings(BaseSettings):
     django: DjangoCoreSettings = Field(default_factory=DjangoCoreSettings)
     paths: AppPathSettings = Field(default_factory=AppPathSettings)
     site: SiteSettings = Field(default_factory=SiteSettings)
+    serve: ServeSettings = Field(default_factory=ServeSettings)
     uvicorn: UvicornServerSettings = Field(
         default_factory=UvicornServerSettings
     )
@@ -234,6 +234,121 @@ class DjangoStaticSettings(BaseSettings):
         return []
 
 
+# [django.session]
+class DjangoSessionSettings(BaseSettings):
+    """
+    Session configuration for Django.
+    Supports database (default), cached database, cache-only and
+    signed cookie engines.
+    """
+    engine: str = Field(default="db")
+    cache_alias: str = Field(default="default")
+    cookie_age: int = Field(default=1209600, ge=60)
+    cache_user: bool = Field(
+        default=True,
+        description=(
+            "Cache the authenticated user object between requests "
+            "(only with a cache shared by all workers)"
+        ),
+    )
+    user_cache_ttl: int = Field(default=300, ge=0)
+    cleanup_interval: int = Field(
+        default=86400,
+        ge=0,
+        description=(
+            "Seconds between expired session cleanups run by the server "
+            "for database-backed engines (0 disables them)"
+        ),
+    )
+
+    @field_validator('engine', mode='before')
+    @classmethod
+    def normalize_engine(cls, v: str) -> str:
+        """Map short names to full Django session engine paths."""
+        engine_aliases = {
+            "db": "django.contrib.sessions.backends.db",
+            "cached_db": "django.contrib.sessions.backends.cached_db",
+            "cache": "django.contrib.sessions.backends.cache",
+            "signed_cookies": (
+                "django.contrib.sessions.backends.signed_cookies"
+            ),
+        }
+        return engine_aliases.get(v.lower(), v)
+
+
+# [django.timing]
+class DjangoTimingSettings(BaseSettings):
+    """
+    Per-request instrumentation: database queries, template and Markdown
+    rendering and total handler time, reported in the 'moodlehack.timing'
+    log and, on request, the Server-Timing header.
+    """
+    enabled: bool = Field(default=True)
+    sample_rate: float = Field(
+        default=1.0,
+        ge=0.0,
+        le=1.0,
+        description="Share of requests that are instrumented",
+    )
+    header: bool = Field(
+        default=False,
+        description=(
+            "Send the Server-Timing header, only to staff users, "
+            "INTERNAL_IPS and everyone in DEBUG mode"
+        ),
+    )
+    log: bool = Field(default=True)
+
+    @property
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "SAMPLE_RATE": self.sample_rate,
+            "HEADER": self.header,
+            "LOG": self.log,
+        }
+
+
+# [django.queries]
+class DjangoQueryInspectorSettings(BaseSettings):
+    """
+    Slow query log and N+1 query detection, reported to the
+    'moodlehack.queries' logger.
+    """
+    enabled: bool = Field(default=True)
+    slow_query_ms: int = Field(
+        default=200,
+        ge=0,
+        description="Log statements slower than this (0 disables)",
+    )
+    threshold: int = Field(
+        default=5,
+        ge=0,
+        description=(
+            "Repetitions of one query shape per request reported as N+1 "
+            "(0 disables)"
+        ),
+    )
+    sample_rate: float = Field(
+        default=0.1,
+        ge=0.0,
+        le=1.0,
+        description="Share of requests checked for N+1 outside DEBUG",
+    )
+    raise_errors: bool | None = Field(
+        default=None,
+        description="Raise on N+1 (default: in DEBUG and tests only)",
+    )
+
+    @property
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "SLOW_QUERY": self.slow_query_ms / 1000,
+            "THRESHOLD": self.threshold,
+            "SAMPLE_RATE": self.sample_rate,
+            "RAISE_ERRORS": self.raise_errors,
+        }
+
+
 # [django.crispy]
 class DjangoCrispySettings(BaseSettings):
     """Crispy forms configuration."""
@@ -250,10 +365,67 @@ class DjangoCrispySettings(BaseSettings):
 class DjangoRestFrameworkSettings(BaseSettings):
     """
     DRF configuration settings.
-    Renderers and parsers are dynamically determined by the 'browsable' flag.
+    Renderers and parsers are dynamically determined by the 'browsable'
+    flag and the selected JSON backend. List endpoints are always
+    paginated unless legacy (unpaginated) clients are allowed.
+    Token authentication is always enabled for machine clients.
     """
 
     browsable: bool | None = Field(default=None)
+    json_backend: Literal["stdlib", "orjson"] = Field(
+        default="stdlib",
+        description=(
+            "JSON library for API renderer and parser. "
+            "'orjson' falls back to stdlib if it isn't installed"
+        ),
+    )
+    pagination: Literal["page", "cursor"] = Field(
+        default="page",
+        description=(
+            "'page' for ?page=N&page_size=M, "
+            "'cursor' for opaque cursors over (update, id)"
+        ),
+    )
+    page_size: int = Field(default=100, ge=1)
+    max_page_size: int = Field(default=1000, ge=1)
+    legacy_unpaginated: bool = Field(
+        default=False,
+        description=(
+            "Return plain lists to clients that don't ask for a page "
+            "(capped at 'max_unpaginated' items)"
+        ),
+    )
+    max_unpaginated: int = Field(default=1000, ge=1)
+    sync_retention_days: int = Field(
+        default=90,
+        ge=0,
+        description=(
+            "Days deleted answers stay in the change feed, older cursors "
+            "must sync from the beginning (0 keeps them forever)"
+        ),
+    )
+    basic_auth: bool = Field(
+        default=True,
+        description="Accept Basic auth (hashes the password per request)",
+    )
+    signed_tokens: bool = Field(
+        default=False,
+        description="Accept expiring HMAC-signed tokens ('Signed <token>')",
+    )
+    signed_token_max_age: int = Field(default=3600, ge=60)
+    auth_cache_size: int = Field(
+        default=1024,
+        ge=0,
+        description="Verified credentials kept in memory (0 disables)",
+    )
+    auth_cache_ttl: int = Field(
+        default=5,
+        ge=0,
+        description=(
+            "Seconds a verified credential is reused; bounds how long a "
+            "revoked token works in other workers without a shared cache"
+        ),
+    )
 
     @property
     def as_dict(self) -> dict:
@@ -262,25 +434,74 @@ class DjangoRestFrameworkSettings(BaseSettings):
         Includes Browsable API renderers and parsers if 'browsable' is True.
         """
         # Base JSON-only configuration
-        renderers = ["rest_framework.renderers.JSONRenderer"]
-        parsers = ["rest_framework.parsers.JSONParser"]
+        if self.json_backend == "orjson":
+            renderers = ["moodlehack.core.renderers.ORJSONRenderer"]
+            parsers = ["moodlehack.core.parsers.ORJSONParser"]
+        else:
+            renderers = ["rest_framework.renderers.JSONRenderer"]
+            parsers = ["rest_framework.parsers.JSONParser"]
 
         if self.browsable:
             gui = "rest_framework.renderers.BrowsableAPIRenderer"
             renderers.append(gui)
             parsers.append(gui)
 
-        return {
+        authentication = [
+            "rest_framework.authentication.SessionAuthentication",
+            "moodlehack.accounts.authentication.CachedTokenAuthentication",
+        ]
+        if self.signed_tokens:
+            authentication.append(
+                "moodlehack.accounts.authentication.SignedTokenAuthentication"
+            )
+        if self.basic_auth:
+            authentication.append(
+                "rest_framework.authentication.BasicAuthentication"
+            )
+
+        pagination_classes = {
+            "page": "moodlehack.core.pagination.PageNumberPagination",
+            "cursor": "moodlehack.core.pagination.CursorPagination",
+        }
+
+        config = {
             "DEFAULT_RENDERER_CLASSES": renderers,
             "DEFAULT_PARSER_CLASSES": parsers,
-            "DEFAULT_AUTHENTICATION_CLASSES": [
-                "rest_framework.authentication.SessionAuthentication",
-                "rest_framework.authentication.BasicAuthentication",
-            ],
-            "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+            "DEFAULT_AUTHENTICATION_CLASSES": authentication,
+            "DEFAULT_SCHEMA_CLASS": "moodlehack.accounts.schema.AutoSchema",
             "DEFAULT_FILTER_BACKENDS": [
                 "django_filters.rest_framework.DjangoFilterBackend"
             ],
+            "DEFAULT_PAGINATION_CLASS": pagination_classes[self.pagination],
+            "PAGE_SIZE": self.page_size,
+        }
+
+        return config
+
+    @property
+    def pagination_limits(self) -> dict[str, Any]:
+        """Return limits used by moodlehack.core.pagination classes."""
+        return {
+            "MAX_PAGE_SIZE": max(self.max_page_size, self.page_size),
+            "LEGACY_UNPAGINATED": self.legacy_unpaginated,
+            "MAX_UNPAGINATED": self.max_unpaginated,
+        }
+
+    @property
+    def sync_options(self) -> dict[str, Any]:
+        """Return options of the answers change feed."""
+        return {
+            "RETENTION_DAYS": self.sync_retention_days,
+        }
+
+    @property
+    def authentication_options(self) -> dict[str, Any]:
+        """Return options used by moodlehack.accounts.authentication."""
+        return {
+            "SIGNED_TOKENS": self.signed_tokens,
+            "SIGNED_TOKEN_MAX_AGE": self.signed_token_max_age,
+            "CACHE_SIZE": self.auth_cache_size,
+            "CACHE_TTL": self.auth_cache_ttl,
         }
 
 
@@ -350,6 +571,15 @@ class DjangoCoreSettings(BaseSettings):
     static: DjangoStaticSettings = Field(
         default_factory=DjangoStaticSettings
     )
+    session: DjangoSessionSettings = Field(
+        default_factory=DjangoSessionSettings
+    )
+    timing: DjangoTimingSettings = Field(
+        default_factory=DjangoTimingSettings
+    )
+    queries: DjangoQueryInspectorSettings = Field(
+        default_factory=DjangoQueryInspectorSettings
+    )
     crispy: DjangoCrispySettings = Field(
         default_factory=DjangoCrispySettings
     )
@@ -415,22 +645,44 @@ class DjangoCoreSettings(BaseSettings):
     @property
     def middleware(self) -> list[str]:
         """Middleware configuration for Django"""
-        return [
+        authentication = (
+            "moodlehack.accounts.middleware.CachedAuthenticationMiddleware"
+            if self.session.cache_user
+            else "django.contrib.auth.middleware.AuthenticationMiddleware"
+        )
+        middleware = [
             "django.middleware.security.SecurityMiddleware",
             "django.contrib.sessions.middleware.SessionMiddleware",
             "django.middleware.common.CommonMiddleware",
             "django.middleware.csrf.CsrfViewMiddleware",
-            "django.contrib.auth.middleware.AuthenticationMiddleware",
+            authentication,
             "django.contrib.messages.middleware.MessageMiddleware",
             "django.middleware.clickjacking.XFrameOptionsMiddleware",
+            "moodlehack.core.metrics.RouteNameMiddleware",
         ]
+        if self.queries.enabled:
+            middleware.insert(
+                0, "moodlehack.core.queries.QueryInspectorMiddleware"
+            )
+        if self.timing.enabled:
+            # Outermost, so the total covers all other middleware
+            middleware.insert(
+                0, "moodlehack.core.timing.ServerTimingMiddleware"
+            )
+        return middleware
 
     @property
     def templates(self) -> list[dict[str, Any]]:
         """Template configuration for Django"""
         return [
             {
-                "BACKEND": "django.template.backends.django.DjangoTemplates",
+                # Engine alias, otherwise derived from the backend path
+                "NAME": "django",
+                "BACKEND": (
+                    "moodlehack.core.timing.DjangoTemplates"
+                    if self.timing.enabled
+                    else "django.template.backends.django.DjangoTemplates"
+                ),
                 "DIRS": [
                     paths.base_dir / "templates",
                 ],
@@ -0,0 +1,228 @@
+from ipaddress import ip_network
+from pathlib import Path
+from typing import Any, Literal
+
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+from moodlehack.fs import paths
+
+
+# [serve.ratelimit]
+class ServeRateLimitSettings(BaseSettings):
+    """
+    Token bucket rate limits applied by the Starlette server.
+    Each budget has a refill rate (requests per second) and a burst size.
+    """
+    model_config = SettingsConfigDict(extra='ignore')
+
+    enabled: bool = Field(default=True)
+    backend: Literal["auto", "local", "cache"] = Field(
+        default="auto",
+        description=(
+            "'local' keeps buckets per worker process, 'cache' shares them "
+            "between workers through a Django cache (file or redis), "
+            "'auto' uses the cache when it is shared by all workers"
+        ),
+    )
+    cache_alias: str = Field(default="default")
+
+    client_rate: float = Field(
+        default=20.0,
+        gt=0,
+        description="Budget of every request per client IP address",
+    )
+    client_burst: int = Field(default=100, ge=1)
+
+    api_rate: float = Field(default=10.0, gt=0)
+    api_burst: int = Field(default=50, ge=1)
+    search_rate: float = Field(default=5.0, gt=0)
+    search_burst: int = Field(default=20, ge=1)
+    page_rate: float = Field(default=2.0, gt=0)
+    page_burst: int = Field(default=20, ge=1)
+
+    @property
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "ENABLED": self.enabled,
+            "BACKEND": self.backend,
+            "CACHE_ALIAS": self.cache_alias,
+            "BUDGETS": {
+                "client": (self.client_rate, self.client_burst),
+                "api": (self.api_rate, self.api_burst),
+                "search": (self.search_rate, self.search_burst),
+                "page": (self.page_rate, self.page_burst),
+            },
+        }
+
+
+# [serve.shedding]
+class ServeSheddingSettings(BaseSettings):
+    """
+    Adaptive admission control for the Starlette server.
+    Low-priority routes are rejected first when in-flight requests or
+    recent latency exceed the configured limits.
+    """
+    model_config = SettingsConfigDict(extra='ignore')
+
+    enabled: bool = Field(default=True)
+    max_in_flight: int = Field(
+        default=64,
+        ge=1,
+        description="In-flight requests per worker at which only "
+        "high-priority (metrics) requests are admitted",
+    )
+    target_latency_ms: int = Field(
+        default=500,
+        ge=1,
+        description="p95 latency above which low-priority work is shed",
+    )
+    window_seconds: float = Field(default=10.0, gt=0)
+    min_samples: int = Field(
+        default=20,
+        ge=1,
+        description="Requests in the window before latency sheds work",
+    )
+    retry_after: int = Field(default=5, ge=1)
+    low_priority_paths: list[str] = Field(
+        default_factory=lambda: [
+            "/api/v1/schema",
+            "/admin/",
+        ]
+    )
+
+    @property
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "ENABLED": self.enabled,
+            "MAX_IN_FLIGHT": self.max_in_flight,
+            "TARGET_LATENCY": self.target_latency_ms / 1000,
+            "WINDOW": self.window_seconds,
+            "MIN_SAMPLES": self.min_samples,
+            "RETRY_AFTER": self.retry_after,
+            "LOW_PRIORITY_PATHS": tuple(self.low_priority_paths),
+        }
+
+
+# [serve.metrics]
+class ServeMetricsSettings(BaseSettings):
+    """
+    Prometheus metrics endpoint of the Starlette server.
+    Workers write their metrics to 'directory', the endpoint sums them.
+    """
+    model_config = SettingsConfigDict(extra='ignore')
+
+    enabled: bool = Field(default=True)
+    url: str = Field(default="/metrics")
+    allowed_ips: list[str] = Field(
+        default_factory=lambda: [
+            "127.0.0.1",
+            "::1",
+        ],
+        description="Addresses or networks allowed to scrape metrics",
+    )
+    bearer_token: str | None = Field(
+        default=None,
+        description="Bearer token accepted from any address",
+    )
+    flush_interval: float = Field(default=5.0, gt=0)
+    directory: str | None = Field(default=None)
+
+    @property
+    def as_dict(self) -> dict[str, Any]:
+        directory = (
+            Path(self.directory) if self.directory
+            else paths.cache_dir / "metrics"
+        )
+        return {
+            "ENABLED": self.enabled,
+            "URL": self.url,
+            "ALLOWED_IPS": tuple(
+                ip_network(ip, strict=False) for ip in self.allowed_ips
+            ),
+            "TOKEN": self.bearer_token,
+            "FLUSH_INTERVAL": self.flush_interval,
+            "DIRECTORY": directory,
+        }
+
+
+# [serve.warmup]
+class ServeWarmupSettings(BaseSettings):
+    """
+    Warm-up of every worker before it accepts requests: templates, URL
+    patterns, translations, database connections and caches.
+    """
+    model_config = SettingsConfigDict(extra='ignore')
+
+    enabled: bool = Field(default=True)
+
+    @property
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "ENABLED": self.enabled,
+        }
+
+
+# [serve.workers]
+class ServeWorkersSettings(BaseSettings):
+    """
+    Worker processes of the server ('uvicorn.performance.workers').
+    With 'preload' the master imports and warms the application once
+    and forks the workers, which share its memory copy-on-write.
+    Workers are recycled after 'limit_max_requests' requests or above
+    'max_memory_mb' of resident memory.
+    """
+    model_config = SettingsConfigDict(extra='ignore')
+
+    preload: bool = Field(default=True)
+    max_memory_mb: int | None = Field(
+        default=None,
+        ge=1,
+        description="Resident memory (MiB) at which a worker is recycled, "
+        "memory shared with the master included",
+    )
+
+    @property
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "PRELOAD": self.preload,
+            "MAX_MEMORY": (
+                self.max_memory_mb * 1024 * 1024
+                if self.max_memory_mb else None
+            ),
+        }
+
+
+# [serve]
+class ServeSettings(BaseSettings):
+    """
+    Starlette server layer settings (middleware in front of Django).
+    Mapped to [serve] section in TOML.
+    """
+    model_config = SettingsConfigDict(extra='ignore')
+
+    ratelimit: ServeRateLimitSettings = Field(
+        default_factory=ServeRateLimitSettings
+    )
+    shedding: ServeSheddingSettings = Field(
+        default_factory=ServeSheddingSettings
+    )
+    metrics: ServeMetricsSettings = Field(
+        default_factory=ServeMetricsSettings
+    )
+    warmup: ServeWarmupSettings = Field(
+        default_factory=ServeWarmupSettings
+    )
+    workers: ServeWorkersSettings = Field(
+        default_factory=ServeWorkersSettings
+    )
+
+    @property
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "RATELIMIT": self.ratelimit.as_dict,
+            "SHEDDING": self.shedding.as_dict,
+            "METRICS": self.metrics.as_dict,
+            "WARMUP": self.warmup.as_dict,
+            "WORKERS": self.workers.as_dict,
+        }
@@ -2,19 +2,20 @@ import asyncio
 import ssl
 from configparser import RawConfigParser
 from os import PathLike
-from typing import IO, Any
+from typing import IO, Any, Literal
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from uvicorn.config import (
-    LOGGING_CONFIG,
-    SSL_PROTOCOL_VERSION,
-    HTTPProtocolType,
-    InterfaceType,
-    LifespanType,
-    LoopFactoryType,
-    WSProtocolType,
-)
+
+# Mirrors uvicorn.config, not imported so that settings (loaded by every
+# command) don't import Uvicorn and Click
+HTTPProtocolType = Literal["auto", "h11", "httptools", "zttp"]
+WSProtocolType = Literal[
+    "auto", "none", "websockets", "websockets-sansio", "wsproto"
+]
+LifespanType = Literal["auto", "on", "off"]
+LoopFactoryType = Literal["none", "auto", "asyncio", "uvloop", "zuvloop"]
+InterfaceType = Literal["auto", "asgi3", "asgi2", "wsgi"]
 
 
 # [uvicorn.logging]
@@ -22,8 +23,9 @@ class UvicornLoggingSettings(BaseSettings):
     """Logging configuration for Uvicorn"""
     model_config = SettingsConfigDict(extra='ignore')
 
+    # None keeps uvicorn.config.LOGGING_CONFIG
     log_config: dict[str, Any] | str | RawConfigParser | IO[Any] | None = (
-        Field(default=LOGGING_CONFIG)
+        Field(default=None)
     )
     log_level: str | int | None = Field(default=None)
     access_log: bool = Field(default=True)
@@ -38,7 +40,7 @@ class UvicornSslSettings(BaseSettings):
     ssl_keyfile: str | PathLike[str] | None = Field(default=None)
     ssl_certfile: str | PathLike[str] | None = Field(default=None)
     ssl_keyfile_password: str | None = Field(default=None)
-    ssl_version: int = Field(default=SSL_PROTOCOL_VERSION)
+    ssl_version: int = Field(default=ssl.PROTOCOL_TLS_SERVER)
     ssl_cert_reqs: int = Field(default=ssl.CERT_NONE)
     ssl_ca_certs: str | None = Field(default=None)
     ssl_ciphers: str = Field(default="TLSv1")
@@ -73,6 +75,7 @@ class UvicornPerformanceSettings(BaseSettings):
     workers: int | None = Field(default=None)
     limit_concurrency: int | None = Field(default=None)
     limit_max_requests: int | None = Field(default=None)
+    limit_max_requests_jitter: int = Field(default=0)
     backlog: int = Field(default=2048)
     timeout_keep_alive: int = Field(default=5)
     timeout_graceful_shutdown: int | None = Field(default=None)